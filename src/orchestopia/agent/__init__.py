@@ -1,8 +1,9 @@
 from .config import AgentConfigLoader
 from .factory import AgentFactory
 from .loader import AgentLoader
-from .a2a_client_manager import A2AClientManager
+from .a2a_client_manager import A2AClientManager, host_locally
+from .workflow import Workflow
 
 __all__ = [
-    "AgentConfigLoader", "AgentFactory", "AgentLoader", "A2AClientManager"
+    "AgentConfigLoader", "AgentFactory", "AgentLoader", "A2AClientManager", "Workflow", "host_locally"
 ]
\ No newline at end of file
@@ -1,38 +1,103 @@
 from uuid import uuid4
+from collections import deque
 from contextlib import AsyncExitStack
-from typing import Dict, Optional, Union
-from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Union
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit, urlunsplit
 #from fasta2a.client import A2AClient
-from a2a.client import BaseClient, ClientConfig, ClientFactory, A2ACardResolver
+from a2a.client import BaseClient, ClientCallContext, ClientConfig, ClientFactory, A2ACardResolver
 from a2a.types import (
     TransportProtocol, 
     TaskQueryParams, 
+    DataPart,
     Message, 
-    Task
+    Part,
+    Task,
+    TextPart,
 )
+from pydantic_ai import Agent
+from pydantic_core import to_jsonable_python
 from tenacity import retry, stop_after_attempt, wait_exponential
+import time
 import asyncio
 import httpx
 
+from orchestopia.utils import percentile
+from orchestopia.agent.config import ReplicaRoutingConfig
+from orchestopia.agent.workflow import Workflow
+from orchestopia.observability.log import get_logger
+from orchestopia.observability.metrics import metrics
+from orchestopia.observability.tracing import inject_traceparent, set_span_attribute, span
+from orchestopia.registry.resource import ResourceRegistry
+from orchestopia.runtime.lifecycle import lifecycle
+from orchestopia.runtime.runner import run_agent
+from orchestopia.runtime.session import session_credentials
+
+logger = get_logger("a2a")
+
+a2a_hedges_total = metrics.counter(
+    "orchestopia_a2a_hedges", "Hedged calls to A2A replicas, by the replica that answered first", ("agent", "winner")
+)
+a2a_replica_duration = metrics.histogram(
+    "orchestopia_a2a_replica_duration_seconds", "Duration of the successful calls to an A2A replica", ("agent", "replica")
+)
+
+# `local://<agent name>` calls an agent of this runtime in process
+LOCAL_SCHEME = "local://"
+# the urls this runtime serves its own agents at, to the served agent
+_hosted_agents: Dict[str, str] = {}
+
+
+def _canonical_url(url: str) -> str:
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), "", ""))
+
+
+def host_locally(url: str, agent_name: str) -> None:
+    """Declares that this runtime serves its agent `agent_name` over A2A at `url`
+
+    A2A agents configured with this url, or whose agent card advertises it, are called in process.
+    """
+    _hosted_agents[_canonical_url(url)] = agent_name
+
+
+def local_target(url: str) -> Optional[str]:
+    """The agent of this runtime served at `url`, or None for a remote agent"""
+    if url.startswith(LOCAL_SCHEME):
+        return url[len(LOCAL_SCHEME):].strip("/")
+    return _hosted_agents.get(_canonical_url(url))
+
+
 @dataclass
 class A2AAgent:
     name: str
     client: BaseClient
     exit_stack: AsyncExitStack
     server_params: dict
+    # the configured agent name, shared by its replicas (whose `name` is `<service>#<index>`)
+    service: Optional[str] = None
     
     async def run(self, query: str, context_id: str = None) -> Union[str, Message, Task]:
-        message = Message(
-            role="user",
-            # TODO: add multimodal parts
-            parts=[{"kind": "text", "text": query}],
-            context_id=context_id,
-            message_id = str(uuid4())
-        )
-        # send message to client
-        async for result in self.client.send_message(message):
-            task_response = result
-            break
+        # in flight until the task is resolved, so a shutdown waits for the polling too
+        async with lifecycle.track(f"a2a:{self.name}"):
+            return await self._run(query, context_id)
+
+    async def _run(self, query: str, context_id: str = None) -> Union[str, Message, Task]:
+        async with span("a2a.send_message", kind="a2a", agent=self.name):
+            traceparent = inject_traceparent()
+            message = Message(
+                role="user",
+                # TODO: add multimodal parts
+                parts=[{"kind": "text", "text": query}],
+                context_id=context_id,
+                message_id = str(uuid4()),
+                # lets the peer continue the trace, see `orchestopia.observability.continue_trace`
+                metadata = {"traceparent": traceparent} if traceparent else None,
+            )
+            # send message to client
+            async for result in self.client.send_message(message, context=self._call_context()):
+                task_response = result
+                break
 
         # resolve task
         task, _ = task_response if isinstance(task_response, tuple) else (task_response, None)
@@ -48,31 +113,50 @@ class A2AAgent:
         else:
             raise Exception(f"The type of the response from a2a agent `{self.name}`is not Message of Task. raw response: {task}")
     
+    def _call_context(self) -> Optional[ClientCallContext]:
+        # the client is shared by every user, the headers of the current session go with each request
+        headers = session_credentials(self.service or self.name)
+        return ClientCallContext(state={"http_kwargs": {"headers": headers}}) if headers else None
+
     async def _polling_task_status(
             self, task_id: str, history_length: int = 10
         ) -> Union[str, Task]:
         """
         Poll the task status until it complete and retrieve the message
         """
-        print(f"Task created，ID: {task_id}，Start polling...")
-        while True:
-            # get the status of the task
-            current_task = await self.client.get_task(
-                TaskQueryParams(
-                    history_length = history_length,
-                    id = task_id
+        logger.info("Task created，ID: %s，Start polling...", task_id, extra={"resource": self.name, "task_id": task_id})
+        started = time.monotonic()
+        async with span("a2a.poll", kind="a2a", agent=self.name, task_id=task_id):
+            polls = 0
+            while True:
+                # get the status of the task
+                current_task = await self.client.get_task(
+                    TaskQueryParams(
+                        history_length = history_length,
+                        id = task_id
+                    ),
+                    context=self._call_context(),
                 )
-            )
-            status = current_task.status
-            
-            if status.state == "completed":
-                return current_task
-            
-            elif status.state in ["failed", "canceled", "rejected"]:
-                return f"The task (id: {task_id}) is {status.state}, Error message: {status.message}"
-                #raise Exception(f"The task (id: {task_id}) is {status.state}, Error message: {status.message}")
-            
-            await asyncio.sleep(2)
+                status = current_task.status
+                polls += 1
+                set_span_attribute("polls", polls)
+                logger.debug(
+                    "Task %s is %s", task_id, status.state,
+                    extra={"resource": self.name, "task_id": task_id, "polls": polls},
+                )
+                
+                if status.state == "completed":
+                    logger.info(
+                        "Task %s completed", task_id,
+                        extra={"resource": self.name, "task_id": task_id, "polls": polls, "duration": time.monotonic() - started},
+                    )
+                    return current_task
+                
+                elif status.state in ["failed", "canceled", "rejected"]:
+                    return f"The task (id: {task_id}) is {status.state}, Error message: {status.message}"
+                    #raise Exception(f"The task (id: {task_id}) is {status.state}, Error message: {status.message}")
+                
+                await asyncio.sleep(2)
 
     # def _extract_response_from_task(self, task: Task):
     #     for artifact in Task.artifacts:
@@ -81,9 +165,169 @@ class A2AAgent:
     #             if isinstance(part, TextPart):
     #                 pydanticai_TextPart
 
+@dataclass
+class LocalA2AAgent:
+    """An A2A agent hosted by this runtime, run in process instead of over HTTP
+
+    Answers with the message the agent would send back over A2A, without the serialisation,
+    the task creation and the polling.
+    """
+    name: str
+    # the name of the agent in the registry
+    target: str
+    exit_stack: AsyncExitStack = field(default_factory=AsyncExitStack)
+    server_params: dict = field(default_factory=dict)
+    service: Optional[str] = None
+
+    async def run(self, query: str, context_id: str = None) -> Union[str, Message, Task]:
+        async with lifecycle.track(f"a2a:{self.name}"), span("a2a.local_call", kind="a2a", agent=self.name, target=self.target):
+            # resolved on each call, the hosted agent may be loaded after this one
+            agent = ResourceRegistry().agents.get(self.target)
+            if agent is None:
+                raise RuntimeError(f"The agent `{self.target}` called by the A2A agent `{self.name}` is not hosted by this runtime")
+            if isinstance(agent, (Agent, Workflow)):
+                output = (await run_agent(agent, query)).output
+            else:
+                # an A2A agent itself
+                output = await agent.run(query)
+        if isinstance(output, (Message, Task)):
+            return output
+        return Message(role="agent", parts=[_to_part(output)], message_id=str(uuid4()), context_id=context_id)
+
+
+def _to_part(output: Any) -> Part:
+    if isinstance(output, str):
+        return Part(root=TextPart(text=output))
+    # structured outputs travel as data parts, as a served agent sends them
+    data = to_jsonable_python(output)
+    return Part(root=DataPart(data=data if isinstance(data, dict) else {"result": data}))
+
+
+@dataclass
+class _Replica:
+    agent: Union[A2AAgent, "LocalA2AAgent"]
+    latencies: Deque[float]
+
+
+class ReplicatedA2AAgent:
+    """An A2A agent served by several replicas, called according to its routing policy
+
+    Answers like an `A2AAgent`, a broadcast merges the answers of every replica into one message.
+    """
+
+    def __init__(self, name: str, agents: List[Union[A2AAgent, LocalA2AAgent]], routing: ReplicaRoutingConfig):
+        self.name = name
+        self.routing = routing
+        self.replicas = [_Replica(agent, deque(maxlen=routing.window)) for agent in agents]
+        self._next = 0
+
+    async def run(self, query: str, context_id: str = None) -> Union[str, Message, Task]:
+        policy = self.routing.policy
+        async with span("a2a.replicas", kind="internal", agent=self.name, policy=policy):
+            if policy == "broadcast":
+                return await self._broadcast(query, context_id)
+            # the first replica rotates, so the load is spread when every replica is healthy
+            start = self._next
+            self._next = (self._next + 1) % len(self.replicas)
+            order = self.replicas[start:] + self.replicas[:start]
+            if policy == "hedged":
+                return await self._hedged(order, query, context_id)
+            return await self._failover(order, query, context_id)
+
+    def hedge_delay(self, replica: _Replica) -> float:
+        if len(replica.latencies) < self.routing.min_samples:
+            return self.routing.hedge_delay
+        return percentile(list(replica.latencies), self.routing.hedge_percentile)
+
+    async def _call(self, replica: _Replica, query: str, context_id: str) -> Union[str, Message, Task]:
+        started = time.monotonic()
+        response = await replica.agent.run(query, context_id)
+        # a failed remote task is a failed call, so every policy moves on to the next replica
+        if isinstance(response, str):
+            raise RuntimeError(f"Replica `{replica.agent.name}` failed: {response}")
+        if isinstance(response, Task) and response.status.state != "completed":
+            raise RuntimeError(f"The task of replica `{replica.agent.name}` is {response.status.state}")
+        # only completed calls, a cancelled hedge loser says nothing about the replica
+        latency = time.monotonic() - started
+        replica.latencies.append(latency)
+        a2a_replica_duration.observe(latency, agent=self.name, replica=replica.agent.name)
+        return response
+
+    async def _failover(self, order: List[_Replica], query: str, context_id: str) -> Union[str, Message, Task]:
+        errors = []
+        for replica in order:
+            try:
+                return await self._call(replica, query, context_id)
+            except Exception as e:
+                errors.append(e)
+                logger.warning("Replica '%s' failed: %s", replica.agent.name, e, extra={"resource": self.name})
+        raise errors[0]
+
+    async def _hedged(self, order: List[_Replica], query: str, context_id: str) -> Union[str, Message, Task]:
+        waiting = list(order)
+        running: Dict[asyncio.Task, _Replica] = {}
+        errors = []
+        hedges = 0
+
+        def launch() -> None:
+            replica = waiting.pop(0)
+            running[asyncio.create_task(self._call(replica, query, context_id))] = replica
+
+        launch()
+        try:
+            while running:
+                can_hedge = waiting and hedges < self.routing.max_hedges
+                # the delay of the replica called last
+                timeout = self.hedge_delay(list(running.values())[-1]) if can_hedge else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedges += 1
+                    set_span_attribute("hedges", hedges)
+                    launch()
+                    continue
+                for task in done:
+                    replica = running.pop(task)
+                    if task.exception() is None:
+                        if hedges:
+                            a2a_hedges_total.inc(agent=self.name, winner="primary" if replica is order[0] else "hedge")
+                        return task.result()
+                    errors.append(task.exception())
+                    logger.warning("Replica '%s' failed: %s", replica.agent.name, task.exception(), extra={"resource": self.name})
+                    # a failed replica is replaced right away, without waiting for the hedge delay
+                    if waiting:
+                        launch()
+            raise errors[0]
+        finally:
+            # the losers are cancelled, their remote tasks are left to finish on their own
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+    async def _broadcast(self, query: str, context_id: str) -> Message:
+        responses = await asyncio.gather(
+            *(self._call(replica, query, context_id) for replica in self.replicas), return_exceptions=True
+        )
+        parts: List[Part] = []
+        for replica, response in zip(self.replicas, responses):
+            if isinstance(response, BaseException):
+                logger.warning("Replica '%s' failed: %s", replica.agent.name, response, extra={"resource": self.name})
+                continue
+            # every answer is labelled, so the caller can compare them
+            parts.append(Part(root=TextPart(text=f"Answer of {replica.agent.name}:")))
+            if isinstance(response, Message):
+                parts += response.parts
+            elif isinstance(response, Task):
+                parts += [part for artifact in response.artifacts or [] for part in artifact.parts]
+            else:
+                parts.append(Part(root=TextPart(text=str(response))))
+        if not parts:
+            raise next(response for response in responses if isinstance(response, BaseException))
+        return Message(role="agent", parts=parts, message_id=str(uuid4()), context_id=context_id)
+
+
 class A2AClientManager:
     def __init__(self):
-        self.agents: Dict[str, A2AAgent]
+        self.agents: Dict[str, Union[A2AAgent, LocalA2AAgent]] = {}
         # self.clients: Dict[str, BaseClient] = {}
         # self.exit_stacks: Dict[str, AsyncExitStack] = {}
         self._lock = asyncio.Lock()
@@ -94,53 +338,100 @@ class A2AClientManager:
         name: str,
         base_url: str,
         httpx_client: httpx.AsyncClient | None = None,
-        timeout: int = 60
-    ) -> A2AAgent:
+        timeout: int = 60,
+        service: Optional[str] = None,
+    ) -> Union[A2AAgent, LocalA2AAgent]:
+        # the lock only guards `self.agents`, the replicas and other agents connect concurrently
         async with self._lock:
             if name in self.agents:
                 return self.agents[name]
+        target = local_target(base_url)
+        if target is not None:
+            return await self._register(self._local_agent(name, target, base_url, service))
 
-            exit_stack = AsyncExitStack()
-            try:
-                if httpx_client is None: # 為了統一管理，自行建立httpx_client
-                    httpx_client = await exit_stack.enter_async_context(
-                        httpx.AsyncClient(timeout=timeout)
-                    )
-                resolver = A2ACardResolver(
-                    httpx_client = httpx_client,
-                    base_url=base_url
-                )
-                # Create A2A client with the agent card
-                config = ClientConfig(
-                    httpx_client=httpx_client,
-                    supported_transports=[
-                        TransportProtocol.jsonrpc,
-                        TransportProtocol.http_json,
-                    ],
-                    use_client_preference=True,
+        exit_stack = AsyncExitStack()
+        try:
+            if httpx_client is None: # 為了統一管理，自行建立httpx_client
+                httpx_client = await exit_stack.enter_async_context(
+                    httpx.AsyncClient(timeout=timeout)
                 )
-                agent_card = await resolver.get_agent_card()
-                factory = ClientFactory(config)
-                a2a_client = factory.create(agent_card)
-
-                # self.exit_stacks[name] = exit_stack
-                # self.clients[name] = a2a_client
-                a2a_agent = A2AAgent(
-                    name = name,
-                    client = a2a_client,
-                    exit_stack = exit_stack,
-                    server_params = {
-                        "base_url": base_url
-                    }
-                )
-                print(f"A2A agent '{name}' connected.")
-                return a2a_agent
-
-            except Exception as e:
+            metrics.track_http_client(f"a2a:{name}", httpx_client)
+            resolver = A2ACardResolver(
+                httpx_client = httpx_client,
+                base_url=base_url
+            )
+            # Create A2A client with the agent card
+            config = ClientConfig(
+                httpx_client=httpx_client,
+                supported_transports=[
+                    TransportProtocol.jsonrpc,
+                    TransportProtocol.http_json,
+                ],
+                use_client_preference=True,
+            )
+            agent_card = await resolver.get_agent_card()
+            # the url is another name of an agent this runtime serves, e.g. behind a proxy
+            target = local_target(agent_card.url)
+            if target is not None:
                 await exit_stack.aclose()
-                print(f"Failed to connect A2A agent '{name}': {e}")
-                raise
-    
+                return await self._register(self._local_agent(name, target, base_url, service))
+            factory = ClientFactory(config)
+            a2a_client = factory.create(agent_card)
+
+            # self.exit_stacks[name] = exit_stack
+            # self.clients[name] = a2a_client
+            a2a_agent = A2AAgent(
+                name = name,
+                client = a2a_client,
+                exit_stack = exit_stack,
+                server_params = {
+                    "base_url": base_url
+                },
+                service = service,
+            )
+        except Exception as e:
+            await exit_stack.aclose()
+            logger.error("Failed to connect A2A agent '%s': %s", name, e, extra={"resource": name})
+            raise
+        registered = await self._register(a2a_agent)
+        if registered is a2a_agent:
+            logger.info("A2A agent '%s' connected.", name, extra={"resource": name})
+        return registered
+
+    async def _register(self, a2a_agent: Union[A2AAgent, LocalA2AAgent]) -> Union[A2AAgent, LocalA2AAgent]:
+        async with self._lock:
+            existing = self.agents.get(a2a_agent.name)
+            if existing is None:
+                self.agents[a2a_agent.name] = a2a_agent
+        if existing is not None:
+            # connected by a concurrent call in the meantime, the first connection is kept
+            await a2a_agent.exit_stack.aclose()
+            return existing
+        return a2a_agent
+
+    def _local_agent(self, name: str, target: str, base_url: str, service: Optional[str]) -> LocalA2AAgent:
+        logger.info("A2A agent '%s' is hosted by this runtime, it is called in process.", name, extra={"resource": name})
+        return LocalA2AAgent(name=name, target=target, server_params={"base_url": base_url}, service=service)
+
+    async def connect_replicas(
+        self, name: str, base_urls: List[str], routing: ReplicaRoutingConfig, timeout: int = 60
+    ) -> ReplicatedA2AAgent:
+        """Connects every replica, the agent is usable as long as one of them is reachable"""
+        results = await asyncio.gather(
+            *(
+                self.connect_a2a(f"{name}#{index}", base_url, timeout=timeout, service=name)
+                for index, base_url in enumerate(base_urls)
+            ),
+            return_exceptions=True,
+        )
+        agents = [result for result in results if isinstance(result, (A2AAgent, LocalA2AAgent))]
+        if not agents:
+            raise RuntimeError(f"None of the replicas of the A2A agent `{name}` is reachable: {results}")
+        for base_url, result in zip(base_urls, results):
+            if not isinstance(result, (A2AAgent, LocalA2AAgent)):
+                logger.warning("Replica %s of '%s' is left out: %s", base_url, name, result, extra={"resource": name})
+        return ReplicatedA2AAgent(name, agents, routing)
+
     def get_client(self, name: str) -> Optional[BaseClient]:
         if self.agents.get(name):
             return (self.agents.get(name)).client
@@ -154,11 +445,16 @@ class A2AClientManager:
             if name in self.agents:
                 await self.agents[name].exit_stack.aclose()
                 del self.agents[name]
-                print(f"A2A client '{name}' disconnected.") # TODO:改成logger
-
-    async def disconnect_all(self):
-        """disconnect all connection"""
-        if not self.agents:
-            return
-        names = list(self.agents.keys())
-        await asyncio.gather(*(self.disconnect(name) for name in names), return_exceptions=True)
+                logger.info("A2A client '%s' disconnected.", name, extra={"resource": name})
+
+    async def disconnect_all(self) -> Dict[str, Optional[str]]:
+        """disconnect all connection, in reverse connection order, and return the error of each agent (or None)"""
+        results: Dict[str, Optional[str]] = {}
+        for name in reversed(list(self.agents.keys())):
+            try:
+                await self.disconnect(name)
+                results[name] = None
+            except Exception as e:
+                results[name] = str(e)
+                logger.error("Failed to disconnect A2A client '%s': %s", name, e, extra={"resource": name})
+        return results
@@ -1,12 +1,30 @@
-from pydantic import BaseModel, constr, field_validator, TypeAdapter, Field
-from typing import Optional, List, Literal, Union, Annotated
+from pydantic import BaseModel, constr, field_validator, model_validator, TypeAdapter, Field
+from typing import Any, Dict, Optional, List, Literal, Union, Annotated
 from pathlib import Path
-import yaml
+import re
+from orchestopia.utils import load_yaml
+
+from orchestopia.runtime.concurrency import ConcurrencyConfig
+from orchestopia.runtime.budget import BudgetConfig
+from orchestopia.runtime.result_limits import ResultLimitConfig
+from orchestopia.runtime.result_cache import ResultCacheConfig
+from orchestopia.memory.config import HistoryConfig
+
+class ToolSelectionConfig(BaseModel):
+    # tools exposed per run, ranked by their relevance to the prompt
+    top_k: int = Field(default=8, ge=1)
+    # tool names exposed on every run
+    always: List[str] = []
+    # adds a `find_tools` tool so the model can ask for the tools left out
+    meta_tool: bool = True
 
 class BaseAgentConfig(BaseModel):
     name: str
-    type: Literal['orchestrator', 'local_subagent', 'a2a_subagent']
+    type: Literal['orchestrator', 'local_subagent', 'a2a_subagent', 'workflow']
     description: str = None
+    concurrency: ConcurrencyConfig = ConcurrencyConfig()
+    # size limit of the answer returned to the calling agent
+    result_limit: Optional[ResultLimitConfig] = None
 
 class LocalAgentConfig(BaseAgentConfig):
     name: str
@@ -18,6 +36,14 @@ class LocalAgentConfig(BaseAgentConfig):
     output_type: List[str] = ["str"]
     toolsets: List[str] = []
     retries: int = 3
+    # the slice of the caller's conversation passed when this agent runs as a sub-agent
+    history: Optional[HistoryConfig] = None
+    # expose only the tools relevant to each run instead of the whole toolsets
+    tool_selection: Optional[ToolSelectionConfig] = None
+    # limits of one run, shared with the sub-agents it calls
+    budget: Optional[BudgetConfig] = None
+    # reuse the answer to a query nearly identical to a recent one, when run as a sub-agent
+    result_cache: Optional[ResultCacheConfig] = None
 
     @field_validator("output_type")
     def check_output_type(cls, output_type):
@@ -33,13 +59,106 @@ class LocalAgentConfig(BaseAgentConfig):
                 raise ValueError('`toolsets` must start with "@mcp_tool:" or "@agent:"')
         return toolsets
 
+class ReplicaRoutingConfig(BaseModel):
+    # hedged: a second replica is called when the first is slow, the first answer wins
+    # round_robin: one replica per call, the next one on failure
+    # broadcast: every replica is called and the answers are merged, e.g. for an ensemble
+    policy: Literal['hedged', 'round_robin', 'broadcast'] = 'hedged'
+    # the hedge is sent once the call is slower than this percentile of the replica's recent latencies
+    hedge_percentile: float = Field(default=95, gt=0, lt=100)
+    # the hedge delay until `min_samples` latencies of the replica are known
+    hedge_delay: float = Field(default=1.0, ge=0)
+    min_samples: int = Field(default=20, ge=1)
+    # the latencies kept per replica
+    window: int = Field(default=200, ge=1)
+    max_hedges: int = Field(default=1, ge=1)
+
 class A2AAgentConfig(BaseAgentConfig):
     name: str
     type: Literal['a2a_subagent']
-    base_url: str
+    base_url: Optional[str] = None
+    # urls of the replicas serving the same agent, `base_url` being the first one
+    replicas: List[str] = []
+    routing: ReplicaRoutingConfig = ReplicaRoutingConfig()
+
+    @model_validator(mode="after")
+    def check_urls(self):
+        if self.base_url is None and not self.replicas:
+            raise ValueError(f"The A2A agent `{self.name}` needs a `base_url` or `replicas`")
+        return self
+
+    @property
+    def urls(self) -> List[str]:
+        return list(dict.fromkeys(([self.base_url] if self.base_url else []) + self.replicas))
+
+# `{{ input }}` or `{{ steps.<step name>.output.<field> }}`
+BINDING_PATTERN = r"\{\{\s*([\w\.]+)\s*\}\}"
+
+def find_step_references(value: Any) -> List[str]:
+    if isinstance(value, str):
+        return [
+            path.split(".")[1]
+            for path in re.findall(BINDING_PATTERN, value)
+            if path.startswith("steps.") and len(path.split(".")) > 1
+        ]
+    elif isinstance(value, dict):
+        return [ref for v in value.values() for ref in find_step_references(v)]
+    elif isinstance(value, list):
+        return [ref for v in value for ref in find_step_references(v)]
+    return []
+
+class WorkflowStepConfig(BaseModel):
+    name: str
+    uses: str
+    # the query sent to an `@agent:` step
+    input: Optional[str] = None
+    # the tool name and arguments of an `@mcp_tool:` step
+    tool: Optional[str] = None
+    args: Dict[str, Any] = {}
+    depends_on: List[str] = []
+
+    @field_validator("uses")
+    def check_uses(cls, uses):
+        if not uses.startswith("@mcp_tool:") and not uses.startswith("@agent:"):
+            raise ValueError('`uses` must start with "@mcp_tool:" or "@agent:"')
+        return uses
+
+    @model_validator(mode="after")
+    def check_step_inputs(cls, step):
+        if step.uses.startswith("@agent:") and step.input is None:
+            raise ValueError(f"The agent step `{step.name}` requires an `input`")
+        if step.uses.startswith("@mcp_tool:") and not step.tool:
+            raise ValueError(f"The MCP tool step `{step.name}` requires a `tool`")
+        return step
+
+    @property
+    def dependencies(self) -> List[str]:
+        refs = find_step_references(self.input) + find_step_references(self.args)
+        return list(dict.fromkeys(self.depends_on + refs))
+
+class WorkflowConfig(BaseAgentConfig):
+    name: str
+    type: Literal['workflow']
+    steps: List[WorkflowStepConfig]
+    # defaults to the output of the last step
+    output: Optional[Any] = None
+
+    @model_validator(mode="after")
+    def check_steps(cls, workflow):
+        names = [step.name for step in workflow.steps]
+        if len(set(names)) != len(names):
+            raise ValueError(f"The workflow `{workflow.name}` has duplicated step names")
+        for step in workflow.steps:
+            for dep in step.dependencies:
+                if dep not in names:
+                    raise ValueError(f"The step `{step.name}` of workflow `{workflow.name}` depends on a non-existent step `{dep}`")
+        for dep in find_step_references(workflow.output):
+            if dep not in names:
+                raise ValueError(f"The output of workflow `{workflow.name}` refers to a non-existent step `{dep}`")
+        return workflow
 
 AgentConfig = Annotated[
-    Union[LocalAgentConfig, A2AAgentConfig],
+    Union[LocalAgentConfig, A2AAgentConfig, WorkflowConfig],
     Field(discriminator="type"),
 ]
 
@@ -53,7 +172,7 @@ class AgentConfigLoader(BaseModel):
         instance = cls()
         # read yaml
         with open(f"{config_path}/agent.yaml") as f:
-            raw_config = yaml.safe_load(f)
+            raw_config = load_yaml(f.read())
         # convert into AgentConfig
         return instance.load_from_dict(raw_config)
 
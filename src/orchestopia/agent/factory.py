@@ -2,9 +2,11 @@ import json
 from typing import Union, Tuple, List, get_args
 from pydantic import BaseModel, Field
 from pydantic_ai import Agent, Tool
+from pydantic_ai.toolsets import AbstractToolset, CombinedToolset
 from pydantic_ai.toolsets.function import FunctionToolset
 from pydantic_ai.tools import ToolFuncContext
 from pydantic_ai.messages import (
+    ModelMessage,
     TextPart, 
     ImageUrl, 
     DocumentUrl, 
@@ -17,10 +19,20 @@ from pydantic_ai.messages import (
 )
 from a2a.types import Message, Task, Part, FileWithBytes, FileWithUri
 
-from orchestopia.utils import get_namespace_and_key
+from orchestopia.utils import get_namespace_and_key, tool_from_schema
 from orchestopia.registry.resource import ResourceRegistry
 from orchestopia.agent.config import AgentConfig
-from orchestopia.agent.a2a_client_manager import A2AClientManager, A2AAgent
+from orchestopia.agent.a2a_client_manager import A2AClientManager, A2AAgent, LocalA2AAgent, ReplicatedA2AAgent
+from orchestopia.agent.workflow import Workflow
+from orchestopia.agent.tool_selection import select_tools
+from orchestopia.memory.history import HistoryBuilder, to_transcript
+from orchestopia.observability.accounting import account_run, account_tool, usage_tracker
+from orchestopia.observability.tracing import span
+from orchestopia.runtime.runner import run_agent
+from orchestopia.runtime.concurrency import concurrency_groups
+from orchestopia.runtime.budget import bind_agent_budget, charge_tool_call
+from orchestopia.runtime.result_limits import bind_result_limit, limit_result, needs_page_tool, page_tool
+from orchestopia.runtime.result_cache import result_caches
 
 VALID_AUDIO_TYPES = get_args(AudioMediaType)
 VALID_IMAGE_TYPES = get_args(ImageMediaType)
@@ -37,12 +49,20 @@ class AgentFactory(BaseModel):
     async def create(
         self, config: AgentConfig, registry: ResourceRegistry
     ) -> Agent:
-        if config.type == "a2a_subagent":
+        concurrency_groups.register_tool(f"agent__{config.name}", config.concurrency)
+        bind_result_limit(f"agent__{config.name}", config.result_limit)
+        if config.type == "a2a_subagent" and len(config.urls) > 1:
+            agent = await self.a2a_client_manager.connect_replicas(config.name, config.urls, config.routing)
+            agent_tool = self.convert_a2a_agent_into_tool(config, agent)
+        elif config.type == "a2a_subagent":
             agent = await self.a2a_client_manager.connect_a2a(
                 name = config.name,
-                base_url = config.base_url,
+                base_url = config.urls[0],
             )
             agent_tool = self.convert_a2a_agent_into_tool(config, agent)
+        elif config.type == "workflow":
+            agent = Workflow(config, registry)
+            agent_tool = self.convert_workflow_into_tool(config, agent)
         else:
             # get extra toolset
             extra_toolset = self._get_tools_for_agent(config, registry)
@@ -50,6 +70,11 @@ class AgentFactory(BaseModel):
             # get output_type
             output_type = self._get_output_type(config, registry)
 
+            # attribute the usage of this agent to its `@model:` reference
+            _, model_name = get_namespace_and_key(config.model)
+            usage_tracker.bind_agent_model(config.name, model_name)
+            bind_agent_budget(config.name, config.budget)
+
             # create agent
             if config.type == "orchestrator":
                 ## TODO: add default tools
@@ -61,6 +86,7 @@ class AgentFactory(BaseModel):
                     system_prompt=config.system_prompt,
                     instructions=config.instructions,
                     output_type=output_type,
+                    retries=config.retries,
                     toolsets= [extra_toolset] if extra_toolset else None #[default_toolset, extra_toolset]
                     # deps_type = 
                 )
@@ -73,13 +99,15 @@ class AgentFactory(BaseModel):
                     system_prompt=config.system_prompt,
                     instructions=config.instructions,
                     output_type=output_type,
+                    retries=config.retries,
                     toolsets= [extra_toolset] if extra_toolset else None
                 )
+                result_caches.bind(config.name, config.result_cache)
                 agent_tool = self.convert_local_agent_into_tool(config, agent)
                 
         return agent, agent_tool
     
-    def _get_tools_for_agent(self, config: AgentConfig, registry: ResourceRegistry) -> FunctionToolset:
+    def _get_tools_for_agent(self, config: AgentConfig, registry: ResourceRegistry) -> AbstractToolset:
         extra_tools = []
         for tool_name in config.toolsets:
             namespapce, tool_name = get_namespace_and_key(tool_name)
@@ -92,6 +120,11 @@ class AgentFactory(BaseModel):
                 if agent_tools:
                     extra_tools += agent_tools
         extra_toolset = FunctionToolset(extra_tools)
+        if config.tool_selection is not None:
+            extra_toolset = select_tools(extra_toolset, config.tool_selection)
+        # oversized results of paginated tools are read through the page tool, never hidden by the tool selection
+        if needs_page_tool(tool.name for tool in extra_tools):
+            extra_toolset = CombinedToolset([extra_toolset, FunctionToolset([page_tool])])
         return extra_toolset
     
     def _get_output_type(self, config: AgentConfig, registry: ResourceRegistry):
@@ -107,20 +140,35 @@ class AgentFactory(BaseModel):
             query: str = Field(description="Specific questions or instructions to be passed to the expert")
 
         # agent execution function
-        async def agent_handler(ctx: ToolFuncContext, query: str) -> str:
+        async def agent_handler(ctx: ToolFuncContext, query: str) -> Union[str, dict]:
+            charge_tool_call(f"agent__{agent.name}")
             deps = ctx.deps if ctx.deps else None
-            result = await agent.run(query, deps = deps)
-            return result.output
+            async with span("agent.call", kind="tool", agent=agent.name), account_tool(f"agent__{agent.name}"):
+                with span("agent.compile_history", kind="internal"):
+                    message_history = self._compile_chat_history(ctx.messages, config)
+                # an answer to the same, or a nearly identical, recent query with the same history
+                history_text = to_transcript(message_history) if message_history else None
+                hit, output = result_caches.lookup(agent.name, query, history_text)
+                if hit:
+                    return output
+                async with concurrency_groups.guard(f"agent__{agent.name}", config.concurrency):
+                    result = await run_agent(agent, query, deps = deps, message_history = message_history)
+            if result.stop_reason is not None:
+                # tell the caller the answer is incomplete
+                return {"partial_output": result.output, "stop_reason": result.stop_reason}
+            output = await limit_result(f"agent__{agent.name}", result.output)
+            result_caches.store(agent.name, query, output, history_text)
+            return output
 
         # convert into tool
-        return Tool.from_schema(
+        return tool_from_schema(
             function = agent_handler,
             name = f"agent__{agent.name}",
             description = config.description,
             json_schema = AgentInput.model_json_schema()
         )
     ## a2a agent
-    def convert_a2a_agent_into_tool(self, config: AgentConfig, agent: A2AAgent) -> Tool:
+    def convert_a2a_agent_into_tool(self, config: AgentConfig, agent: Union[A2AAgent, LocalA2AAgent, ReplicatedA2AAgent]) -> Tool:
         # Input schema
         class AgentInput(BaseModel):
             query: str = Field(description="Specific questions or instructions to be passed to the expert")
@@ -130,25 +178,58 @@ class AgentFactory(BaseModel):
             # TODO: add history
             #history_message
             #context_id
-            raw_response = await agent.run(query = query, context_id = None)
+            charge_tool_call(f"agent__{agent.name}")
+            async with (
+                span("agent.call", kind="tool", agent=agent.name, remote=True),
+                account_tool(f"agent__{agent.name}"),
+                concurrency_groups.guard(f"agent__{agent.name}", config.concurrency),
+                account_run(agent.name, kind = "a2a_agent"),
+            ):
+                raw_response = await agent.run(query = query, context_id = None)
             
             if raw_response:
                 if isinstance(raw_response, str):
                     return [raw_response]
                 elif isinstance(raw_response, Task) or isinstance(raw_response, Message):
-                    context_id, response = self._extract_response_from_task(raw_response)
-                    return response
+                    with span("a2a.extract_response", kind="internal"):
+                        context_id, response = self._extract_response_from_task(raw_response)
+                    return await limit_result(f"agent__{agent.name}", response)
             else:
                 return f"Failed to run the agent."
         
         # convert into tool
-        return Tool.from_schema(
+        return tool_from_schema(
             function = agent_handler,
             name = f"agent__{agent.name}",
             description = config.description,
             json_schema = AgentInput.model_json_schema()
         )
     
+    ## workflow
+    def convert_workflow_into_tool(self, config: AgentConfig, workflow: Workflow) -> Tool:
+        # Input schema
+        class AgentInput(BaseModel):
+            query: str = Field(description="Specific questions or instructions to be passed to the workflow")
+
+        # workflow execution function
+        async def agent_handler(ctx: ToolFuncContext, query: str) -> str:
+            charge_tool_call(f"agent__{workflow.name}")
+            async with (
+                span("agent.call", kind="tool", agent=workflow.name),
+                account_tool(f"agent__{workflow.name}"),
+                concurrency_groups.guard(f"agent__{workflow.name}", config.concurrency),
+            ):
+                result = await workflow.run(query, ctx = ctx)
+            return await limit_result(f"agent__{workflow.name}", result)
+
+        # convert into tool
+        return tool_from_schema(
+            function = agent_handler,
+            name = f"agent__{workflow.name}",
+            description = config.description,
+            json_schema = AgentInput.model_json_schema()
+        )
+    
     def _extract_response_from_task(self, raw_response: Union[Task, Message]) -> Tuple[str, List[UserContent]]:
         context_id = raw_response.context_id
         pydanticai_parts = []
@@ -156,7 +237,7 @@ class AgentFactory(BaseModel):
             for part in raw_response.parts:
                 pydanticai_parts.append(self._a2a_to_pydanticai_part(part))
         elif isinstance(raw_response, Task):
-            for artifact in Task.artifacts:
+            for artifact in raw_response.artifacts or []:
                 for part in artifact.parts:
                     pydanticai_parts.append(self._a2a_to_pydanticai_part(part))
         return context_id, pydanticai_parts
@@ -197,8 +278,10 @@ class AgentFactory(BaseModel):
             raise Exception(f"Cannot parse the part recieved from the A2A agent. Part: {part}")
 
     
-    # TODO: 與memory整合
-    def _compile_chat_history(self, history: list):
-        return
+    def _compile_chat_history(self, history: List[ModelMessage], config: AgentConfig) -> List[ModelMessage] | None:
+        # sub-agents only see a text slice of the caller's conversation, within their own budget
+        if not history or getattr(config, "history", None) is None:
+            return None
+        return HistoryBuilder(config.history).scoped_slice(history) or None
 
         
@@ -4,7 +4,11 @@ from collections import defaultdict, deque
 
 from orchestopia.registry import ResourceRegistry
 from orchestopia.agent.factory import AgentFactory
+from orchestopia.agent.a2a_client_manager import LOCAL_SCHEME
 from orchestopia.agent.config import AgentConfig
+from orchestopia.observability.log import get_logger
+
+logger = get_logger("registry")
 
 class AgentLoader(BaseModel):
     registry: ResourceRegistry
@@ -16,14 +20,14 @@ class AgentLoader(BaseModel):
 
     async def load(self, config: AgentConfig) -> None:
         if config.name in self.registry.agents.snapshot():
-            print(f"Agent `{config.name}` is already in the registry, skip loading...")
+            logger.info("Agent `%s` is already in the registry, skip loading...", config.name, extra={"resource": config.name})
             pass
         else:
             agent, agent_tool = await self.factory.create(config, self.registry)
             self.registry.agents.register(config.name, agent)
             if agent_tool:
                 self.registry.tools.register(f"agent__{config.name}", [agent_tool])
-            print(f"Agent `{config.name}` is registered successfully!")
+            logger.info("Agent `%s` is registered successfully!", config.name, extra={"resource": config.name})
 
     async def load_all(self, configs: list[AgentConfig]) -> None:
         config_map, in_degree, adj = self._check_item_dependency(configs)
@@ -44,7 +48,10 @@ class AgentLoader(BaseModel):
 
         for config in configs:
             if config.type == "a2a_subagent":
-                deps = []
+                # an agent of this runtime called through `local://` is loaded first
+                deps = [url[len(LOCAL_SCHEME):].strip("/") for url in config.urls if url.startswith(LOCAL_SCHEME)]
+            elif config.type == "workflow":
+                deps = [step.uses.split(":")[1].strip() for step in config.steps if step.uses.startswith("@agent:")]
             else:
                 deps = [tool.split(":")[1].strip() for tool in config.toolsets if tool.startswith("@agent:")]
             for dep in deps:
@@ -0,0 +1,130 @@
+import re
+import math
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pydantic_ai import RunContext
+from pydantic_ai.messages import ModelRequest, ToolReturnPart
+from pydantic_ai.toolsets import AbstractToolset, CombinedToolset, FunctionToolset
+from pydantic_ai.toolsets.abstract import ToolsetTool
+from pydantic_ai.toolsets.wrapper import WrapperToolset
+
+from orchestopia.agent.config import ToolSelectionConfig
+
+FIND_TOOLS = "find_tools"
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_CJK = re.compile(r"[\u3400-\u9fff]")
+_TOKEN = re.compile(r"[a-z0-9]+|[\u3400-\u9fff]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Words of latin text, and characters plus bigrams of CJK text"""
+    tokens = _TOKEN.findall(_CAMEL_BOUNDARY.sub(" ", text).lower())
+    # CJK has no spaces, bigrams of adjacent characters keep some of the word order
+    bigrams = [a + b for a, b in zip(tokens, tokens[1:]) if _CJK.fullmatch(a) and _CJK.fullmatch(b)]
+    return tokens + bigrams
+
+
+class BM25Index:
+    def __init__(self, documents: Dict[str, str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.terms: Dict[str, Counter] = {key: Counter(tokenize(text)) for key, text in documents.items()}
+        self.lengths = {key: sum(terms.values()) for key, terms in self.terms.items()}
+        self.avg_length = sum(self.lengths.values()) / len(self.lengths) if self.lengths else 0.0
+        document_frequency = Counter(term for terms in self.terms.values() for term in terms)
+        n = len(self.terms)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def search(self, query: str, k: Optional[int] = None) -> List[Tuple[str, float]]:
+        query_terms = [term for term in set(tokenize(query)) if term in self.idf]
+        scores = []
+        for key, terms in self.terms.items():
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[key] / (self.avg_length or 1))
+            score = sum(
+                self.idf[term] * terms[term] * (self.k1 + 1) / (terms[term] + norm)
+                for term in query_terms
+                if term in terms
+            )
+            if score > 0:
+                scores.append((key, score))
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return scores[:k] if k is not None else scores
+
+
+def _tool_document(tool: ToolsetTool) -> str:
+    tool_def = tool.tool_def
+    parameters = " ".join((tool_def.parameters_json_schema or {}).get("properties", {}).keys())
+    return f"{tool_def.name.replace('__', ' ')} {tool_def.description or ''} {parameters}"
+
+
+def _prompt_text(prompt: Any) -> str:
+    if isinstance(prompt, str):
+        return prompt
+    return " ".join(part for part in prompt or [] if isinstance(part, str))
+
+
+@dataclass
+class SelectedToolset(WrapperToolset):
+    """Only exposes the tools most relevant to the prompt of the run, plus the ones found through `find_tools`"""
+
+    config: ToolSelectionConfig = field(default_factory=ToolSelectionConfig)
+    _index: Optional[BM25Index] = field(default=None, init=False, repr=False)
+    _indexed: frozenset = field(default=frozenset(), init=False, repr=False)
+    _descriptions: Dict[str, str] = field(default_factory=dict, init=False, repr=False)
+
+    async def get_tools(self, ctx: RunContext) -> Dict[str, ToolsetTool]:
+        tools = await super().get_tools(ctx)
+        if len(tools) <= self.config.top_k:
+            return tools
+        index = self._index_for(tools)
+        selected = set(self.config.always) | self._found_tools(ctx)
+        ranked = [name for name, _ in index.search(_prompt_text(ctx.prompt), self.config.top_k)]
+        # nothing matched the prompt, fall back to the declared order
+        selected.update(ranked or list(tools)[: self.config.top_k])
+        return {name: tool for name, tool in tools.items() if name in selected}
+
+    def _index_for(self, tools: Dict[str, ToolsetTool]) -> BM25Index:
+        # the index is rebuilt only when the wrapped tools change
+        names = frozenset(tools)
+        if self._index is None or names != self._indexed:
+            self._index = BM25Index({name: _tool_document(tool) for name, tool in tools.items()})
+            self._indexed = names
+            self._descriptions = {name: tool.tool_def.description or "" for name, tool in tools.items()}
+        return self._index
+
+    def _found_tools(self, ctx: RunContext) -> Set[str]:
+        # the tools returned by `find_tools` earlier in the conversation stay exposed
+        found = set()
+        for message in ctx.messages:
+            if isinstance(message, ModelRequest):
+                for part in message.parts:
+                    if isinstance(part, ToolReturnPart) and part.tool_name == FIND_TOOLS and isinstance(part.content, dict):
+                        found.update(tool["name"] for tool in part.content.get("tools", []))
+        return found
+
+    def find(self, query: str) -> Dict[str, Any]:
+        if self._index is None:
+            return {"tools": []}
+        matches = self._index.search(query, self.config.top_k)
+        return {
+            "tools": [{"name": name, "description": self._descriptions[name]} for name, _ in matches],
+            "note": "The tools listed here can be called from now on." if matches else "No matching tool.",
+        }
+
+
+def select_tools(toolset: AbstractToolset, config: ToolSelectionConfig) -> AbstractToolset:
+    selected = SelectedToolset(toolset, config)
+    if not config.meta_tool:
+        return selected
+
+    async def find_tools(query: str) -> Dict[str, Any]:
+        """Search the tools that are not listed yet by what they should do, the returned tools become callable.
+
+        Args:
+            query: keywords describing the task the tool should handle
+        """
+        return selected.find(query)
+
+    return CombinedToolset([selected, FunctionToolset([find_tools])])
@@ -0,0 +1,152 @@
+import re
+import json
+import asyncio
+from typing import Any, Dict, List, Optional
+from collections import defaultdict, deque
+from pydantic import BaseModel
+from pydantic_ai import Tool, RunContext
+from pydantic_ai.usage import Usage
+
+from orchestopia.utils import get_namespace_and_key
+from orchestopia.registry.resource import ResourceRegistry
+from orchestopia.agent.config import WorkflowConfig, WorkflowStepConfig, BINDING_PATTERN
+from orchestopia.observability.accounting import account_run
+from orchestopia.observability.tracing import span
+from orchestopia.runtime.budget import BudgetExceeded
+
+
+class WorkflowStepError(RuntimeError):
+    pass
+
+
+class Workflow:
+    """A static DAG of agent and tool steps, independent branches run concurrently"""
+
+    def __init__(self, config: WorkflowConfig, registry: ResourceRegistry):
+        self.name = config.name
+        self.config = config
+        self.steps: Dict[str, WorkflowStepConfig] = {step.name: step for step in config.steps}
+        self.order = self._topology_sorting()
+        self.tools: Dict[str, Tool] = {step.name: self._resolve_tool(step, registry) for step in config.steps}
+
+    async def run(self, input: str, deps: Any = None, ctx: Optional[RunContext] = None) -> Any:
+        async with account_run(self.name, kind="workflow"), span("workflow.run", kind="agent", workflow=self.name):
+            return await self.execute(input, deps, ctx)
+
+    async def execute(self, input: str, deps: Any = None, ctx: Optional[RunContext] = None) -> Any:
+        """The steps of `run` without its accounting, for `run_agent` which keeps the account of the run"""
+        # steps receive the context of the caller, or a fresh one when the workflow is run directly
+        ctx = ctx or RunContext(deps=deps, model=None, usage=Usage(), prompt=input)
+        outputs: Dict[str, Any] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        try:
+            async with asyncio.TaskGroup() as task_group:
+                # created in topological order, so dependencies always have a task already
+                for step_name in self.order:
+                    tasks[step_name] = task_group.create_task(
+                        self._run_step(self.steps[step_name], input, outputs, tasks, ctx)
+                    )
+        except BaseExceptionGroup as eg:
+            # report the failing step instead of the cancelled branches
+            raise eg.exceptions[0] from eg
+
+        if self.config.output is None:
+            return outputs[self.config.steps[-1].name]
+        return self._resolve(self.config.output, input, outputs)
+
+    async def _run_step(
+        self,
+        step: WorkflowStepConfig,
+        input: str,
+        outputs: Dict[str, Any],
+        tasks: Dict[str, asyncio.Task],
+        ctx: RunContext,
+    ) -> None:
+        for dep in step.dependencies:
+            await tasks[dep]
+        with span("workflow.resolve_bindings", kind="internal", step=step.name):
+            if step.uses.startswith("@agent:"):
+                args = {"query": self._to_text(self._resolve(step.input, input, outputs))}
+            else:
+                args = self._resolve(step.args, input, outputs)
+        try:
+            async with span("workflow.step", step=step.name, uses=step.uses):
+                outputs[step.name] = await self.tools[step.name].function_schema.call(args, ctx)
+        except BudgetExceeded:
+            # left to the run owning the budget
+            raise
+        except Exception as e:
+            raise WorkflowStepError(f"Step `{step.name}` of workflow `{self.name}` failed: {e}") from e
+
+    def _resolve_tool(self, step: WorkflowStepConfig, registry: ResourceRegistry) -> Tool:
+        namespace, key = get_namespace_and_key(step.uses)
+        if namespace == "agent":
+            tool_name = f"agent__{key}"
+            tools = registry.tools.get(tool_name)
+        else:
+            tool_name = f"{key}__{step.tool}"
+            tools = registry.tools.get(key)
+        for tool in tools or []:
+            if tool.name == tool_name:
+                return tool
+        raise ValueError(f"The step `{step.name}` of workflow `{self.name}` uses an unknown tool `{step.uses}` ({tool_name})")
+
+    def _resolve(self, value: Any, input: str, outputs: Dict[str, Any]) -> Any:
+        if isinstance(value, str):
+            # a single binding keeps the type of the bound value
+            whole = re.fullmatch(BINDING_PATTERN, value.strip())
+            if whole:
+                return self._lookup(whole.group(1), input, outputs)
+            return re.sub(
+                BINDING_PATTERN,
+                lambda match: self._to_text(self._lookup(match.group(1), input, outputs)),
+                value,
+            )
+        elif isinstance(value, dict):
+            return {k: self._resolve(v, input, outputs) for k, v in value.items()}
+        elif isinstance(value, list):
+            return [self._resolve(v, input, outputs) for v in value]
+        return value
+
+    def _lookup(self, path: str, input: str, outputs: Dict[str, Any]) -> Any:
+        keys = path.split(".")
+        if keys[0] == "input":
+            value, keys = input, keys[1:]
+        elif keys[0] == "steps":
+            value, keys = outputs[keys[1]], keys[2:]
+            if keys and keys[0] == "output":
+                keys = keys[1:]
+        else:
+            raise ValueError(f"Unknown binding `{path}` in workflow `{self.name}`")
+        for key in keys:
+            value = value[key] if isinstance(value, dict) else getattr(value, key)
+        return value
+
+    def _to_text(self, value: Any) -> str:
+        if isinstance(value, str):
+            return value
+        elif isinstance(value, BaseModel):
+            return value.model_dump_json()
+        return json.dumps(value, ensure_ascii=False, default=str)
+
+    def _topology_sorting(self) -> List[str]:
+        in_degree = {name: 0 for name in self.steps}
+        adj = defaultdict(list)
+        for step in self.steps.values():
+            for dep in step.dependencies:
+                adj[dep].append(step.name)
+                in_degree[step.name] += 1
+
+        queue = deque([name for name in self.steps if in_degree[name] == 0])
+        sorted_items = []
+        while queue:
+            u_name = queue.popleft()
+            sorted_items.append(u_name)
+            for v_name in adj[u_name]:
+                in_degree[v_name] -= 1
+                if in_degree[v_name] == 0:
+                    queue.append(v_name)
+
+        if len(sorted_items) < len(self.steps):
+            raise ValueError(f"Circular dependency detected in workflow `{self.name}`! Please check the agent configuration files.")
+        return sorted_items
@@ -0,0 +1,79 @@
+from typing import Any, Dict, Optional, Union
+from pydantic_ai import Agent
+
+from orchestopia.registry import ResourceRegistry
+from orchestopia.config_loader import DEFAULT_CACHE_DIR, ConfigLoader
+from orchestopia.output_format import FormatFactory, FormatLoader
+from orchestopia.model import ModelFactory, ModelLoader
+from orchestopia.mcp_tool import MCPToolConfigLoader, MCPToolFactory, MCPToolLoader, MCPSessionManager
+from orchestopia.agent import AgentFactory, AgentLoader, A2AClientManager, Workflow
+from orchestopia.runtime.lifecycle import ShutdownReport, lifecycle
+
+
+class OrchestopiaApp:
+    """Builds every resource of a config directory into one registry and owns their connections"""
+
+    def __init__(
+        self,
+        config_path: str = "config",
+        registry: Optional[ResourceRegistry] = None,
+        mcp_tool_overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+        config_cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    ):
+        self.config_path = config_path
+        # validated configs are cached there by content hash, None keeps them in memory only
+        self.config_cache_dir = config_cache_dir
+        self.registry = registry or ResourceRegistry()
+        # replaces MCP tool configs by name, e.g. to reach stdio servers through a shared proxy
+        self.mcp_tool_overrides = mcp_tool_overrides or {}
+        self.mcp_session_manager = MCPSessionManager()
+        self.a2a_client_manager = A2AClientManager()
+
+    async def start(self) -> "OrchestopiaApp":
+        lifecycle.open()
+        configs = ConfigLoader(self.config_path, self.config_cache_dir).load()
+        # formats and models first, agents last since they refer to every other resource
+        FormatLoader(registry=self.registry, factory=FormatFactory()).load_all(configs.formats)
+        ModelLoader(registry=self.registry, factory=ModelFactory()).load_all(configs.models)
+        mcp_tool_configs = configs.mcp_tools
+        if self.mcp_tool_overrides:
+            overrides = {
+                config.name: config
+                for config in MCPToolConfigLoader().load_from_dict({"mcp_tools": list(self.mcp_tool_overrides.values())})
+            }
+            mcp_tool_configs = [overrides.get(config.name, config) for config in mcp_tool_configs]
+        await MCPToolLoader(
+            registry=self.registry,
+            factory=MCPToolFactory(mcp_session_manager=self.mcp_session_manager),
+        ).load_all(mcp_tool_configs)
+        await AgentLoader(
+            registry=self.registry,
+            factory=AgentFactory(a2a_client_manager=self.a2a_client_manager),
+        ).load_all(configs.agents)
+        return self
+
+    def get_agent(self, name: str) -> Union[Agent, Workflow]:
+        """An agent or a workflow, both run with `run_agent`"""
+        agent = self.registry.agents.get(name)
+        if agent is None:
+            raise KeyError(f"Agent `{name}` is not registered")
+        if not isinstance(agent, (Agent, Workflow)):
+            raise TypeError(f"`{name}` is an A2A agent, it is called through its `@agent:` tool")
+        return agent
+
+    async def close(self, drain_timeout: Optional[float] = 30.0) -> ShutdownReport:
+        """Stop admitting runs, wait up to `drain_timeout` seconds for the calls in flight, then close
+
+        Closed in reverse dependency order: the runs still going are cancelled first, then the A2A
+        clients and the MCP sessions they were calling. The report lists what was aborted.
+        """
+        report = await lifecycle.drain(drain_timeout)
+        report.close_results("a2a", await self.a2a_client_manager.disconnect_all())
+        report.close_results("mcp", await self.mcp_session_manager.disconnect_all())
+        return report
+
+    async def __aenter__(self) -> "OrchestopiaApp":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
@@ -0,0 +1,3 @@
+from .runner import BatchRunner, BatchSummary
+
+__all__ = ["BatchRunner", "BatchSummary"]
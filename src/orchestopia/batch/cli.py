@@ -0,0 +1,114 @@
+import json
+import asyncio
+import argparse
+from functools import partial
+from typing import Any, Dict, Optional
+
+from orchestopia.app import OrchestopiaApp
+from orchestopia.supervisor import Supervisor
+from orchestopia.observability.tracing import JsonlSpanExporter, tracer
+from orchestopia.observability.profiling import profiler
+from orchestopia.observability.log import configure_logging, shutdown_logging
+from orchestopia.observability.metrics import MetricsServer
+from orchestopia.batch.runner import BatchRunner, BatchSummary
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m orchestopia.batch",
+        description="Run an agent over every line of a JSONL file",
+    )
+    parser.add_argument("--config", default="config", help="directory holding the yaml config files")
+    parser.add_argument("--agent", required=True, help="name of the agent to run")
+    parser.add_argument("--input", required=True, help="input JSONL file")
+    parser.add_argument("--output", required=True, help="output JSONL file, also used to resume")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent runs per worker")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes, each one takes a shard of the input")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--prompt-field", default="prompt")
+    parser.add_argument("--prompt-template", default=None, help='e.g. "{title}\\n\\n{body}", overrides --prompt-field')
+    parser.add_argument("--no-retry-failed", action="store_true", help="do not run failed items again on resume")
+    parser.add_argument(
+        "--no-shared-mcp", action="store_true", help="let every worker spawn its own stdio MCP servers"
+    )
+    parser.add_argument("--trace", default=None, help="append the tracing spans of every run to this JSONL file")
+    parser.add_argument("--profile-rate", type=float, default=0.0, help="fraction of the runs to profile")
+    parser.add_argument("--profile-dir", default="profiles", help="where the profiling reports are written")
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--log-json", action="store_true", help="write the logs as JSON lines")
+    parser.add_argument(
+        "--metrics-port", type=int, default=None,
+        help="serve OpenMetrics on this port, workers use the following ports",
+    )
+    return parser.parse_args(argv)
+
+
+async def run_shard(
+    args: argparse.Namespace,
+    shard_index: int = 0,
+    shard_count: int = 1,
+    mcp_tool_overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> dict:
+    configure_logging(args.log_level, json_format=args.log_json)
+    if args.trace:
+        tracer.add_exporter(JsonlSpanExporter(args.trace))
+    profiler.configure(sample_rate=args.profile_rate, output_dir=args.profile_dir)
+    metrics_server = None
+    if args.metrics_port is not None:
+        metrics_server = await MetricsServer(port=args.metrics_port + shard_index).start()
+    try:
+        return await _run_batch(args, shard_index, shard_count, mcp_tool_overrides)
+    finally:
+        if metrics_server is not None:
+            await metrics_server.close()
+        tracer.shutdown()
+        shutdown_logging()
+
+
+async def _run_batch(
+    args: argparse.Namespace,
+    shard_index: int,
+    shard_count: int,
+    mcp_tool_overrides: Optional[Dict[str, Dict[str, Any]]],
+) -> dict:
+    async with OrchestopiaApp(args.config, mcp_tool_overrides=mcp_tool_overrides) as app:
+        runner = BatchRunner(
+            agent=app.get_agent(args.agent),
+            concurrency=args.concurrency,
+            id_field=args.id_field,
+            prompt_field=args.prompt_field,
+            prompt_template=args.prompt_template,
+            shard_index=shard_index,
+            shard_count=shard_count,
+            retry_failed=not args.no_retry_failed,
+        )
+        summary = await runner.run(args.input, args.output)
+    return summary.as_dict()
+
+
+def _run_shard_process(
+    args: argparse.Namespace, shard_index: int, shard_count: int, mcp_tool_overrides: Dict[str, Dict[str, Any]]
+) -> dict:
+    return asyncio.run(run_shard(args, shard_index, shard_count, mcp_tool_overrides))
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    if args.workers <= 1:
+        summary = asyncio.run(run_shard(args))
+    else:
+        # every worker builds its own runtime and appends to the shared output file,
+        # stdio MCP servers are hosted once by the supervisor
+        supervisor = Supervisor(args.config, args.workers, share_stdio_mcp=not args.no_shared_mcp)
+        shards = asyncio.run(supervisor.run(partial(_run_shard_process, args)))
+        total = BatchSummary()
+        for shard in shards:
+            total.total += shard["total"]
+            total.succeeded += shard["succeeded"]
+            total.failed += shard["failed"]
+            total.skipped += shard["skipped"]
+            total.duration = max(total.duration, shard["duration"])
+            for key, value in shard["usage"].items():
+                total.usage[key] = total.usage.get(key, 0) + value
+        summary = total.as_dict()
+    print(json.dumps(summary, ensure_ascii=False))
@@ -0,0 +1,161 @@
+import json
+import time
+import asyncio
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+from pydantic_core import to_jsonable_python
+from pydantic_ai import Agent
+
+from orchestopia.model.scheduler import model_priority
+from orchestopia.runtime.runner import run_agent
+from orchestopia.observability.log import get_logger
+
+logger = get_logger("batch")
+
+
+@dataclass
+class BatchSummary:
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+    duration: float = 0.0
+    usage: Dict[str, int] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            "total": self.total,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "duration": self.duration,
+            "usage": self.usage,
+        }
+
+
+class BatchRunner:
+    """Runs an agent over a JSONL file, the output file doubles as the checkpoint to resume from"""
+
+    def __init__(
+        self,
+        agent: Agent,
+        concurrency: int = 4,
+        id_field: str = "id",
+        prompt_field: str = "prompt",
+        prompt_template: Optional[str] = None,
+        shard_index: int = 0,
+        shard_count: int = 1,
+        retry_failed: bool = True,
+    ):
+        self.agent = agent
+        self.concurrency = concurrency
+        self.id_field = id_field
+        self.prompt_field = prompt_field
+        self.prompt_template = prompt_template
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.retry_failed = retry_failed
+
+    def iter_inputs(self, input_path: str) -> Iterator[Tuple[str, str]]:
+        with open(input_path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f):
+                if not line.strip() or line_number % self.shard_count != self.shard_index:
+                    continue
+                record = json.loads(line)
+                item_id = str(record.get(self.id_field, line_number))
+                if self.prompt_template:
+                    prompt = self.prompt_template.format(**record)
+                else:
+                    prompt = record[self.prompt_field]
+                yield item_id, prompt
+
+    def load_completed(self, output_path: str) -> Set[str]:
+        completed: Set[str] = set()
+        if not Path(output_path).exists():
+            return completed
+        with open(output_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut by a crash, the item is simply run again
+                if record.get("error") is None or not self.retry_failed:
+                    completed.add(record["id"])
+        return completed
+
+    async def run(self, input_path: str, output_path: str) -> BatchSummary:
+        summary = BatchSummary()
+        completed = self.load_completed(output_path)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        start = time.perf_counter()
+
+        # unbuffered appends: every record is a single write, so shards can share the output file
+        with open(output_path, "ab", buffering=0) as output_file:
+            if self.shard_index == 0 and output_file.tell() and not self._ends_with_newline(output_path):
+                # terminate the line cut by a crash, it is skipped when resuming
+                output_file.write(b"\n")
+            async def worker():
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        return
+                    record = await self._run_item(*item)
+                    summary.succeeded += record["error"] is None
+                    summary.failed += record["error"] is not None
+                    for key, value in record.get("usage", {}).items():
+                        if isinstance(value, int):
+                            summary.usage[key] = summary.usage.get(key, 0) + value
+                    # one complete line per finished item, a crash loses at most the running items
+                    output_file.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+
+            # batch traffic yields to interactive traffic on scheduled models
+            with model_priority("batch"):
+                try:
+                    # a worker dying cancels the producer, instead of leaving it blocked on a full queue
+                    async with asyncio.TaskGroup() as task_group:
+                        for _ in range(self.concurrency):
+                            task_group.create_task(worker())
+                        # inputs are streamed, at most `2 * concurrency` items are waiting in memory
+                        for item_id, prompt in self.iter_inputs(input_path):
+                            summary.total += 1
+                            if item_id in completed:
+                                summary.skipped += 1
+                                continue
+                            await queue.put((item_id, prompt))
+                        for _ in range(self.concurrency):
+                            await queue.put(None)
+                except BaseExceptionGroup as eg:
+                    raise eg.exceptions[0] from eg
+
+        summary.duration = time.perf_counter() - start
+        return summary
+
+    def _ends_with_newline(self, output_path: str) -> bool:
+        with open(output_path, "rb") as f:
+            f.seek(-1, 2)
+            return f.read(1) == b"\n"
+
+    async def _run_item(self, item_id: str, prompt: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            result = await run_agent(self.agent, prompt)
+            return {
+                "id": item_id,
+                # any output the record can hold, e.g. dates, dataclasses or lists of models
+                "output": to_jsonable_python(result.output),
+                "usage": result.account.totals().as_dict(),
+                "duration": time.perf_counter() - start,
+                "error": None,
+            }
+        except Exception as e:
+            logger.warning(
+                "Item `%s` failed: %s", item_id, e,
+                extra={"resource": self.agent.name, "item_id": item_id, "duration": time.perf_counter() - start},
+            )
+            return {
+                "id": item_id,
+                "output": None,
+                "duration": time.perf_counter() - start,
+                "error": f"{type(e).__name__}: {e}",
+            }
@@ -0,0 +1,8 @@
+from .fakes import LocalServer, build_mcp_server, local_a2a_agent, local_mcp_server, scripted_model
+from .runner import BenchResult, Regression, compare, measure, percentile
+from .scenarios import SCENARIOS
+
+__all__ = [
+    "LocalServer", "build_mcp_server", "local_a2a_agent", "local_mcp_server", "scripted_model",
+    "BenchResult", "Regression", "compare", "measure", "percentile", "SCENARIOS",
+]
@@ -0,0 +1,63 @@
+import sys
+import json
+import asyncio
+import argparse
+from typing import Dict, List
+
+from orchestopia.bench.runner import compare, measure
+from orchestopia.bench.scenarios import MAX_ITERATIONS, SCENARIOS, SERIAL
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m orchestopia.bench",
+        description="Measure the overhead of Orchestopia against local stand-ins of the models, MCP servers and A2A agents",
+    )
+    parser.add_argument(
+        "--scenario", action="append", choices=sorted(SCENARIOS), default=None,
+        help="scenario to run, repeat for several, every scenario by default",
+    )
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1, help="operations in flight")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed operations run first")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file, e.g. to use as a baseline")
+    parser.add_argument("--baseline", default=None, help="JSON file of earlier results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="slowdown allowed before a regression is reported")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, dict]:
+    results = {}
+    for name in args.scenario or list(SCENARIOS):
+        iterations = min(args.iterations, MAX_ITERATIONS.get(name, args.iterations))
+        concurrency = 1 if name in SERIAL else args.concurrency
+        async with SCENARIOS[name]() as operation:
+            result = await measure(name, operation, iterations, concurrency, min(args.warmup, iterations))
+        results[name] = result.as_dict()
+        _print_row(results[name])
+    return results
+
+
+def _print_row(result: dict) -> None:
+    print(
+        f"{result['scenario']:<28} {result['ops_per_sec']:>9.1f} ops/s"
+        f"  p50 {result['p50'] * 1000:>8.2f}ms  p95 {result['p95'] * 1000:>8.2f}ms  p99 {result['p99'] * 1000:>8.2f}ms"
+        f"  errors {result['errors']}",
+        flush=True,
+    )
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions: List = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,141 @@
+import sys
+import socket
+import asyncio
+from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import uvicorn
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, ToolCallPart, ToolReturnPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.usage import Usage
+from a2a.server.apps import A2AStarletteApplication
+from a2a.server.agent_execution import AgentExecutor, RequestContext
+from a2a.server.events import EventQueue
+from a2a.server.request_handlers import DefaultRequestHandler
+from a2a.server.tasks import InMemoryTaskStore
+from a2a.types import AgentCapabilities, AgentCard, AgentSkill
+from a2a.utils import new_agent_text_message
+
+from orchestopia.bench import mcp_server
+from orchestopia.bench.mcp_server import build_mcp_server
+
+# tools the scripted model never calls by itself
+_META_TOOLS = ("find_tools", "read_result_page")
+
+
+def _fake_args(schema: Dict[str, Any], text: str) -> Dict[str, Any]:
+    values = {"string": text, "integer": 1, "number": 1.0, "boolean": True, "array": [], "object": {}}
+    properties = schema.get("properties", {})
+    return {name: values.get(properties.get(name, {}).get("type"), text) for name in schema.get("required", [])}
+
+
+def scripted_model(latency: float = 0.0, tokens: int = 20, tools: Optional[List[str]] = None) -> FunctionModel:
+    """A model calling every tool it is given (or the ones in `tools`) once, then answering with what they returned
+
+    `latency` is slept on every request, `tokens` is the usage reported for it.
+    """
+
+    async def respond(messages: List[ModelMessage], info: AgentInfo) -> ModelResponse:
+        if latency:
+            await asyncio.sleep(latency)
+        usage = Usage(requests=1, request_tokens=tokens, response_tokens=tokens // 4, total_tokens=tokens + tokens // 4)
+        last = messages[-1].parts
+        returns = [part for part in last if isinstance(part, ToolReturnPart)]
+        if returns:
+            content = "; ".join(str(part.content)[:200] for part in returns)
+            return ModelResponse(parts=[TextPart(f"done: {content}")], usage=usage)
+        prompt = str(last[-1].content)
+        calls = [
+            ToolCallPart(tool.name, _fake_args(tool.parameters_json_schema, prompt))
+            for tool in info.function_tools
+            if tool.name not in _META_TOOLS and (tools is None or tool.name in tools)
+        ]
+        return ModelResponse(parts=calls or [TextPart(f"answer: {prompt}")], usage=usage)
+
+    return FunctionModel(respond)
+
+
+class LocalServer:
+    """Serves an ASGI app on an ephemeral localhost port of the running event loop"""
+
+    def __init__(self, app_factory: Callable[[str], Any]):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(("127.0.0.1", 0))
+        # the app may need its own url, e.g. in the A2A agent card
+        self.base_url = f"http://127.0.0.1:{self._socket.getsockname()[1]}"
+        self._server = uvicorn.Server(uvicorn.Config(app_factory(self.base_url), log_level="warning", lifespan="on"))
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "LocalServer":
+        self._task = asyncio.create_task(self._server.serve(sockets=[self._socket]))
+        while not self._server.started:
+            if self._task.done():
+                self._task.result()
+            await asyncio.sleep(0.01)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._server.should_exit = True
+        await self._task
+        self._socket.close()
+
+
+@asynccontextmanager
+async def local_mcp_server(transport: str = "stdio", name: str = "bench") -> AsyncIterator[Dict[str, Any]]:
+    """Yields the config of a local MCP server for the transport, stdio servers run in a child process"""
+    if transport == "stdio":
+        yield {
+            "name": name,
+            "type": "stdio",
+            "command": sys.executable,
+            "args": str(Path(mcp_server.__file__).resolve()),
+        }
+        return
+    server = build_mcp_server()
+    if transport == "sse":
+        app, path = server.sse_app(), "/sse"
+    elif transport == "streamable-http":
+        app, path = server.streamable_http_app(), "/mcp"
+    else:
+        raise ValueError(f"Unknown MCP transport: {transport}")
+    async with LocalServer(lambda _: app) as local:
+        yield {"name": name, "type": transport, "url": f"{local.base_url}{path}"}
+
+
+class _AgentExecutor(AgentExecutor):
+    def __init__(self, agent: Agent):
+        self.agent = agent
+
+    async def execute(self, context: RequestContext, event_queue: EventQueue) -> None:
+        result = await self.agent.run(context.get_user_input())
+        # answered with a message, so the caller does not poll a task
+        await event_queue.enqueue_event(new_agent_text_message(str(result.output), context_id=context.context_id))
+
+    async def cancel(self, context: RequestContext, event_queue: EventQueue) -> None:
+        raise NotImplementedError("The bench agent can't cancel a run")
+
+
+@asynccontextmanager
+async def local_a2a_agent(name: str = "bench_a2a", model: Optional[FunctionModel] = None) -> AsyncIterator[str]:
+    """Yields the base url of a local A2A server answering with a pydantic-ai agent"""
+    agent = Agent(model or scripted_model(), name=name, instructions="Answer the question.")
+
+    def build_app(base_url: str):
+        card = AgentCard(
+            name=name,
+            description="Local A2A agent for the benchmarks",
+            url=f"{base_url}/",
+            version="0.1.0",
+            capabilities=AgentCapabilities(streaming=False),
+            default_input_modes=["text/plain"],
+            default_output_modes=["text/plain"],
+            skills=[AgentSkill(id="answer", name="answer", description="Answer the question", tags=["bench"])],
+        )
+        handler = DefaultRequestHandler(agent_executor=_AgentExecutor(agent), task_store=InMemoryTaskStore())
+        return A2AStarletteApplication(agent_card=card, http_handler=handler).build()
+
+    async with LocalServer(build_app) as local:
+        yield local.base_url
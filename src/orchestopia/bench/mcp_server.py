@@ -0,0 +1,22 @@
+from mcp.server.fastmcp import FastMCP
+
+
+def build_mcp_server() -> FastMCP:
+    server = FastMCP("bench", log_level="WARNING")
+
+    @server.tool()
+    def echo(text: str) -> str:
+        """Return the given text"""
+        return text
+
+    @server.tool()
+    def payload(size: int = 1024) -> str:
+        """Return `size` characters, to measure large results"""
+        return "x" * size
+
+    return server
+
+
+if __name__ == "__main__":
+    # run as a script by the stdio config of `local_mcp_server`, without importing orchestopia
+    build_mcp_server().run()
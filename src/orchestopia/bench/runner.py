@@ -0,0 +1,94 @@
+import math
+import time
+import asyncio
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from orchestopia.utils import percentile
+
+
+@dataclass
+class BenchResult:
+    scenario: str
+    iterations: int
+    concurrency: int
+    duration: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "scenario": self.scenario,
+            "iterations": self.iterations,
+            "concurrency": self.concurrency,
+            "errors": self.errors,
+            "ops_per_sec": len(self.latencies) / self.duration if self.duration else 0.0,
+            "mean": sum(self.latencies) / len(self.latencies) if self.latencies else 0.0,
+            "p50": percentile(self.latencies, 50),
+            "p95": percentile(self.latencies, 95),
+            "p99": percentile(self.latencies, 99),
+            "max": max(self.latencies, default=0.0),
+        }
+
+
+async def measure(
+    scenario: str,
+    operation: Callable[[], Awaitable[object]],
+    iterations: int = 100,
+    concurrency: int = 1,
+    warmup: int = 5,
+) -> BenchResult:
+    """Time `iterations` calls of `operation` with at most `concurrency` in flight, after `warmup` untimed calls"""
+    for _ in range(warmup):
+        await operation()
+    result = BenchResult(scenario, iterations, concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await operation()
+            except Exception:
+                result.errors += 1
+                return
+            result.latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed() for _ in range(iterations)))
+    result.duration = time.perf_counter() - started
+    return result
+
+
+@dataclass
+class Regression:
+    scenario: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        return (self.current - self.baseline) / self.baseline if self.baseline else math.inf
+
+    def __str__(self) -> str:
+        return f"{self.scenario}: {self.metric} {self.baseline:.6g} -> {self.current:.6g} ({self.change:+.1%})"
+
+
+def compare(
+    current: Dict[str, dict], baseline: Dict[str, dict], tolerance: float = 0.1
+) -> List[Regression]:
+    """Scenarios slower than the baseline by more than `tolerance`, scenarios missing on either side are skipped"""
+    regressions = []
+    for scenario, result in current.items():
+        reference: Optional[dict] = baseline.get(scenario)
+        if reference is None:
+            continue
+        for metric in ("p50", "p95"):
+            if result[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(Regression(scenario, metric, reference[metric], result[metric]))
+        if result["ops_per_sec"] < reference["ops_per_sec"] * (1 - tolerance):
+            regressions.append(Regression(scenario, "ops_per_sec", reference["ops_per_sec"], result["ops_per_sec"]))
+        if result["errors"] > reference["errors"]:
+            regressions.append(Regression(scenario, "errors", reference["errors"], result["errors"]))
+    return regressions
@@ -0,0 +1,139 @@
+import tempfile
+from functools import partial
+from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import yaml
+
+from orchestopia.app import OrchestopiaApp
+from orchestopia.registry import ResourceRegistry
+from orchestopia.observability.tracing import TracedModel
+from orchestopia.runtime.budget import BudgetedModel
+from orchestopia.mcp_tool import MCPToolConfigLoader, MCPToolFactory, MCPToolLoader, MCPSessionManager
+from orchestopia.agent import AgentConfigLoader, AgentFactory, AgentLoader, A2AClientManager
+from orchestopia.runtime import lifecycle, run_agent
+from orchestopia.bench.fakes import local_a2a_agent, local_mcp_server, scripted_model
+
+Operation = Callable[[], Awaitable[object]]
+# a scenario sets up its stand-ins and yields the operation to time
+Scenario = Callable[[], AsyncIterator[Operation]]
+
+MODEL = "bench_model"
+
+
+def _clean(registry: ResourceRegistry) -> None:
+    # the registries are shared by every app of the process
+    for resources in (registry.formats, registry.models, registry.tools, registry.agents):
+        resources.cleanup()
+
+
+@asynccontextmanager
+async def _runtime(
+    agents: List[dict], mcp_tools: List[dict] = (), latency: float = 0.0, tools: Optional[List[str]] = None
+) -> AsyncIterator[ResourceRegistry]:
+    registry = ResourceRegistry()
+    _clean(registry)
+    # admits runs again after an app closed, like `OrchestopiaApp.start`
+    lifecycle.open()
+    # wrapped like a configured model (see `ModelFactory`), so the budget and tracing layers are measured too
+    registry.models.register(MODEL, TracedModel(BudgetedModel(scripted_model(latency, tools=tools)), MODEL))
+    mcp_session_manager, a2a_client_manager = MCPSessionManager(), A2AClientManager()
+    try:
+        await MCPToolLoader(
+            registry=registry, factory=MCPToolFactory(mcp_session_manager=mcp_session_manager)
+        ).load_all(MCPToolConfigLoader().load_from_dict({"mcp_tools": list(mcp_tools)}))
+        await AgentLoader(
+            registry=registry, factory=AgentFactory(a2a_client_manager=a2a_client_manager)
+        ).load_all(AgentConfigLoader().load_from_dict({"agents": agents}))
+        yield registry
+    finally:
+        await a2a_client_manager.disconnect_all()
+        await mcp_session_manager.disconnect_all()
+        _clean(registry)
+
+
+def _agent(name: str, toolsets: List[str] = (), type: str = "local_subagent") -> dict:
+    return {
+        "name": name,
+        "type": type,
+        "model": f"@model:{MODEL}",
+        "description": f"{name} of the benchmark",
+        "instructions": "Answer the question.",
+        "toolsets": list(toolsets),
+    }
+
+
+@asynccontextmanager
+async def cold_start(agents: int = 5, transport: str = "stdio") -> AsyncIterator[Operation]:
+    """Build and close an app from a config directory: yaml parsing, every factory and the MCP connection"""
+    async with local_mcp_server(transport) as mcp_tool:
+        with tempfile.TemporaryDirectory() as config_dir:
+            sub_agents = [_agent(f"agent_{i}", ["@mcp_tool:bench"]) for i in range(agents)]
+            orchestrator = _agent("orchestrator", [f"@agent:agent_{i}" for i in range(agents)], type="orchestrator")
+            files = {
+                "format.yaml": {"formats": []},
+                "model.yaml": {"models": [{
+                    "display_name": MODEL,
+                    "model_name": MODEL,
+                    "type": "completions",
+                    "provider": {"base_url": "http://127.0.0.1:9/v1", "api_key": "bench"},
+                }]},
+                "mcp_tool.yaml": {"mcp_tools": [mcp_tool]},
+                "agent.yaml": {"agents": sub_agents + [orchestrator]},
+            }
+            for name, content in files.items():
+                Path(config_dir, name).write_text(yaml.safe_dump(content))
+
+            async def operation():
+                _clean(ResourceRegistry())
+                async with OrchestopiaApp(config_dir):
+                    pass
+
+            yield operation
+            _clean(ResourceRegistry())
+
+
+@asynccontextmanager
+async def tool_calls(transport: str = "stdio", latency: float = 0.0) -> AsyncIterator[Operation]:
+    """One agent run calling one MCP tool: two model requests and a tool round-trip over `transport`"""
+    async with local_mcp_server(transport) as mcp_tool:
+        agents = [_agent("orchestrator", ["@mcp_tool:bench"], type="orchestrator")]
+        async with _runtime(agents, [{**mcp_tool, "pool_size": 4}], latency, tools=["bench__echo"]) as registry:
+            yield partial(run_agent, registry.agents.get("orchestrator"), "ping", profile=False)
+
+
+@asynccontextmanager
+async def nested(depth: int = 3, latency: float = 0.0) -> AsyncIterator[Operation]:
+    """A chain of `depth` sub-agents under the orchestrator, each one calling the next"""
+    agents = [_agent(f"level_{i}", [f"@agent:level_{i + 1}"] if i + 1 < depth else []) for i in range(depth)]
+    agents.append(_agent("orchestrator", ["@agent:level_0"], type="orchestrator"))
+    async with _runtime(agents, latency=latency) as registry:
+        yield partial(run_agent, registry.agents.get("orchestrator"), "ping", profile=False)
+
+
+@asynccontextmanager
+async def a2a_roundtrip(latency: float = 0.0) -> AsyncIterator[Operation]:
+    """An orchestrator calling a local A2A agent, which answers with a message"""
+    async with local_a2a_agent("bench_a2a", scripted_model(latency)) as base_url:
+        agents = [
+            {"name": "bench_a2a", "type": "a2a_subagent", "base_url": base_url, "description": "Remote agent of the benchmark"},
+            _agent("orchestrator", ["@agent:bench_a2a"], type="orchestrator"),
+        ]
+        async with _runtime(agents, latency=latency) as registry:
+            yield partial(run_agent, registry.agents.get("orchestrator"), "ping", profile=False)
+
+
+SCENARIOS: Dict[str, Callable[[], Scenario]] = {
+    "cold_start": cold_start,
+    "tool_calls:stdio": partial(tool_calls, "stdio"),
+    "tool_calls:sse": partial(tool_calls, "sse"),
+    "tool_calls:streamable-http": partial(tool_calls, "streamable-http"),
+    "nested:1": partial(nested, 1),
+    "nested:3": partial(nested, 3),
+    "nested:5": partial(nested, 5),
+    "a2a_roundtrip": a2a_roundtrip,
+}
+# every app of the process shares the registries, so cold starts run one at a time
+SERIAL = {"cold_start"}
+MAX_ITERATIONS = {"cold_start": 10}
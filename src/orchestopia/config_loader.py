@@ -0,0 +1,254 @@
+import os
+import sys
+import json
+import glob
+import pickle
+import hashlib
+import inspect
+import tempfile
+import functools
+import warnings
+import multiprocessing
+from pathlib import Path
+from types import ModuleType
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, get_args
+import pydantic
+from pydantic import TypeAdapter
+from pydantic.json_schema import PydanticJsonSchemaWarning
+
+from orchestopia.utils import load_yaml
+from orchestopia.output_format.config import FormatConfig, FormatConfigLoader
+from orchestopia.model.config import ModelConfig, ModelConfigLoader
+from orchestopia.mcp_tool.config import MCPToolConfig, MCPToolConfigLoader
+from orchestopia.agent.config import AgentConfig, AgentConfigLoader
+from orchestopia.observability.log import get_logger
+from orchestopia.observability.metrics import record_cache
+
+logger = get_logger("registry")
+
+# the files read from the config directory, any of them may hold every section and `include:` more files
+ROOT_FILES = ["format.yaml", "model.yaml", "mcp_tool.yaml", "agent.yaml", "orchestopia.yaml"]
+# section -> (loader, the key its names must be unique on)
+SECTIONS = {
+    "formats": (FormatConfigLoader, "display_name"),
+    "models": (ModelConfigLoader, "display_name"),
+    "mcp_tools": (MCPToolConfigLoader, "name"),
+    "agents": (AgentConfigLoader, "name"),
+}
+DEFAULT_CACHE_DIR = os.environ.get("ORCHESTOPIA_CACHE_DIR", str(Path.home() / ".cache" / "orchestopia"))
+
+
+@dataclass
+class ConfigBundle:
+    formats: List[FormatConfig] = field(default_factory=list)
+    models: List[ModelConfig] = field(default_factory=list)
+    mcp_tools: List[MCPToolConfig] = field(default_factory=list)
+    agents: List[AgentConfig] = field(default_factory=list)
+
+
+@dataclass
+class ConfigShard:
+    """The validated configs of one file"""
+    path: str
+    digest: str
+    # glob patterns relative to the directory of the file
+    includes: List[str] = field(default_factory=list)
+    sections: Dict[str, list] = field(default_factory=dict)
+
+
+def _config_modules(annotation: Any, modules: Dict[str, ModuleType]) -> None:
+    """The modules defining the models reachable from a config type, with their validators"""
+    for arg in get_args(annotation):
+        _config_modules(arg, modules)
+    if not (isinstance(annotation, type) and issubclass(annotation, pydantic.BaseModel)):
+        return
+    for cls in annotation.__mro__:
+        module = sys.modules.get(cls.__module__)
+        # pydantic's own models are covered by its version
+        if module is None or not cls.__module__.startswith("orchestopia.") or cls.__module__ in modules:
+            continue
+        modules[cls.__module__] = module
+        for model in vars(module).values():
+            if isinstance(model, type) and issubclass(model, pydantic.BaseModel) and model.__module__ == cls.__module__:
+                for model_field in model.model_fields.values():
+                    _config_modules(model_field.annotation, modules)
+
+
+@functools.lru_cache(maxsize=None)
+def _schema_fingerprint() -> bytes:
+    # validated configs cached by an older version of the config classes must not be reused, unpickling
+    # skips the validation. The schemas cover the nested models too, wherever they are defined, the
+    # source of their modules covers the validators.
+    digest = hashlib.sha256(f"{sys.version} {pydantic.VERSION}".encode())
+    config_types = (FormatConfig, ModelConfig, MCPToolConfig, AgentConfig)
+    with warnings.catch_warnings():
+        # defaults that are not JSON serializable are left out of the schema
+        warnings.simplefilter("ignore", PydanticJsonSchemaWarning)
+        for config_type in config_types:
+            digest.update(json.dumps(TypeAdapter(config_type).json_schema(), sort_keys=True).encode())
+    modules: Dict[str, ModuleType] = {}
+    for config_type in config_types:
+        _config_modules(config_type, modules)
+    for name in sorted(modules):
+        digest.update(name.encode())
+        digest.update(Path(inspect.getfile(modules[name])).read_bytes())
+    return digest.digest()
+
+
+def parse_shard(path: str, content: bytes, digest: str) -> ConfigShard:
+    raw = load_yaml(content) or {}
+    if not isinstance(raw, dict):
+        raise ValueError(f"The config file {path} must hold a mapping")
+    unknown = set(raw) - set(SECTIONS) - {"include"}
+    if unknown:
+        raise ValueError(f"Unknown keys {sorted(unknown)} in the config file {path}")
+    includes = raw.get("include") or []
+    shard = ConfigShard(path, digest, [includes] if isinstance(includes, str) else list(includes))
+    for section, (loader, _) in SECTIONS.items():
+        if raw.get(section):
+            try:
+                shard.sections[section] = loader().load_from_dict(raw)
+            except Exception as e:
+                raise ValueError(f"Invalid `{section}` in the config file {path}: {e}") from e
+    return shard
+
+
+def _parse_shards(items: List[Tuple[str, bytes, str]]) -> List[ConfigShard]:
+    return [parse_shard(*item) for item in items]
+
+
+class ConfigLoader:
+    """Reads a config directory, possibly split in many files, and caches the validated configs per file
+
+    Any file may `include:` glob patterns (`**` recurses), e.g. one shard per team. A file whose mtime
+    and size did not change is not read again and a file whose content did not change is not parsed
+    again, in this process and, through `cache_dir`, on restart. When at least `parallel_threshold`
+    files changed, they are parsed by `workers` processes (each one costs about a second to start).
+    """
+
+    # path -> (mtime_ns, size, shard), shared by the loaders of the process
+    _shards: Dict[str, Tuple[int, int, ConfigShard]] = {}
+
+    def __init__(
+        self,
+        config_path: str = "config",
+        cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        workers: Optional[int] = None,
+        parallel_threshold: int = 1000,
+    ):
+        self.config_path = config_path
+        self.cache_dir = cache_dir
+        self.workers = workers or min(os.cpu_count() or 1, 8)
+        self.parallel_threshold = parallel_threshold
+
+    def load(self) -> ConfigBundle:
+        return self.merge(self.load_shards())
+
+    def load_shards(self) -> List[ConfigShard]:
+        shards: Dict[str, ConfigShard] = {}
+        level = [str(Path(self.config_path, name).resolve()) for name in ROOT_FILES]
+        level = [path for path in level if os.path.isfile(path)]
+        # breadth first, the includes of a file are only known once it is parsed
+        while level:
+            for shard in self._load_level(level):
+                shards[shard.path] = shard
+            included = [path for shard_path in level for path in self._expand(shards[shard_path])]
+            # a file included twice, or an include cycle, is read once
+            level = [path for path in dict.fromkeys(included) if path not in shards]
+        return list(shards.values())
+
+    def _expand(self, shard: ConfigShard) -> List[str]:
+        paths = []
+        for pattern in shard.includes:
+            matches = sorted(glob.glob(str(Path(shard.path).parent / pattern), recursive=True))
+            if not matches and not glob.has_magic(pattern):
+                raise ValueError(f"The config file {shard.path} includes the missing file `{pattern}`")
+            paths += [str(Path(match).resolve()) for match in matches if os.path.isfile(match)]
+        return paths
+
+    def _load_level(self, paths: List[str]) -> List[ConfigShard]:
+        loaded: Dict[str, ConfigShard] = {}
+        changed: List[Tuple[str, bytes, str]] = []
+        stats: Dict[str, Tuple[int, int]] = {}
+        for path in paths:
+            stat = os.stat(path)
+            stats[path] = (stat.st_mtime_ns, stat.st_size)
+            known = self._shards.get(path)
+            if known is not None and known[:2] == stats[path]:
+                loaded[path] = known[2]
+                record_cache("config", True)
+                continue
+            # touched, or new to this process: the content hash decides
+            content = Path(path).read_bytes()
+            digest = hashlib.sha256(_schema_fingerprint() + content).hexdigest()
+            shard = known[2] if known is not None and known[2].digest == digest else self._read_cache(digest)
+            record_cache("config", shard is not None)
+            if shard is None:
+                changed.append((path, content, digest))
+            else:
+                # the same content may be cached for another path
+                loaded[path] = ConfigShard(path, digest, shard.includes, shard.sections)
+        for shard in self._parse(changed):
+            self._write_cache(shard)
+            loaded[shard.path] = shard
+        for path, shard in loaded.items():
+            self._shards[path] = (*stats[path], shard)
+        return [loaded[path] for path in paths]
+
+    def _parse(self, items: List[Tuple[str, bytes, str]]) -> List[ConfigShard]:
+        if len(items) < self.parallel_threshold or self.workers <= 1:
+            return _parse_shards(items)
+        logger.info("Parsing %d config files in %d processes", len(items), self.workers)
+        # contiguous chunks keep the configs in the order of the files
+        size = -(-len(items) // self.workers)
+        chunks = [items[index:index + size] for index in range(0, len(items), size)]
+        # spawned like the supervisor workers, forking a process with running threads is unsafe
+        with ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            return [shard for shards in pool.map(_parse_shards, chunks) for shard in shards]
+
+    def merge(self, shards: List[ConfigShard]) -> ConfigBundle:
+        bundle = ConfigBundle()
+        for section, (_, key) in SECTIONS.items():
+            origins: Dict[str, str] = {}
+            configs = getattr(bundle, section)
+            for shard in shards:
+                for config in shard.sections.get(section, []):
+                    name = getattr(config, key)
+                    if name in origins:
+                        raise ValueError(
+                            f"`{name}` is declared in the {section} of both {origins[name]} and {shard.path}"
+                        )
+                    origins[name] = shard.path
+                    configs.append(config)
+        return bundle
+
+    def _cache_path(self, digest: str) -> Optional[Path]:
+        return Path(self.cache_dir, f"config-{digest}.pickle") if self.cache_dir else None
+
+    def _read_cache(self, digest: str) -> Optional[ConfigShard]:
+        path = self._cache_path(digest)
+        if path is None or not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            # e.g. written by another version of a dependency, parsed again
+            logger.debug("Unreadable config cache %s: %s", path, e)
+            return None
+
+    def _write_cache(self, shard: ConfigShard) -> None:
+        path = self._cache_path(shard.digest)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # written aside and renamed, concurrent workers never read a partial file,
+            # the temporary file is only readable by its owner (the configs may hold API keys)
+            with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as f:
+                pickle.dump(shard, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f.name, path)
+        except Exception as e:
+            logger.debug("Failed to write the config cache %s: %s", path, e)
@@ -0,0 +1,7 @@
+from .generator import LoadGenerator, LoadReport, arrival_times, load_corpus
+from .targets import A2ATarget, InProcessTarget
+from .report import render_html
+
+__all__ = [
+    "LoadGenerator", "LoadReport", "arrival_times", "load_corpus", "A2ATarget", "InProcessTarget", "render_html",
+]
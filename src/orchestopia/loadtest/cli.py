@@ -0,0 +1,78 @@
+import json
+import asyncio
+import argparse
+
+from orchestopia.app import OrchestopiaApp
+from orchestopia.observability.log import configure_logging, shutdown_logging
+from orchestopia.loadtest.generator import LoadGenerator, load_corpus
+from orchestopia.loadtest.report import render_html
+from orchestopia.loadtest.targets import A2ATarget, InProcessTarget
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m orchestopia.loadtest",
+        description="Replay a JSONL corpus against an agent at an open-loop arrival rate",
+    )
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--agent", help="run this agent of --config in this process")
+    target.add_argument("--a2a-url", help="send the requests to the agent served at this A2A url")
+    parser.add_argument("--config", default="config", help="directory holding the yaml config files")
+    parser.add_argument("--input", required=True, help="JSONL corpus, replayed in a loop")
+    parser.add_argument("--prompt-field", default="prompt")
+    parser.add_argument("--prompt-template", default=None, help='e.g. "{title}\\n\\n{body}", overrides --prompt-field')
+    parser.add_argument("--rate", type=float, required=True, help="arrivals per second once ramped up")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of arrivals")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="seconds to reach --rate from 0")
+    parser.add_argument("--constant", action="store_true", help="evenly spaced arrivals instead of a Poisson process")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="drop the arrivals beyond this many running requests")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="seconds between two samples of the stats")
+    parser.add_argument("--drain-timeout", type=float, default=60.0, help="seconds to wait for the running requests at the end")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="write the JSON summary to this file")
+    parser.add_argument("--html", default=None, help="write an HTML summary with charts to this file")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    prompts = load_corpus(args.input, args.prompt_field, args.prompt_template)
+
+    def generator(target) -> LoadGenerator:
+        return LoadGenerator(
+            target,
+            prompts,
+            rate=args.rate,
+            duration=args.duration,
+            ramp_up=args.ramp_up,
+            poisson=not args.constant,
+            max_in_flight=args.max_in_flight,
+            sample_interval=args.sample_interval,
+            drain_timeout=args.drain_timeout,
+            probes=target.probes(),
+            seed=args.seed,
+        )
+
+    if args.a2a_url:
+        async with A2ATarget(args.a2a_url) as target:
+            report = await generator(target).run()
+    else:
+        async with OrchestopiaApp(args.config) as app:
+            report = await generator(InProcessTarget(app, args.agent)).run()
+    return report.as_dict()
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    configure_logging(args.log_level)
+    try:
+        summary = asyncio.run(run(args))
+    finally:
+        shutdown_logging()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+    if args.html:
+        with open(args.html, "w", encoding="utf-8") as f:
+            f.write(render_html(summary))
+    print(json.dumps({key: value for key, value in summary.items() if key != "samples"}, ensure_ascii=False))
@@ -0,0 +1,240 @@
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import resource
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from orchestopia.utils import percentile
+from orchestopia.observability.log import get_logger
+
+logger = get_logger("loadtest")
+
+Target = Callable[[str], Awaitable[Any]]
+# values sampled with the process stats, e.g. the number of MCP clients
+Probe = Callable[[], float]
+
+
+def load_corpus(
+    path: str, prompt_field: str = "prompt", prompt_template: Optional[str] = None
+) -> List[str]:
+    prompts = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            prompts.append(prompt_template.format(**record) if prompt_template else record[prompt_field])
+    return prompts
+
+
+def arrival_times(
+    rate: float, duration: float, ramp_up: float = 0.0, poisson: bool = True, seed: Optional[int] = None
+) -> Iterator[float]:
+    """Send times in seconds from the start, the rate grows linearly to `rate` over `ramp_up` seconds"""
+    rng = random.Random(seed)
+    # inverts the expected number of arrivals by time t: rate * t^2 / (2 * ramp_up) during the ramp, linear after
+    ramp_arrivals = rate * ramp_up / 2
+    arrivals = 0.0
+    while True:
+        arrivals += rng.expovariate(1.0) if poisson else 1.0
+        if arrivals < ramp_arrivals:
+            at = math.sqrt(2 * ramp_up * arrivals / rate)
+        else:
+            at = ramp_up + (arrivals - ramp_arrivals) / rate
+        if at >= duration:
+            return
+        yield at
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # the peak instead of the current size where /proc is missing (kilobytes on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@dataclass
+class _Window:
+    sent: int = 0
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+
+
+@dataclass
+class LoadReport:
+    config: Dict[str, Any]
+    sent: int = 0
+    completed: int = 0
+    errors: int = 0
+    dropped: int = 0
+    timed_out: int = 0
+    duration: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+    error_types: Dict[str, int] = field(default_factory=dict)
+    # one sample per interval: throughput, latency percentiles and process stats
+    samples: List[Dict[str, Any]] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        first, last = (self.samples[0], self.samples[-1]) if self.samples else ({}, {})
+        lags = [sample["loop_lag_ms"] for sample in self.samples]
+        return {
+            "config": self.config,
+            "sent": self.sent,
+            "completed": self.completed,
+            "errors": self.errors,
+            "error_rate": self.errors / self.sent if self.sent else 0.0,
+            "error_types": self.error_types,
+            "dropped": self.dropped,
+            "timed_out": self.timed_out,
+            "duration": self.duration,
+            "throughput": self.completed / self.duration if self.duration else 0.0,
+            "latency": {
+                "p50": percentile(self.latencies, 50),
+                "p95": percentile(self.latencies, 95),
+                "p99": percentile(self.latencies, 99),
+                "max": max(self.latencies, default=0.0),
+            },
+            "loop_lag_ms": {"p99": percentile(lags, 99), "max": max(lags, default=0.0)},
+            "rss_mb": {
+                "start": first.get("rss_mb", 0.0),
+                "end": last.get("rss_mb", 0.0),
+                "max": max((sample["rss_mb"] for sample in self.samples), default=0.0),
+            },
+            # between the first and the last sample, a steady growth under a steady load hints at a leak
+            "growth": {
+                key: last[key] - first[key]
+                for key in last
+                if key not in ("t", "rate", "completed", "errors", "p50", "p95", "p99", "in_flight", "loop_lag_ms")
+                and isinstance(last[key], (int, float))
+            },
+            "samples": self.samples,
+        }
+
+
+class LoadGenerator:
+    """Open-loop load: requests are sent at their arrival time whether or not the earlier ones finished
+
+    `max_in_flight` drops the arrivals beyond that many running requests, instead of queueing them.
+    """
+
+    def __init__(
+        self,
+        target: Target,
+        prompts: List[str],
+        rate: float,
+        duration: float,
+        ramp_up: float = 0.0,
+        poisson: bool = True,
+        max_in_flight: Optional[int] = None,
+        sample_interval: float = 1.0,
+        drain_timeout: float = 60.0,
+        probes: Optional[Dict[str, Probe]] = None,
+        seed: Optional[int] = None,
+    ):
+        if not prompts:
+            raise ValueError("The corpus is empty")
+        self.target = target
+        self.prompts = prompts
+        self.rate = rate
+        self.duration = duration
+        self.ramp_up = ramp_up
+        self.poisson = poisson
+        self.max_in_flight = max_in_flight
+        self.sample_interval = sample_interval
+        self.drain_timeout = drain_timeout
+        self.probes = probes or {}
+        self.seed = seed
+        self._in_flight: set = set()
+        self._window = _Window()
+
+    async def run(self) -> LoadReport:
+        report = LoadReport(config={
+            "rate": self.rate,
+            "duration": self.duration,
+            "ramp_up": self.ramp_up,
+            "arrivals": "poisson" if self.poisson else "constant",
+            "max_in_flight": self.max_in_flight,
+            "corpus": len(self.prompts),
+        })
+        started = time.monotonic()
+        sampler = asyncio.create_task(self._sample(report, started))
+        try:
+            for index, at in enumerate(arrival_times(self.rate, self.duration, self.ramp_up, self.poisson, self.seed)):
+                delay = started + at - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                report.sent += 1
+                self._window.sent += 1
+                if self.max_in_flight is not None and len(self._in_flight) >= self.max_in_flight:
+                    report.dropped += 1
+                    continue
+                task = asyncio.create_task(self._send(report, self.prompts[index % len(self.prompts)]))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+            if self._in_flight:
+                _, pending = await asyncio.wait(set(self._in_flight), timeout=self.drain_timeout)
+                report.timed_out = len(pending)
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            report.duration = time.monotonic() - started
+            sampler.cancel()
+            await asyncio.gather(sampler, return_exceptions=True)
+        # the last partial interval
+        report.samples.append(self._snapshot(report, started, lag=0.0))
+        return report
+
+    async def _send(self, report: LoadReport, prompt: str) -> None:
+        started = time.perf_counter()
+        try:
+            await self.target(prompt)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            report.errors += 1
+            self._window.errors += 1
+            name = type(e).__name__
+            report.error_types[name] = report.error_types.get(name, 0) + 1
+            logger.debug("Request failed: %s", e, extra={"error": name})
+            return
+        latency = time.perf_counter() - started
+        report.completed += 1
+        report.latencies.append(latency)
+        self._window.latencies.append(latency)
+
+    async def _sample(self, report: LoadReport, started: float) -> None:
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.sample_interval)
+            # how late the loop woke up, i.e. how long callbacks waited for it
+            lag = time.monotonic() - before - self.sample_interval
+            report.samples.append(self._snapshot(report, started, lag))
+
+    def _snapshot(self, report: LoadReport, started: float, lag: float) -> Dict[str, Any]:
+        window, self._window = self._window, _Window()
+        sample = {
+            "t": round(time.monotonic() - started, 3),
+            "rate": window.sent / self.sample_interval,
+            "completed": len(window.latencies),
+            "errors": window.errors,
+            "p50": percentile(window.latencies, 50),
+            "p95": percentile(window.latencies, 95),
+            "p99": percentile(window.latencies, 99),
+            "in_flight": len(self._in_flight),
+            "tasks": len(asyncio.all_tasks()),
+            "rss_mb": _rss_bytes() / 2**20,
+            "loop_lag_ms": max(lag, 0.0) * 1000,
+        }
+        for name, probe in self.probes.items():
+            try:
+                sample[name] = probe()
+            except Exception as e:
+                logger.debug("Probe `%s` failed: %s", name, e)
+        return sample
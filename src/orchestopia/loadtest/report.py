@@ -0,0 +1,46 @@
+import html
+import json
+from typing import List
+
+
+def _chart(samples: List[dict], key: str, title: str, unit: str, width: int = 560, height: int = 140) -> str:
+    points = [(sample["t"], sample[key]) for sample in samples if isinstance(sample.get(key), (int, float))]
+    if not points:
+        return ""
+    max_t = max(t for t, _ in points) or 1
+    max_v = max(v for _, v in points) or 1
+    path = " ".join(
+        f"{t / max_t * (width - 10) + 5:.1f},{height - 5 - v / max_v * (height - 25):.1f}" for t, v in points
+    )
+    return (
+        f'<figure><figcaption>{html.escape(title)} (max {max_v:.4g} {unit})</figcaption>'
+        f'<svg width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+        f'<rect width="{width}" height="{height}" fill="#fafafa" stroke="#ddd"/>'
+        f'<polyline fill="none" stroke="#3366cc" stroke-width="1.5" points="{path}"/></svg></figure>'
+    )
+
+
+def render_html(summary: dict) -> str:
+    """A self-contained page with the totals and the time series of a load test summary"""
+    samples = [{**sample, "p95_ms": sample["p95"] * 1000} for sample in summary["samples"]]
+    totals = {key: value for key, value in summary.items() if key != "samples"}
+    charts = "".join(
+        _chart(samples, key, title, unit)
+        for key, title, unit in (
+            ("rate", "Offered rate", "req/s"),
+            ("p95_ms", "p95 latency", "ms"),
+            ("errors", "Errors per interval", ""),
+            ("in_flight", "Requests in flight", ""),
+            ("rss_mb", "RSS", "MB"),
+            ("loop_lag_ms", "Event-loop lag", "ms"),
+            ("tasks", "asyncio tasks", ""),
+            ("mcp_clients", "MCP clients", ""),
+        )
+    )
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Orchestopia load test</title>"
+        "<style>body{font-family:sans-serif;margin:2em}figure{display:inline-block;margin:0 1em 1em 0}"
+        "pre{background:#f4f4f4;padding:1em}</style></head><body>"
+        "<h1>Orchestopia load test</h1>"
+        f"<pre>{html.escape(json.dumps(totals, indent=2))}</pre>{charts}</body></html>"
+    )
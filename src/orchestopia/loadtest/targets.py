@@ -0,0 +1,55 @@
+from typing import Any, Dict, Optional
+from a2a.types import Task
+
+from orchestopia.app import OrchestopiaApp
+from orchestopia.agent.a2a_client_manager import A2AAgent, A2AClientManager
+from orchestopia.observability.metrics import runs_active
+from orchestopia.runtime import run_agent
+from orchestopia.loadtest.generator import Probe
+
+
+class InProcessTarget:
+    """Runs the agent of an app in this process, so its pools and tasks can be probed"""
+
+    def __init__(self, app: OrchestopiaApp, agent_name: str):
+        self.app = app
+        self.agent = app.get_agent(agent_name)
+
+    async def __call__(self, prompt: str) -> Any:
+        result = await run_agent(self.agent, prompt, profile=False)
+        return result.output
+
+    def probes(self) -> Dict[str, Probe]:
+        return {
+            "mcp_clients": lambda: len(self.app.mcp_session_manager.clients),
+            "a2a_agents": lambda: len(self.app.a2a_client_manager.agents),
+            "runs_active": lambda: sum(value for _, _, value in runs_active.samples()),
+        }
+
+
+class A2ATarget:
+    """Sends every prompt to an agent served over A2A"""
+
+    def __init__(self, base_url: str, timeout: int = 600):
+        self.base_url = base_url
+        self.timeout = timeout
+        self._agent: Optional[A2AAgent] = None
+
+    async def __aenter__(self) -> "A2ATarget":
+        self._agent = await A2AClientManager().connect_a2a("loadtest_target", self.base_url, timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._agent.exit_stack.aclose()
+
+    async def __call__(self, prompt: str) -> Any:
+        response = await self._agent.run(query=prompt)
+        # a failed task comes back as its error message
+        if isinstance(response, str):
+            raise RuntimeError(response)
+        if isinstance(response, Task) and response.status.state != "completed":
+            raise RuntimeError(f"Task ended as {response.status.state}")
+        return response
+
+    def probes(self) -> Dict[str, Probe]:
+        return {}
@@ -2,5 +2,6 @@ from .config import MCPToolConfigLoader
 from .factory import MCPToolFactory
 from .loader import MCPToolLoader
 from .session_manager import MCPSessionManager
+from .proxy import MCPStdioProxy
 
-__all__ = ["MCPToolConfigLoader", "MCPToolFactory", "MCPToolLoader", "MCPSessionManager"]
\ No newline at end of file
+__all__ = ["MCPToolConfigLoader", "MCPToolFactory", "MCPToolLoader", "MCPSessionManager", "MCPStdioProxy"]
\ No newline at end of file
@@ -1,13 +1,30 @@
 from pydantic import BaseModel, Field, TypeAdapter, field_validator
 from typing import Literal, Dict, Optional, Union, Annotated, List
 from pathlib import Path
-import yaml
+from orchestopia.utils import load_yaml
+
+from orchestopia.runtime.concurrency import ConcurrencyConfig
+from orchestopia.runtime.result_limits import ResultLimitConfig
+
+class SchemaCompactionConfig(BaseModel):
+    enable: bool = True
+    # budget of the tool description, and of each description inside the argument schema
+    max_description_chars: int = Field(default=300, ge=1)
+    max_property_description_chars: int = Field(default=120, ge=1)
+    # keywords the model does not need to call the tool
+    strip_keys: List[str] = ["$schema", "$id", "$comment", "title", "examples", "readOnly", "writeOnly"]
 
 class MCPToolConfigBase(BaseModel):
     name: str 
-    type: Literal["stdio", "sse", "streamable-http"]
+    type: Literal["stdio", "sse", "streamable-http", "python"]
     enable: bool = True
     timeout: int = Field(default=60)
+    # number of sessions opened to the server, each one serves a single call at a time
+    pool_size: int = Field(default=1, ge=1)
+    concurrency: ConcurrencyConfig = ConcurrencyConfig()
+    schema_compaction: SchemaCompactionConfig = SchemaCompactionConfig()
+    # size limits of the tool results by tool name, `*` applies to every tool without its own limit
+    result_limits: Dict[str, ResultLimitConfig] = {}
 
 class MCPToolConfigStdio(MCPToolConfigBase):
     type: Literal["stdio"]
@@ -26,11 +43,21 @@ class MCPToolConfigSse(MCPToolConfigBase):
 class MCPToolConfigStreamableHTTP(MCPToolConfigBase):
     type: Literal["streamable-http"]
     url: str
+    # connect through a Unix socket, e.g. the one of the local stdio proxy
+    uds: Optional[str] = None
 
+class MCPToolConfigPython(MCPToolConfigBase):
+    type: Literal["python"]
+    # `package.module:function`, `package.module.function`, or a module exposing its public functions
+    target: str
+    # the functions of a module target to expose, every public function defined in it by default
+    functions: List[str] = []
+    # blocking functions run on a thread pool instead of the event loop
+    offload: bool = False
 
 
 MCPToolConfig = Annotated[
-    Union[MCPToolConfigStdio, MCPToolConfigSse, MCPToolConfigStreamableHTTP],
+    Union[MCPToolConfigStdio, MCPToolConfigSse, MCPToolConfigStreamableHTTP, MCPToolConfigPython],
     Field(discriminator="type"),
 ]
 
@@ -44,7 +71,7 @@ class MCPToolConfigLoader(BaseModel):
         instance = cls()
         # read yaml
         with open(f"{config_path}/mcp_tool.yaml") as f:
-            raw_config = yaml.safe_load(f)
+            raw_config = load_yaml(f.read())
         # convert into MCPToolConfig
         return instance.load_from_dict(raw_config)
 
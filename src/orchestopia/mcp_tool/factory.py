@@ -1,4 +1,6 @@
-from typing import Union, List
+import inspect
+from dataclasses import replace
+from typing import Any, Callable, Dict, Optional, Union, List
 from pydantic import BaseModel
 from pydantic_ai.mcp import (
     MCPServerSSE,
@@ -9,8 +11,19 @@ from pydantic_ai.mcp import (
 from pydantic_ai.tools import ToolFuncContext
 from pydantic_ai import Tool
 
+from orchestopia.utils import tool_from_schema
 from orchestopia.mcp_tool.session_manager import MCPClient, MCPSessionManager
-from orchestopia.mcp_tool.config import MCPToolConfig
+from orchestopia.mcp_tool.config import MCPToolConfig, MCPToolConfigPython, SchemaCompactionConfig
+from orchestopia.mcp_tool.python_tool import callable_name, import_callables, run_offloaded
+from orchestopia.mcp_tool.schema import schema_compactor
+from orchestopia.observability.log import get_logger
+from orchestopia.observability.accounting import account_tool
+from orchestopia.observability.tracing import span
+from orchestopia.runtime.concurrency import ConcurrencyConfig, concurrency_groups
+from orchestopia.runtime.budget import charge_tool_call
+from orchestopia.runtime.result_limits import ResultLimitConfig, bind_result_limit, limit_result
+
+logger = get_logger("mcp")
 
 class MCPToolFactory(BaseModel):
     mcp_session_manager: MCPSessionManager
@@ -22,15 +35,26 @@ class MCPToolFactory(BaseModel):
     async def create(
         self, config: MCPToolConfig, mode: str = "session_based"
     ) -> Union[List[MCPServer], List[Tool]]:
-        if mode == "agent_based":
+        if config.type == "python":
+            # imported in process, without a server to connect to in either mode
+            try:
+                return self._python_to_pydanticai_tool(config)
+            except Exception as e:
+                logger.error("Failed to import the python tools of `%s`: %s", config.name, e, extra={"resource": config.name})
+                return None
+        elif mode == "agent_based":
             # connet to server
             return [self._agent_based_connect_to_server(config)]
         elif mode == "session_based":
             # connet to server
             mcp_client = await self.mcp_session_manager.connect_to_server(config)
             if mcp_client:
+                # the reentrancy and concurrency group apply to the whole server
+                concurrency_groups.register_tool(config.name, config.concurrency)
                 # convert mcp server tools to pydanticAI tools
-                pydanticai_tools = await self._mcp_to_pydanticai_tool(mcp_client)
+                pydanticai_tools = await self._mcp_to_pydanticai_tool(
+                    mcp_client, config.concurrency, config.schema_compaction, config.result_limits
+                )
                 return pydanticai_tools
             else:
                 return None
@@ -57,11 +81,20 @@ class MCPToolFactory(BaseModel):
             raise ValueError(f"Unknown MCP tool type: {config.type} for tool {config.name}")
         return tool
     
-    def _make_tool_handler(self, client: MCPClient, mcp_tool):
+    def _make_tool_handler(self, client: MCPClient, mcp_tool, concurrency: ConcurrencyConfig = None):
+        tool_name = f"{client.name}__{mcp_tool.name}"
         async def handler(ctx: ToolFuncContext, **kwargs):
-            raw_response = await client.session.call_tool(mcp_tool.name, kwargs)
-            result = self._extract_tool_result(raw_response)
-            return result
+            charge_tool_call(tool_name)
+            async with (
+                span("mcp.call_tool", kind="tool", server=client.name, tool=mcp_tool.name),
+                account_tool(tool_name, server=client.name),
+                concurrency_groups.guard(client.name, concurrency),
+            ):
+                # the call runs on an idle pooled session
+                raw_response = await client.call_tool(mcp_tool.name, kwargs)
+            with span("mcp.extract_result", kind="internal"):
+                result = self._extract_tool_result(raw_response)
+            return await limit_result(tool_name, result)
         return handler
     
     def _extract_tool_result(self, raw_response):
@@ -71,27 +104,79 @@ class MCPToolFactory(BaseModel):
             return raw_response
         elif isinstance(raw_response, BaseModel):
             try:
-                raw_response.model_dump(mode = "json")
+                return raw_response.model_dump(mode = "json")
             except:
                 raise ValueError(f"Tool's response can't be parsed, raw response: {raw_response}")
         else:
             raise ValueError(f"Tool's response can't be parsed, raw response: {raw_response}")
     
-    async def _mcp_to_pydanticai_tool(self, mcp_client: MCPClient) -> List[Tool]:
+    async def _mcp_to_pydanticai_tool(
+        self,
+        mcp_client: MCPClient,
+        concurrency: ConcurrencyConfig = None,
+        schema_compaction: Optional[SchemaCompactionConfig] = None,
+        result_limits: Optional[Dict[str, ResultLimitConfig]] = None,
+    ) -> List[Tool]:
+        schema_compaction = schema_compaction or SchemaCompactionConfig()
+        result_limits = result_limits or {}
         pydanticai_tools: List[Tool] = []
         mcp_tools = await mcp_client.get_tools()
         for mcp_tool in mcp_tools:
             tool_name = f"{mcp_client.name}__{mcp_tool.name}"
-            tool_handler = self._make_tool_handler(mcp_client, mcp_tool)
+            tool_handler = self._make_tool_handler(mcp_client, mcp_tool, concurrency)
+            bind_result_limit(tool_name, result_limits.get(mcp_tool.name, result_limits.get("*")))
+            # the arguments are described by the input schema, compacted before it reaches the model
+            description, json_schema = schema_compactor.compact_tool(mcp_client.name, mcp_tool, schema_compaction)
             pydanticai_tools.append(
-                Tool.from_schema(
+                tool_from_schema(
                     function=tool_handler,
                     name=tool_name,
-                    description=mcp_tool.description or "",
-                    json_schema=mcp_tool.outputSchema,
+                    description=description,
+                    json_schema=json_schema,
                 )
             )
+        savings = schema_compactor.savings().get(mcp_client.name)
+        if savings:
+            logger.info(
+                "Tool schemas of `%s` take ~%d tokens instead of ~%d", mcp_client.name,
+                savings["compacted_tokens"], savings["original_tokens"],
+                extra={"resource": mcp_client.name, **savings},
+            )
         return pydanticai_tools
-    
 
-    
\ No newline at end of file
+    def _python_to_pydanticai_tool(self, config: MCPToolConfigPython) -> List[Tool]:
+        concurrency_groups.register_tool(config.name, config.concurrency)
+        pydanticai_tools: List[Tool] = []
+        for function in import_callables(config.target, config.functions):
+            function_name = callable_name(function)
+            tool_name = f"{config.name}__{function_name}"
+            bind_result_limit(tool_name, config.result_limits.get(function_name, config.result_limits.get("*")))
+            # the arguments are described by the type hints, the tool by the docstring
+            function_schema = Tool(function, name=tool_name).function_schema
+            handler = self._make_python_tool_handler(config, function, tool_name)
+            function_schema = replace(function_schema, function=handler, is_async=True)
+            pydanticai_tools.append(
+                Tool(handler, name=tool_name, description=function_schema.description, function_schema=function_schema)
+            )
+        return pydanticai_tools
+
+    def _make_python_tool_handler(self, config: MCPToolConfigPython, function: Callable[..., Any], tool_name: str):
+        # a callable object is async when its `__call__` is
+        is_async = inspect.iscoroutinefunction(function) or (
+            not inspect.isroutine(function) and inspect.iscoroutinefunction(type(function).__call__)
+        )
+        async def handler(*args, **kwargs):
+            charge_tool_call(tool_name)
+            async with (
+                span("python.call_tool", kind="tool", server=config.name, tool=callable_name(function)),
+                account_tool(tool_name, server=config.name),
+                concurrency_groups.guard(config.name, config.concurrency),
+            ):
+                if is_async:
+                    result = await function(*args, **kwargs)
+                elif config.offload:
+                    result = await run_offloaded(function, *args, **kwargs)
+                else:
+                    result = function(*args, **kwargs)
+            return await limit_result(tool_name, result)
+        return handler
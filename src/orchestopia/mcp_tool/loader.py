@@ -3,6 +3,9 @@ from pydantic import BaseModel
 from orchestopia.registry import ResourceRegistry
 from orchestopia.mcp_tool.factory import MCPToolFactory
 from orchestopia.mcp_tool.config import MCPToolConfig
+from orchestopia.observability.log import get_logger
+
+logger = get_logger("registry")
 
 class MCPToolLoader(BaseModel):
     registry: ResourceRegistry
@@ -14,15 +17,15 @@ class MCPToolLoader(BaseModel):
 
     async def load(self, config: MCPToolConfig) -> None:
         if config.name in self.registry.tools.snapshot():
-            print(f"MCP server `{config.name}` is already in the registry, skip loading...")
+            logger.info("MCP server `%s` is already in the registry, skip loading...", config.name, extra={"resource": config.name})
             pass
         else:
             tools = await self.factory.create(config, mode = "session_based")
             if tools:
                 self.registry.tools.register(config.name, tools)
-                print(f"MCP server `{config.name}` is registered successfully!")
+                logger.info("MCP server `%s` is registered successfully!", config.name, extra={"resource": config.name})
             else:
-                print(f"Failed to register MCP server `{config.name}`")
+                logger.error("Failed to register MCP server `%s`", config.name, extra={"resource": config.name})
 
     async def load_all(self, configs: list[MCPToolConfig]) -> None:
         for config in configs:
@@ -0,0 +1,106 @@
+import os
+import shutil
+import asyncio
+import tempfile
+from contextlib import AsyncExitStack
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+import mcp.types as types
+from mcp.server.lowlevel import Server
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from orchestopia.mcp_tool.config import MCPToolConfig, MCPToolConfigStdio
+from orchestopia.mcp_tool.session_manager import MCPClient, MCPSessionManager
+from orchestopia.observability.log import get_logger
+
+logger = get_logger("mcp")
+
+
+class MCPStdioProxy:
+    """Hosts stdio MCP servers once and shares them with every worker process over streamable HTTP on a Unix socket"""
+
+    def __init__(self, configs: List[MCPToolConfig], socket_path: Optional[str] = None):
+        self.configs: List[MCPToolConfigStdio] = [
+            config for config in configs if config.type == "stdio" and config.enable
+        ]
+        self._tmp_dir = None if socket_path else tempfile.mkdtemp(prefix="orchestopia-")
+        self.socket_path = socket_path or os.path.join(self._tmp_dir, "mcp.sock")
+        self.mcp_session_manager = MCPSessionManager()
+        self._exit_stack = AsyncExitStack()
+        self._server: Optional[uvicorn.Server] = None
+        self._serve_task: Optional[asyncio.Task] = None
+
+    def client_configs(self) -> Dict[str, Dict[str, Any]]:
+        """The config overrides pointing the workers at the proxy instead of spawning the servers"""
+        return {
+            config.name: {
+                "name": config.name,
+                "type": "streamable-http",
+                "url": f"http://localhost/{config.name}/mcp",
+                "uds": self.socket_path,
+                "enable": True,
+                "timeout": config.timeout,
+                "pool_size": config.pool_size,
+                "concurrency": config.concurrency.model_dump(),
+                "schema_compaction": config.schema_compaction.model_dump(),
+            }
+            for config in self.configs
+        }
+
+    async def start(self) -> "MCPStdioProxy":
+        routes = []
+        for config in self.configs:
+            client = await self.mcp_session_manager.connect_to_server(config)
+            session_manager = StreamableHTTPSessionManager(app=self._build_server(client), stateless=True)
+            await self._exit_stack.enter_async_context(session_manager.run())
+            routes.append(Mount(f"/{config.name}", app=session_manager.handle_request))
+
+        self._server = uvicorn.Server(
+            uvicorn.Config(Starlette(routes=routes), uds=self.socket_path, log_level="warning", lifespan="off")
+        )
+        self._serve_task = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            if self._serve_task.done():
+                self._serve_task.result()  # raise the startup error
+            await asyncio.sleep(0.05)
+        logger.info(
+            "MCP stdio proxy is serving %s on `%s`", [c.name for c in self.configs], self.socket_path,
+            extra={"resource": [c.name for c in self.configs]},
+        )
+        return self
+
+    def _build_server(self, client: MCPClient) -> Server:
+        server = Server(client.name)
+
+        @server.list_tools()
+        async def list_tools() -> List[types.Tool]:
+            return await client.get_tools()
+
+        # the upstream server validates the arguments itself
+        @server.call_tool(validate_input=False)
+        async def call_tool(name: str, arguments: Dict[str, Any]) -> types.CallToolResult:
+            # forwards the `_meta` of the worker's call, e.g. the credentials of its session
+            meta = server.request_context.meta
+            return await client.call_tool(name, arguments, meta=meta.model_dump(exclude_none=True) if meta else None)
+
+        return server
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+            await self._serve_task
+        await self._exit_stack.aclose()
+        await self.mcp_session_manager.disconnect_all()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        if self._tmp_dir:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+    async def __aenter__(self) -> "MCPStdioProxy":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
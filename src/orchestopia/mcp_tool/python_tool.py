@@ -0,0 +1,51 @@
+import asyncio
+import contextvars
+import importlib
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import ModuleType
+from typing import Any, Callable, List, Optional
+
+# shared by the offloaded tools, their concurrency is limited by the concurrency group of each tool
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def import_callables(target: str, functions: List[str] = ()) -> List[Callable[..., Any]]:
+    """The callables named by a dotted path, every public function of a module target"""
+    module_path, _, attribute = target.partition(":")
+    try:
+        obj: Any = importlib.import_module(module_path)
+    except ModuleNotFoundError:
+        if attribute or "." not in module_path:
+            raise
+        # `package.module.function`
+        module_path, attribute = module_path.rsplit(".", 1)
+        obj = importlib.import_module(module_path)
+    for name in attribute.split(".") if attribute else []:
+        obj = getattr(obj, name)
+
+    if not isinstance(obj, ModuleType):
+        if not callable(obj):
+            raise TypeError(f"`{target}` is not callable")
+        return [obj]
+    if functions:
+        return [getattr(obj, name) for name in functions]
+    # only the functions defined in the module, not the ones it imports
+    return [
+        value for name, value in vars(obj).items()
+        if not name.startswith("_") and inspect.isfunction(value) and value.__module__ == obj.__name__
+    ]
+
+
+def callable_name(function: Callable[..., Any]) -> str:
+    return getattr(function, "__name__", type(function).__name__)
+
+
+async def run_offloaded(function: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Runs a blocking function on the thread pool, with the context (session, trace, budgets) of the caller"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(thread_name_prefix="orchestopia-tool")
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_executor, partial(context.run, function, *args, **kwargs))
@@ -0,0 +1,207 @@
+import json
+import copy
+import hashlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from mcp import Tool as MCPTool
+
+from orchestopia.utils import estimate_tokens
+from orchestopia.mcp_tool.config import SchemaCompactionConfig
+from orchestopia.observability.metrics import metrics, record_cache
+
+# keywords whose value maps names to subschemas, the names themselves are never stripped
+_SCHEMA_MAPS = ("properties", "patternProperties", "$defs", "definitions", "dependentSchemas")
+_SCHEMA_VALUES = ("items", "additionalProperties", "not", "contains", "propertyNames", "if", "then", "else")
+_SCHEMA_LISTS = ("anyOf", "oneOf", "allOf", "prefixItems")
+
+
+def _walk(schema: Any, visit) -> Any:
+    """Rebuild a schema, applying `visit` to every subschema (dicts only) before descending into it"""
+    if not isinstance(schema, dict):
+        return schema
+    schema = visit(schema)
+    result = {}
+    for key, value in schema.items():
+        if key in _SCHEMA_MAPS and isinstance(value, dict):
+            result[key] = {name: _walk(sub, visit) for name, sub in value.items()}
+        elif key in _SCHEMA_VALUES:
+            result[key] = _walk(value, visit)
+        elif key in _SCHEMA_LISTS and isinstance(value, list):
+            result[key] = [_walk(sub, visit) for sub in value]
+        else:
+            result[key] = value
+    return result
+
+
+def truncate(text: Optional[str], limit: int) -> Optional[str]:
+    if text is None or len(text) <= limit:
+        return text
+    cut = text[:limit]
+    # stop at the last sentence or word boundary when there is one close enough
+    boundary = max(cut.rfind(". "), cut.rfind("\n"), cut.rfind("。"))
+    if boundary < limit // 2:
+        boundary = cut.rfind(" ")
+    if boundary >= limit // 2:
+        cut = cut[: boundary + 1]
+    return cut.rstrip() + "…"
+
+
+def _ref_name(ref: str) -> Optional[str]:
+    for prefix in ("#/$defs/", "#/definitions/"):
+        if ref.startswith(prefix):
+            return ref[len(prefix):]
+    return None
+
+
+def _refs(schema: Any) -> Iterable[str]:
+    if isinstance(schema, dict):
+        name = _ref_name(schema.get("$ref", "")) if isinstance(schema.get("$ref"), str) else None
+        if name is not None:
+            yield name
+        for value in schema.values():
+            yield from _refs(value)
+    elif isinstance(schema, list):
+        for value in schema:
+            yield from _refs(value)
+
+
+def _recursive_defs(defs: Dict[str, Any]) -> Set[str]:
+    recursive = set()
+    for start in defs:
+        stack, seen = list(_refs(defs[start])), set()
+        while stack:
+            name = stack.pop()
+            if name == start:
+                recursive.add(start)
+                break
+            if name in seen or name not in defs:
+                continue
+            seen.add(name)
+            stack.extend(_refs(defs[name]))
+    return recursive
+
+
+def dedupe_definitions(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge identical definitions, inline the ones used once and drop the unused ones"""
+    defs_key = "$defs" if "$defs" in schema else "definitions" if "definitions" in schema else None
+    if defs_key is None:
+        return schema
+    defs: Dict[str, Any] = schema[defs_key]
+
+    # identical definitions under different names point to the first one
+    canonical: Dict[str, str] = {}
+    by_content: Dict[str, str] = {}
+    for name, definition in defs.items():
+        content = json.dumps(definition, sort_keys=True)
+        canonical[name] = by_content.setdefault(content, name)
+
+    def rename(node: Dict[str, Any]) -> Dict[str, Any]:
+        name = _ref_name(node["$ref"]) if isinstance(node.get("$ref"), str) else None
+        if name in canonical and canonical[name] != name:
+            node = {**node, "$ref": f"#/{defs_key}/{canonical[name]}"}
+        return node
+
+    body = _walk({k: v for k, v in schema.items() if k != defs_key}, rename)
+    defs = {name: _walk(definition, rename) for name, definition in defs.items() if canonical[name] == name}
+
+    uses = Counter(_refs(body))
+    for definition in defs.values():
+        uses.update(_refs(definition))
+    recursive = _recursive_defs(defs)
+    inlined = {name for name in defs if uses[name] == 1 and name not in recursive}
+
+    def inline(node: Dict[str, Any]) -> Dict[str, Any]:
+        name = _ref_name(node["$ref"]) if isinstance(node.get("$ref"), str) else None
+        if name in inlined:
+            # sibling keywords of the reference (e.g. a description) win over the definition
+            siblings = {k: v for k, v in node.items() if k != "$ref"}
+            return inline({**copy.deepcopy(defs[name]), **siblings})
+        return node
+
+    body = _walk(body, inline)
+    kept = {name: _walk(definition, inline) for name, definition in defs.items() if name not in inlined and uses[name]}
+    if kept:
+        body[defs_key] = kept
+    return body
+
+
+def compact_schema(schema: Optional[Dict[str, Any]], config: SchemaCompactionConfig) -> Dict[str, Any]:
+    if not schema:
+        return {"type": "object", "properties": {}}
+    strip_keys = set(config.strip_keys)
+
+    def strip(node: Dict[str, Any]) -> Dict[str, Any]:
+        node = {key: value for key, value in node.items() if key not in strip_keys}
+        if isinstance(node.get("description"), str):
+            node["description"] = truncate(node["description"], config.max_property_description_chars)
+        return node
+
+    return dedupe_definitions(_walk(schema, strip))
+
+
+@dataclass
+class SchemaSavings:
+    tools: int = 0
+    original_tokens: int = 0
+    compacted_tokens: int = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "tools": self.tools,
+            "original_tokens": self.original_tokens,
+            "compacted_tokens": self.compacted_tokens,
+            "saved_tokens": self.original_tokens - self.compacted_tokens,
+        }
+
+
+class SchemaCompactor:
+    """Compacts MCP tool definitions once per distinct schema and keeps the token savings per server"""
+
+    def __init__(self):
+        self._cache: Dict[str, Tuple[str, Dict[str, Any], int, int]] = {}
+        self._tools: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        metrics.add_collector(self._collect_metrics)
+
+    def compact_tool(self, server: str, tool: MCPTool, config: SchemaCompactionConfig) -> Tuple[str, Dict[str, Any]]:
+        description = tool.description or ""
+        schema = tool.inputSchema
+        if not config.enable:
+            return description, schema
+        key = hashlib.sha256(
+            json.dumps([description, schema, config.model_dump()], sort_keys=True, default=str).encode()
+        ).hexdigest()
+        cached = self._cache.get(key)
+        record_cache("mcp_tool_schema", cached is not None)
+        if cached is None:
+            compacted = (truncate(description, config.max_description_chars), compact_schema(schema, config))
+            cached = self._cache[key] = (*compacted, estimate_tokens([description, schema]), estimate_tokens(list(compacted)))
+        compact_description, compact_input_schema, original_tokens, compacted_tokens = cached
+        self._tools.setdefault(server, {})[tool.name] = (original_tokens, compacted_tokens)
+        # a copy, pydantic-ai and the providers may adjust the schema they get
+        return compact_description, copy.deepcopy(compact_input_schema)
+
+    def savings(self) -> Dict[str, dict]:
+        result = {}
+        for server, tools in self._tools.items():
+            stats = SchemaSavings(tools=len(tools))
+            for original, compacted in tools.values():
+                stats.original_tokens += original
+                stats.compacted_tokens += compacted
+            result[server] = stats.as_dict()
+        return result
+
+    def _collect_metrics(self):
+        savings = self.savings()
+        yield "orchestopia_tool_schema_tokens", "Estimated tokens of the MCP tool definitions sent to the model", [
+            sample
+            for server, stats in savings.items()
+            for sample in (
+                ({"server": server, "stage": "original"}, stats["original_tokens"]),
+                ({"server": server, "stage": "compacted"}, stats["compacted_tokens"]),
+            )
+        ]
+
+
+schema_compactor = SchemaCompactor()
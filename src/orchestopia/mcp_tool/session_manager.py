@@ -1,7 +1,7 @@
-from contextlib import AsyncExitStack
-from typing import Dict, Optional, List
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, List
 from datetime import timedelta
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from mcp.client.stdio import stdio_client
 from mcp.client.sse import sse_client
@@ -9,8 +9,19 @@ from mcp.client.streamable_http import streamable_http_client
 from mcp import ClientSession, StdioServerParameters, Tool
 from tenacity import retry, stop_after_attempt, wait_exponential
 import asyncio
+import httpx
 
 from orchestopia.mcp_tool.config import MCPToolConfig
+from orchestopia.observability.log import get_logger
+from orchestopia.observability.metrics import mcp_reconnects_total, metrics
+from orchestopia.runtime.lifecycle import lifecycle
+from orchestopia.runtime.session import session_credentials
+
+logger = get_logger("mcp")
+
+
+def _record_reconnect(retry_state) -> None:
+    mcp_reconnects_total.inc(server=retry_state.kwargs.get("name"))
 
 @dataclass
 class MCPClient:
@@ -18,6 +29,39 @@ class MCPClient:
     session: ClientSession
     exit_stack: AsyncExitStack
     server_params: dict
+    sessions: List[ClientSession] = field(default_factory=list)
+    _idle: asyncio.Queue = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # a session serves one call at a time, concurrent calls are spread over the pool
+        if not self.sessions:
+            self.sessions = [self.session]
+        self._idle = asyncio.Queue()
+        for session in self.sessions:
+            self._idle.put_nowait(session)
+
+    @property
+    def pool_size(self) -> int:
+        return len(self.sessions)
+
+    @property
+    def idle_sessions(self) -> int:
+        return self._idle.qsize()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[ClientSession]:
+        session = await self._idle.get()
+        try:
+            yield session
+        finally:
+            self._idle.put_nowait(session)
+
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any], meta: Optional[Dict[str, Any]] = None):
+        # the pooled sessions are shared by every user, their credentials go with each call
+        if meta is None:
+            meta = session_credentials(self.name)
+        async with lifecycle.track(f"mcp:{self.name}"), self.acquire() as session:
+            return await session.call_tool(tool_name, arguments, meta=meta)
     
     async def get_tools(self) -> List[Tool]:
         mcp_tools = await self.session.list_tools()
@@ -28,6 +72,22 @@ class MCPSessionManager:
         self.clients: Dict[str, MCPClient] = {}
         self._tool_configs: Dict[str, MCPToolConfig] = {}
         self._lock = asyncio.Lock()
+        metrics.add_collector(self._collect_metrics)
+
+    def _collect_metrics(self):
+        clients = list(self.clients.values())
+        yield "orchestopia_mcp_pool_sessions", "Sessions of the MCP session pools", [
+            sample
+            for client in clients
+            for sample in (
+                ({"server": client.name, "state": "busy"}, client.pool_size - client.idle_sessions),
+                ({"server": client.name, "state": "idle"}, client.idle_sessions),
+            )
+        ]
+        yield "orchestopia_mcp_pool_utilization", "Share of the pooled sessions serving a call", [
+            ({"server": client.name}, (client.pool_size - client.idle_sessions) / client.pool_size)
+            for client in clients
+        ]
     
     async def connect_to_server(self, config: MCPToolConfig) -> MCPClient:
         self._tool_configs[config.name] = config
@@ -38,7 +98,8 @@ class MCPSessionManager:
                     name=config.name,
                     command=config.command,
                     args=config.args,
-                    timeout=config.timeout
+                    timeout=config.timeout,
+                    pool_size=config.pool_size
                 )
             )
         elif config.type == "sse":
@@ -47,7 +108,8 @@ class MCPSessionManager:
                 self._connect_sse(
                     name=config.name,
                     url=config.url,
-                    timeout=config.timeout
+                    timeout=config.timeout,
+                    pool_size=config.pool_size
                 )
             )
         elif config.type == "streamable-http":
@@ -56,7 +118,9 @@ class MCPSessionManager:
                 self._connect_streamable_http(
                     name=config.name,
                     url=config.url,
-                    timeout=config.timeout
+                    timeout=config.timeout,
+                    pool_size=config.pool_size,
+                    uds=config.uds
                 )
             )
         else:
@@ -67,17 +131,22 @@ class MCPSessionManager:
         try:
             return await asyncio.wait_for(connect_coroutine, timeout)
         except asyncio.CancelledError:
-            print(
-                f"Connection to MCP server '{name}' was cancelled. (Server may be unreachable or shutdown in progress)."
+            logger.warning(
+                "Connection to MCP server '%s' was cancelled. (Server may be unreachable or shutdown in progress).",
+                name, extra={"resource": name},
             )
             raise
 
         except asyncio.TimeoutError as e:
             raise RuntimeError(f"Timeout connecting to `{name}` server") from e
 
-    @retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=1, min=1, max=10))
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_exponential(multiplier=1, min=1, max=10),
+        before_sleep=_record_reconnect,
+    )
     async def _connect_stdio(
-        self, name: str, command: str, args: list[str], timeout: int = 60
+        self, name: str, command: str, args: list[str], timeout: int = 60, pool_size: int = 1
     ) -> MCPClient:
         async with self._lock:
             if name in self.clients:
@@ -86,38 +155,46 @@ class MCPSessionManager:
             exit_stack = AsyncExitStack()
             try:
                 server_params = StdioServerParameters(command=command, args=args)
-                stdio_transport = await exit_stack.enter_async_context(stdio_client(server_params))
-                # establish communication channel
-                read, write = stdio_transport
-                session = await exit_stack.enter_async_context(
-                    ClientSession(
-                        read, 
-                        write, 
-                        read_timeout_seconds=timedelta(seconds=timeout)
+                sessions = []
+                for _ in range(pool_size): # one server process per pooled session
+                    stdio_transport = await exit_stack.enter_async_context(stdio_client(server_params))
+                    # establish communication channel
+                    read, write = stdio_transport
+                    session = await exit_stack.enter_async_context(
+                        ClientSession(
+                            read, 
+                            write, 
+                            read_timeout_seconds=timedelta(seconds=timeout)
+                        )
                     )
-                )
-                # initialize MCP session
-                await session.initialize()
+                    # initialize MCP session
+                    await session.initialize()
+                    sessions.append(session)
                 
                 self.clients[name] = MCPClient(
                     name = name,
-                    session = session,
+                    session = sessions[0],
+                    sessions = sessions,
                     exit_stack = exit_stack,
                     server_params = {
                         "command": command,
                         "args": args
                     }
                 )
-                print(f"MCP session '{name}' (stdio) connected.") # TODO:改成logger
+                logger.info("MCP session '%s' (stdio) connected.", name, extra={"resource": name, "pool_size": pool_size})
                 return self.clients[name]
             except Exception as e:
                 await exit_stack.aclose()
-                print(f"Failed to connect MCP session '{name}' (stdio): {e}")
+                logger.error("Failed to connect MCP session '%s' (stdio): %s", name, e, extra={"resource": name})
                 raise
     
-    @retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=1, min=1, max=10))
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_exponential(multiplier=1, min=1, max=10),
+        before_sleep=_record_reconnect,
+    )
     async def _connect_sse(
-        self, name: str, url: str, timeout: int = 60
+        self, name: str, url: str, timeout: int = 60, pool_size: int = 1
     ) -> MCPClient:
         async with self._lock:
             if name in self.clients:
@@ -125,35 +202,43 @@ class MCPSessionManager:
             
             exit_stack = AsyncExitStack()
             try:
-                read, write = await exit_stack.enter_async_context(sse_client(url))
-                session = await exit_stack.enter_async_context(
-                    ClientSession(
-                        read, 
-                        write, 
-                        read_timeout_seconds=timedelta(seconds=timeout)
+                sessions = []
+                for _ in range(pool_size):
+                    read, write = await exit_stack.enter_async_context(sse_client(url))
+                    session = await exit_stack.enter_async_context(
+                        ClientSession(
+                            read, 
+                            write, 
+                            read_timeout_seconds=timedelta(seconds=timeout)
+                        )
                     )
-                )
-                # initialize MCP session
-                await session.initialize()
+                    # initialize MCP session
+                    await session.initialize()
+                    sessions.append(session)
 
                 self.clients[name] = MCPClient(
                     name = name,
-                    session = session,
+                    session = sessions[0],
+                    sessions = sessions,
                     exit_stack = exit_stack,
                     server_params = {
                         "url": url
                     }
                 )
-                print(f"MCP session '{name}' (sse) connected.") # TODO:改成logger
+                logger.info("MCP session '%s' (sse) connected.", name, extra={"resource": name, "pool_size": pool_size})
                 return self.clients[name]
             except Exception as e:
                 await exit_stack.aclose()
-                print(f"Failed to connect MCP session '{name}' (sse): {e}")
+                logger.error("Failed to connect MCP session '%s' (sse): %s", name, e, extra={"resource": name})
                 raise
     
-    @retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=1, min=1, max=10))
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_exponential(multiplier=1, min=1, max=10),
+        before_sleep=_record_reconnect,
+    )
     async def _connect_streamable_http(
-        self, name: str, url: str, timeout: int = 60
+        self, name: str, url: str, timeout: int = 60, pool_size: int = 1, uds: Optional[str] = None
     ) -> MCPClient:
         if name in self.clients:
             return self.clients[name]
@@ -161,30 +246,47 @@ class MCPSessionManager:
         exit_stack = AsyncExitStack()
         async with self._lock:
             try:
-                read, write, get_session_id = await exit_stack.enter_async_context(streamable_http_client(url))
-                session = await exit_stack.enter_async_context(
-                    ClientSession(
-                        read, 
-                        write, 
-                        read_timeout_seconds=timedelta(seconds=timeout)
+                http_client = None
+                if uds:
+                    http_client = await exit_stack.enter_async_context(
+                        httpx.AsyncClient(
+                            transport=httpx.AsyncHTTPTransport(uds=uds),
+                            timeout=httpx.Timeout(30, read=timeout),
+                            follow_redirects=True,
+                        )
                     )
-                )
-                # initialize MCP session
-                await session.initialize()
+                    metrics.track_http_client(f"mcp:{name}", http_client)
+                sessions = []
+                for _ in range(pool_size):
+                    read, write, get_session_id = await exit_stack.enter_async_context(
+                        streamable_http_client(url, http_client=http_client)
+                    )
+                    session = await exit_stack.enter_async_context(
+                        ClientSession(
+                            read, 
+                            write, 
+                            read_timeout_seconds=timedelta(seconds=timeout)
+                        )
+                    )
+                    # initialize MCP session
+                    await session.initialize()
+                    sessions.append(session)
 
                 self.clients[name] = MCPClient(
                     name = name,
-                    session = session,
+                    session = sessions[0],
+                    sessions = sessions,
                     exit_stack = exit_stack,
                     server_params = {
-                        "url": url
+                        "url": url,
+                        "uds": uds
                     }
                 )
-                print(f"MCP session '{name}' (streamableHTTP) connected.") # TODO:改成logger
+                logger.info("MCP session '%s' (streamableHTTP) connected.", name, extra={"resource": name, "pool_size": pool_size})
                 return self.clients[name]
             except Exception as e:
                 await exit_stack.aclose()
-                print(f"Failed to connect MCP session '{name}' (streamableHTTP): {e}")
+                logger.error("Failed to connect MCP session '%s' (streamableHTTP): %s", name, e, extra={"resource": name})
                 raise
     
     def get_session(self, name: str) -> Optional[ClientSession]:
@@ -206,14 +308,20 @@ class MCPSessionManager:
             if name in self.clients:
                 await self.clients[name].exit_stack.aclose()
                 del self.clients[name]
-                print(f"MCP session '{name}' disconnected.") # TODO:改成logger
-
-    async def disconnect_all(self):
-        """disconnect all connection"""
-        if not self.clients:
-            return
-        names = list(self.clients.keys())
-        await asyncio.gather(*(self.disconnect(name) for name in names), return_exceptions=True)
+                logger.info("MCP session '%s' disconnected.", name, extra={"resource": name})
+
+    async def disconnect_all(self) -> Dict[str, Optional[str]]:
+        """disconnect all connection, in reverse connection order, and return the error of each server (or None)"""
+        results: Dict[str, Optional[str]] = {}
+        # the transports are anyio contexts, they must be closed by the task that opened them
+        for name in reversed(list(self.clients.keys())):
+            try:
+                await self.disconnect(name)
+                results[name] = None
+            except Exception as e:
+                results[name] = str(e)
+                logger.error("Failed to disconnect MCP session '%s': %s", name, e, extra={"resource": name})
+        return results
     
 
 
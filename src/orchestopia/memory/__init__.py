@@ -0,0 +1,6 @@
+from .config import HistoryConfig
+from .store import MemoryStore
+from .history import HistoryBuilder
+from .conversation import ConversationMemory
+
+__all__ = ["HistoryConfig", "MemoryStore", "HistoryBuilder", "ConversationMemory"]
@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+from typing import Literal
+
+
+class HistoryConfig(BaseModel):
+    # token budget of the history sent with a run
+    max_tokens: int = Field(default=4000, gt=0)
+    # the most recent turns kept verbatim, as long as they fit the budget
+    recent_turns: int = Field(default=4, ge=1)
+    # what happens to the older turns
+    strategy: Literal["summarize", "drop"] = "drop"
@@ -0,0 +1,28 @@
+from typing import List, Optional
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage
+
+from orchestopia.memory.config import HistoryConfig
+from orchestopia.memory.store import MemoryStore
+from orchestopia.memory.history import HistoryBuilder
+
+
+class ConversationMemory:
+    def __init__(
+        self,
+        store: Optional[MemoryStore] = None,
+        config: Optional[HistoryConfig] = None,
+        summarizer: Optional[Agent] = None,
+    ):
+        self.store = store or MemoryStore()
+        self.builder = HistoryBuilder(config, summarizer)
+
+    async def history(self, session_id: str) -> List[ModelMessage]:
+        messages = self.store.get(session_id)
+        history, summary = await self.builder.build(messages, self.store.get_summary(session_id))
+        if summary:
+            self.store.set_summary(session_id, *summary)
+        return history
+
+    async def append(self, session_id: str, messages: List[ModelMessage]) -> None:
+        await self.store.append(session_id, messages)
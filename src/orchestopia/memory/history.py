@@ -0,0 +1,117 @@
+from typing import List, Optional
+from pydantic_ai import Agent
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    SystemPromptPart,
+    TextPart,
+    UserPromptPart,
+)
+
+from orchestopia.utils import estimate_tokens
+from orchestopia.memory.config import HistoryConfig
+
+SUMMARY_PROMPT = (
+    "Summarize the following conversation in a few sentences. "
+    "Keep the facts, decisions and open questions needed to continue it.\n\n{transcript}"
+)
+
+
+def split_turns(messages: List[ModelMessage]) -> List[List[ModelMessage]]:
+    # a turn starts with a user prompt, so tool calls and their returns are never split apart
+    turns: List[List[ModelMessage]] = []
+    for message in messages:
+        starts_turn = isinstance(message, ModelRequest) and any(
+            isinstance(part, UserPromptPart) for part in message.parts
+        )
+        if starts_turn or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def to_transcript(messages: List[ModelMessage]) -> str:
+    lines = []
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, UserPromptPart) and isinstance(part.content, str):
+                lines.append(f"user: {part.content}")
+            elif isinstance(part, TextPart):
+                lines.append(f"assistant: {part.content}")
+    return "\n".join(lines)
+
+
+def text_only(messages: List[ModelMessage]) -> List[ModelMessage]:
+    # keep the user prompts and the text answers, drop system prompts and every tool exchange
+    scoped: List[ModelMessage] = []
+    for message in messages:
+        if isinstance(message, ModelRequest):
+            parts = [part for part in message.parts if isinstance(part, UserPromptPart)]
+            if parts:
+                scoped.append(ModelRequest(parts=parts))
+        elif isinstance(message, ModelResponse):
+            parts = [part for part in message.parts if isinstance(part, TextPart)]
+            if parts:
+                scoped.append(ModelResponse(parts=parts, model_name=message.model_name))
+    return scoped
+
+
+class HistoryBuilder:
+    """Builds the message history of a run within a token budget"""
+
+    def __init__(self, config: Optional[HistoryConfig] = None, summarizer: Optional[Agent] = None):
+        self.config = config or HistoryConfig()
+        self.summarizer = summarizer
+        if self.config.strategy == "summarize" and summarizer is None:
+            raise ValueError("The `summarize` history strategy requires a summarizer agent")
+
+    def select_recent(self, turns: List[List[ModelMessage]], budget: int) -> int:
+        """Number of trailing turns kept verbatim"""
+        kept, used = 0, 0
+        for turn in reversed(turns[-self.config.recent_turns:]):
+            cost = estimate_tokens(turn)
+            if kept and used + cost > budget:
+                break
+            kept, used = kept + 1, used + cost
+        return kept
+
+    def trim(self, messages: List[ModelMessage]) -> List[ModelMessage]:
+        """Keep the recent turns that fit the budget and drop the older ones"""
+        turns = split_turns(messages)
+        kept = self.select_recent(turns, self.config.max_tokens)
+        return [message for turn in turns[len(turns) - kept:] for message in turn]
+
+    def scoped_slice(self, messages: List[ModelMessage]) -> List[ModelMessage]:
+        """The slice of a parent transcript handed to a sub-agent"""
+        return self.trim(text_only(messages))
+
+    async def build(
+        self, messages: List[ModelMessage], summary: Optional[tuple[int, str]] = None
+    ) -> tuple[List[ModelMessage], Optional[tuple[int, str]]]:
+        """Returns the history and the (possibly updated) summary of the older turns"""
+        turns = split_turns(messages)
+        if self.config.strategy == "drop":
+            kept = self.select_recent(turns, self.config.max_tokens)
+            return [message for turn in turns[len(turns) - kept:] for message in turn], summary
+
+        # leave room for the summary itself
+        kept = self.select_recent(turns, self.config.max_tokens * 3 // 4)
+        older = len(turns) - kept
+        if older == 0:
+            return [message for turn in turns for message in turn], summary
+
+        covered, summary_text = summary or (0, "")
+        if older > covered:
+            # summaries are incremental: the previous summary plus the newly collapsed turns
+            transcript = to_transcript([message for turn in turns[covered:older] for message in turn])
+            if summary_text:
+                transcript = f"Earlier summary: {summary_text}\n{transcript}"
+            result = await self.summarizer.run(SUMMARY_PROMPT.format(transcript=transcript))
+            summary_text, covered = str(result.output), older
+
+        history: List[ModelMessage] = [
+            ModelRequest(parts=[SystemPromptPart(content=f"Summary of the earlier conversation: {summary_text}")])
+        ]
+        history += [message for turn in turns[covered:] for message in turn]
+        return history, (covered, summary_text)
@@ -0,0 +1,67 @@
+import asyncio
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter
+
+
+class MemoryStore:
+    """Append-only message store keyed by session, persisted as one JSONL file per session"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self._messages: Dict[str, List[ModelMessage]] = {}
+        self._summaries: Dict[str, tuple[int, str]] = {}  # session -> (number of turns covered, summary)
+        self._lock = asyncio.Lock()
+        if self.path:
+            self.path.mkdir(parents=True, exist_ok=True)
+
+    def _session_file(self, session_id: str) -> Path:
+        return self.path / f"{session_id}.jsonl"
+
+    def get(self, session_id: str) -> List[ModelMessage]:
+        if session_id not in self._messages:
+            self._messages[session_id] = self._load(session_id)
+        return self._messages[session_id]
+
+    async def append(self, session_id: str, messages: List[ModelMessage]) -> None:
+        if not messages:
+            return
+        async with self._lock:
+            self.get(session_id).extend(messages)
+            if self.path:
+                # one line per appended batch, the file is never rewritten
+                line = ModelMessagesTypeAdapter.dump_json(messages) + b"\n"
+                await asyncio.to_thread(self._write, session_id, line)
+
+    def _write(self, session_id: str, line: bytes) -> None:
+        with open(self._session_file(session_id), "ab") as f:
+            f.write(line)
+
+    def _load(self, session_id: str) -> List[ModelMessage]:
+        if not self.path or not self._session_file(session_id).exists():
+            return []
+        messages: List[ModelMessage] = []
+        with open(self._session_file(session_id), "rb") as f:
+            for line in f:
+                if line.strip():
+                    messages.extend(ModelMessagesTypeAdapter.validate_json(line))
+        return messages
+
+    def get_summary(self, session_id: str) -> Optional[tuple[int, str]]:
+        return self._summaries.get(session_id)
+
+    def set_summary(self, session_id: str, covered_turns: int, summary: str) -> None:
+        self._summaries[session_id] = (covered_turns, summary)
+
+    def sessions(self) -> List[str]:
+        sessions = set(self._messages)
+        if self.path:
+            sessions.update(f.stem for f in self.path.glob("*.jsonl"))
+        return sorted(sessions)
+
+    def delete(self, session_id: str) -> None:
+        self._messages.pop(session_id, None)
+        self._summaries.pop(session_id, None)
+        if self.path and self._session_file(session_id).exists():
+            self._session_file(session_id).unlink()
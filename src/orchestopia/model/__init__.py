@@ -1,5 +1,8 @@
 from .config import ModelConfigLoader
 from .factory import ModelFactory
 from .loader import ModelLoader
+from .scheduler import ModelScheduler, ScheduledModel, model_priority
 
-__all__ = ["ModelConfigLoader", "ModelFactory", "ModelLoader"]
\ No newline at end of file
+__all__ = [
+    "ModelConfigLoader", "ModelFactory", "ModelLoader", "ModelScheduler", "ScheduledModel", "model_priority"
+]
\ No newline at end of file
@@ -1,32 +1,49 @@
-from pydantic import BaseModel, field_validator, model_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 from pydantic_ai.providers.openai import OpenAIProvider
 from pydantic_ai.settings import ModelSettings
 from pydantic_ai.models.openai import OpenAIResponsesModelSettings
-from typing import Literal, Union, List
+from typing import Literal, Union, List, Optional
 from logging import Logger
 from pathlib import Path
-import yaml
+from orchestopia.utils import load_yaml
 
 logger = Logger(__name__)
 
+class ModelLimitsConfig(BaseModel):
+    max_concurrency: Optional[int] = Field(default=None, gt=0)
+    requests_per_minute: Optional[int] = Field(default=None, gt=0)
+    tokens_per_minute: Optional[int] = Field(default=None, gt=0)
+    # concurrency slots kept free for interactive requests
+    interactive_reserve: int = Field(default=0, ge=0)
+    # seconds to pause dispatching after the endpoint answered 429
+    throttle_backoff: float = Field(default=5.0, ge=0)
+
+    @model_validator(mode="after")
+    def check_reserve(cls, limits):
+        if limits.interactive_reserve and (
+            limits.max_concurrency is None or limits.interactive_reserve >= limits.max_concurrency
+        ):
+            raise ValueError("`interactive_reserve` must be smaller than `max_concurrency`")
+        return limits
+
+class ProviderConfig(BaseModel):
+    # the arguments of `OpenAIProvider`, which is only built with the model (it opens an HTTP client)
+    base_url: Optional[str] = None
+    api_key: Optional[str] = None
+
 class ModelConfig(BaseModel):
     display_name: str = None
     model_name: str
     type: Literal['completions', 'responses']
     enabled: bool = True
-    provider: OpenAIProvider = {}
+    provider: Union[ProviderConfig, OpenAIProvider] = ProviderConfig()
     settings: Union[ModelSettings, OpenAIResponsesModelSettings] = {}
+    limits: Optional[ModelLimitsConfig] = None
 
     model_config = {
         "arbitrary_types_allowed": True
     }
 
-    @field_validator("provider", mode="before")
-    def convert_provider(cls, provider_info):
-        if isinstance(provider_info, dict):
-            return OpenAIProvider(**provider_info)
-        return provider_info
-    
     @field_validator("settings", mode="after")
     def convert_settings(cls, settings, info):
         if isinstance(settings, dict):
@@ -52,7 +69,7 @@ class ModelConfigLoader(BaseModel):
         instance = cls()
         # read yaml
         with open(f"{config_path}/model.yaml") as f:
-            raw_config = yaml.safe_load(f)
+            raw_config = load_yaml(f.read())
         # convert into ModelConfig
         return instance.load_from_dict(raw_config)
 
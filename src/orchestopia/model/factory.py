@@ -6,14 +6,29 @@ from pydantic_ai.models.openai import (
     OpenAIResponsesModelSettings,
 )
 from pydantic_ai.settings import ModelSettings
+from pydantic_ai.providers.openai import OpenAIProvider
 
 from orchestopia.model.config import ModelConfig
+from orchestopia.model.scheduler import ModelScheduler, ScheduledModel
+from orchestopia.observability.tracing import TracedModel
+from orchestopia.runtime.budget import BudgetedModel
 
 
 class ModelFactory(BaseModel):
     def create(
             self, config: ModelConfig,
         ) -> type[Model]:
+        model = self._create_model(config)
+        if config.limits:
+            # one scheduler per endpoint, shared by every agent referencing `@model:<display_name>`
+            scheduler = ModelScheduler(config.display_name, config.limits)
+            model = ScheduledModel(model, scheduler)
+        # charged before queueing, a run out of budget does not wait for a slot
+        model = BudgetedModel(model)
+        # outermost, so the request span includes the time queued in the scheduler
+        return TracedModel(model, config.display_name)
+
+    def _create_model(self, config: ModelConfig) -> type[Model]:
         # for chat completions api
         if config.type == "completions":
             model_settings = ModelSettings(
@@ -21,7 +36,7 @@ class ModelFactory(BaseModel):
             )
             return OpenAIModel(
                 model_name=config.model_name,
-                provider=config.provider,
+                provider=self._create_provider(config),
                 settings=model_settings,
             )
         # for responses api
@@ -31,11 +46,15 @@ class ModelFactory(BaseModel):
             )
             return OpenAIResponsesModel(
                 model_name=config.model_name,
-                provider=config.provider,
+                provider=self._create_provider(config),
                 settings=model_settings,
             )
         else:
             raise ValueError(
                 f"Unknown model type: {config.type} for model {config.display_name}"
             )
-    
+
+    def _create_provider(self, config: ModelConfig) -> OpenAIProvider:
+        if isinstance(config.provider, OpenAIProvider):
+            return config.provider
+        return OpenAIProvider(**config.provider.model_dump(exclude_none=True))
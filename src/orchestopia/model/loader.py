@@ -3,6 +3,9 @@ from orchestopia.registry import ResourceRegistry
 
 from orchestopia.model.factory import ModelFactory
 from orchestopia.model.config import ModelConfig
+from orchestopia.observability.log import get_logger
+
+logger = get_logger("registry")
 
 class ModelLoader(BaseModel):
     registry: ResourceRegistry
@@ -14,12 +17,12 @@ class ModelLoader(BaseModel):
 
     def load(self, config: ModelConfig) -> None:
         if config.display_name in self.registry.models.snapshot():
-            print(f"Model `{config.display_name}` is already in the registry, skip loading...")
+            logger.info("Model `%s` is already in the registry, skip loading...", config.display_name, extra={"resource": config.display_name})
             pass
         else:
             model = self.factory.create(config)
             self.registry.models.register(config.display_name, model)
-            print(f"Model `{config.display_name}` is registered successfully!")
+            logger.info("Model `%s` is registered successfully!", config.display_name, extra={"resource": config.display_name})
 
     def load_all(self, configs: list[ModelConfig]) -> None:
         for config in configs:
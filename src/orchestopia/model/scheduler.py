@@ -0,0 +1,272 @@
+import time
+import heapq
+import itertools
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Deque, Dict, List, Literal, Optional
+
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import ModelMessage, ModelResponse
+from pydantic_ai.models import Model, ModelRequestParameters, StreamedResponse
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings
+
+from orchestopia.utils import estimate_tokens
+from orchestopia.model.config import ModelLimitsConfig
+from orchestopia.observability.tracing import set_span_attribute
+from orchestopia.observability.metrics import metrics
+
+Priority = Literal["interactive", "batch"]
+PRIORITY_RANK: Dict[str, int] = {"interactive": 0, "batch": 1}
+RATE_WINDOW = 60.0  # seconds, for requests/tokens per minute
+
+_current_priority: ContextVar[str] = ContextVar("orchestopia_model_priority", default="interactive")
+
+
+@contextmanager
+def model_priority(priority: Priority):
+    """Run every model request made inside the block with the given priority class"""
+    if priority not in PRIORITY_RANK:
+        raise ValueError(f"Unknown priority class: {priority}")
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def estimate_request_tokens(
+    messages: List[ModelMessage], model_request_parameters: ModelRequestParameters
+) -> int:
+    # corrected by the real usage after the response
+    return estimate_tokens(messages) + estimate_tokens(model_request_parameters.function_tools)
+
+
+@dataclass
+class QueueStats:
+    queued: int = 0
+    granted: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    def record_wait(self, wait: float) -> None:
+        self.granted += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self) -> dict:
+        return {
+            "queued": self.queued,
+            "granted": self.granted,
+            "avg_wait": self.total_wait / self.granted if self.granted else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+
+@dataclass(order=True)
+class _Waiter:
+    rank: int
+    seq: int
+    priority: str = field(compare=False)
+    estimated_tokens: int = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+@dataclass
+class Ticket:
+    """A granted slot, the actual token usage is reported back through `record_usage`"""
+    scheduler: "ModelScheduler"
+    estimated_tokens: int
+    _token_entry: List[float]
+    queue_wait: float = 0.0
+
+    def record_usage(self, total_tokens: Optional[int]) -> None:
+        if total_tokens is not None:
+            self._token_entry[1] = total_tokens
+
+
+class ModelScheduler:
+    def __init__(self, name: str, limits: ModelLimitsConfig):
+        self.name = name
+        self.limits = limits
+        self.in_flight = 0
+        self.stats: Dict[str, QueueStats] = {p: QueueStats() for p in PRIORITY_RANK}
+        self.throttled = 0  # number of 429 responses
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._request_log: Deque[float] = deque()
+        self._token_log: Deque[List[float]] = deque()  # [timestamp, tokens]
+        self._blocked_until = 0.0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        metrics.add_collector(self._collect_metrics)
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int, priority: Optional[str] = None) -> AsyncIterator[Ticket]:
+        priority = priority or _current_priority.get()
+        ticket = await self._acquire(estimated_tokens, priority)
+        set_span_attribute("queue_wait", ticket.queue_wait)
+        try:
+            yield ticket
+        except ModelHTTPError as e:
+            if e.status_code == 429:
+                self._backoff()
+            raise
+        finally:
+            self._release()
+
+    async def _acquire(self, estimated_tokens: int, priority: str) -> Ticket:
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(
+            rank=PRIORITY_RANK[priority],
+            seq=next(self._seq),
+            priority=priority,
+            estimated_tokens=estimated_tokens,
+            enqueued_at=time.monotonic(),
+            future=loop.create_future(),
+        )
+        heapq.heappush(self._waiters, waiter)
+        self.stats[priority].queued += 1
+        self._dispatch()
+        try:
+            return await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # the slot was granted right before the cancellation
+                self._release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                self.stats[priority].queued -= 1
+                self._dispatch()
+            raise
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _backoff(self) -> None:
+        # the endpoint is overloaded, stop dispatching for a while instead of piling up retries
+        self.throttled += 1
+        self._blocked_until = max(self._blocked_until, time.monotonic() + self.limits.throttle_backoff)
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        self._expire(now)
+        while self._waiters:
+            waiter = self._waiters[0]
+            if waiter.future.done():
+                # cancelled while queued, its task has not run its cleanup yet
+                heapq.heappop(self._waiters)
+                self.stats[waiter.priority].queued -= 1
+                continue
+            delay = self._admission_delay(waiter, now)
+            if delay is None:  # blocked by concurrency, wait for a release
+                return
+            if delay > 0:  # blocked by the rate window, retry when it moves
+                self._schedule_wakeup(delay)
+                return
+            heapq.heappop(self._waiters)
+            self.stats[waiter.priority].queued -= 1
+            self.stats[waiter.priority].record_wait(now - waiter.enqueued_at)
+            self.in_flight += 1
+            self._request_log.append(now)
+            token_entry = [now, waiter.estimated_tokens]
+            self._token_log.append(token_entry)
+            waiter.future.set_result(
+                Ticket(self, waiter.estimated_tokens, token_entry, queue_wait=now - waiter.enqueued_at)
+            )
+
+    def _admission_delay(self, waiter: _Waiter, now: float) -> Optional[float]:
+        limits = self.limits
+        if limits.max_concurrency is not None and self.in_flight >= limits.max_concurrency:
+            return None
+        if (
+            limits.interactive_reserve
+            and waiter.priority != "interactive"
+            and limits.max_concurrency is not None
+            and self.in_flight >= limits.max_concurrency - limits.interactive_reserve
+        ):
+            return None
+        delay = max(0.0, self._blocked_until - now)
+        if limits.requests_per_minute is not None and len(self._request_log) >= limits.requests_per_minute:
+            delay = max(delay, self._request_log[0] + RATE_WINDOW - now)
+        if limits.tokens_per_minute is not None and self._token_log:
+            used = sum(entry[1] for entry in self._token_log)
+            # an oversized request is still admitted once the window is empty
+            if used + waiter.estimated_tokens > limits.tokens_per_minute:
+                delay = max(delay, self._token_log[0][0] + RATE_WINDOW - now)
+        return delay
+
+    def _expire(self, now: float) -> None:
+        while self._request_log and now - self._request_log[0] >= RATE_WINDOW:
+            self._request_log.popleft()
+        while self._token_log and now - self._token_log[0][0] >= RATE_WINDOW:
+            self._token_log.popleft()
+
+    def _schedule_wakeup(self, delay: float) -> None:
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+        self._wakeup = asyncio.get_running_loop().call_later(delay, self._on_wakeup)
+
+    def _on_wakeup(self) -> None:
+        self._wakeup = None
+        self._dispatch()
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        self._expire(now)
+        return {
+            "in_flight": self.in_flight,
+            "requests_in_window": len(self._request_log),
+            "tokens_in_window": int(sum(entry[1] for entry in self._token_log)),
+            "throttled": self.throttled,
+            "queues": {priority: stats.snapshot() for priority, stats in self.stats.items()},
+        }
+
+
+    def _collect_metrics(self):
+        model = {"model": self.name}
+        yield "orchestopia_model_in_flight", "Model requests holding a scheduler slot", [(model, self.in_flight)]
+        yield "orchestopia_model_queued", "Model requests waiting for a scheduler slot", [
+            ({**model, "priority": priority}, stats.queued) for priority, stats in self.stats.items()
+        ]
+        yield "orchestopia_model_throttled", "429 responses received from the endpoint", [(model, self.throttled)]
+
+
+class ScheduledModel(WrapperModel):
+    """Model wrapper sending every request through the scheduler of its endpoint"""
+
+    def __init__(self, wrapped: Model, scheduler: ModelScheduler):
+        super().__init__(wrapped)
+        self.scheduler = scheduler
+
+    async def request(
+        self,
+        messages: List[ModelMessage],
+        model_settings: Optional[ModelSettings],
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        estimated_tokens = estimate_request_tokens(messages, model_request_parameters)
+        async with self.scheduler.slot(estimated_tokens) as ticket:
+            response = await self.wrapped.request(messages, model_settings, model_request_parameters)
+            ticket.record_usage(response.usage.total_tokens)
+            return response
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: List[ModelMessage],
+        model_settings: Optional[ModelSettings],
+        model_request_parameters: ModelRequestParameters,
+    ) -> AsyncIterator[StreamedResponse]:
+        estimated_tokens = estimate_request_tokens(messages, model_request_parameters)
+        async with self.scheduler.slot(estimated_tokens) as ticket:
+            async with self.wrapped.request_stream(
+                messages, model_settings, model_request_parameters
+            ) as response_stream:
+                yield response_stream
+            ticket.record_usage(response_stream.usage().total_tokens)
@@ -0,0 +1,36 @@
+from .accounting import (
+    AccountedRunResult,
+    RunAccount,
+    UsageStats,
+    UsageTracker,
+    account_run,
+    account_tool,
+    current_account,
+    usage_tracker,
+)
+from .metrics import MetricsRegistry, MetricsServer, metrics, record_cache
+from .log import JsonFormatter, configure_logging, get_logger, shutdown_logging
+from .profiling import Profiler, RunProfile, profiler
+from .tracing import (
+    InMemorySpanExporter,
+    JsonlSpanExporter,
+    Span,
+    SpanExporter,
+    TracedModel,
+    Tracer,
+    continue_trace,
+    current_span,
+    inject_traceparent,
+    span,
+    tracer,
+)
+
+__all__ = [
+    "AccountedRunResult", "RunAccount", "UsageStats", "UsageTracker",
+    "account_run", "account_tool", "current_account", "usage_tracker",
+    "InMemorySpanExporter", "JsonlSpanExporter", "Span", "SpanExporter", "TracedModel", "Tracer",
+    "continue_trace", "current_span", "inject_traceparent", "span", "tracer",
+    "Profiler", "RunProfile", "profiler",
+    "JsonFormatter", "configure_logging", "get_logger", "shutdown_logging",
+    "MetricsRegistry", "MetricsServer", "metrics", "record_cache"
+]
@@ -0,0 +1,233 @@
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, fields
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Literal, Optional
+
+from pydantic_ai.agent import AgentRunResult
+from pydantic_ai.usage import Usage
+
+from orchestopia.observability.metrics import (
+    run_duration,
+    runs_active,
+    runs_total,
+    tool_calls_total,
+    tool_duration,
+)
+
+if TYPE_CHECKING:
+    from orchestopia.observability.profiling import RunProfile
+
+
+@dataclass
+class UsageStats:
+    calls: int = 0
+    errors: int = 0
+    requests: int = 0
+    request_tokens: int = 0
+    response_tokens: int = 0
+    total_tokens: int = 0
+    duration: float = 0.0
+
+    def add_usage(self, usage: Usage) -> None:
+        self.requests += usage.requests
+        self.request_tokens += usage.request_tokens or 0
+        self.response_tokens += usage.response_tokens or 0
+        self.total_tokens += usage.total_tokens or 0
+
+    def merge(self, other: "UsageStats") -> None:
+        for f in fields(self):
+            setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+
+    def as_dict(self) -> dict:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+@dataclass
+class RunAccount:
+    """Usage of one agent run, nested sub-agent runs are kept as children"""
+    name: str
+    kind: Literal["agent", "a2a_agent", "workflow"] = "agent"
+    model: Optional[str] = None
+    stats: UsageStats = field(default_factory=UsageStats)
+    tools: Dict[str, UsageStats] = field(default_factory=dict)
+    tool_servers: Dict[str, str] = field(default_factory=dict)
+    children: List["RunAccount"] = field(default_factory=list)
+
+    def add_usage(self, usage: Usage) -> None:
+        self.stats.add_usage(usage)
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def totals(self) -> UsageStats:
+        # wall time is the one of the outermost run, nested runs overlap with it
+        totals = UsageStats(calls=1, duration=self.stats.duration)
+        for account in self.walk():
+            totals.errors += account.stats.errors
+            totals.requests += account.stats.requests
+            totals.request_tokens += account.stats.request_tokens
+            totals.response_tokens += account.stats.response_tokens
+            totals.total_tokens += account.stats.total_tokens
+        return totals
+
+    def breakdown(self) -> Dict[str, Dict[str, dict]]:
+        by_agent: Dict[str, UsageStats] = {}
+        by_model: Dict[str, UsageStats] = {}
+        by_server: Dict[str, UsageStats] = {}
+        by_tool: Dict[str, UsageStats] = {}
+        for account in self.walk():
+            by_agent.setdefault(account.name, UsageStats()).merge(account.stats)
+            if account.model:
+                by_model.setdefault(account.model, UsageStats()).merge(account.stats)
+            for tool_name, tool_stats in account.tools.items():
+                by_tool.setdefault(tool_name, UsageStats()).merge(tool_stats)
+                server = account.tool_servers.get(tool_name)
+                if server:
+                    by_server.setdefault(server, UsageStats()).merge(tool_stats)
+        return {
+            "agents": {k: v.as_dict() for k, v in by_agent.items()},
+            "models": {k: v.as_dict() for k, v in by_model.items()},
+            "mcp_servers": {k: v.as_dict() for k, v in by_server.items()},
+            "tools": {k: v.as_dict() for k, v in by_tool.items()},
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "model": self.model,
+            "stats": self.stats.as_dict(),
+            "tools": {k: v.as_dict() for k, v in self.tools.items()},
+            "children": [child.as_dict() for child in self.children],
+        }
+
+
+class UsageTracker:
+    """Process-wide counters, aggregated over every accounted run"""
+
+    def __init__(self):
+        self.agents: Dict[str, UsageStats] = {}
+        self.models: Dict[str, UsageStats] = {}
+        self.mcp_servers: Dict[str, UsageStats] = {}
+        self.tools: Dict[str, UsageStats] = {}
+        self.agent_models: Dict[str, str] = {}
+
+    def bind_agent_model(self, agent_name: str, model_name: str) -> None:
+        self.agent_models[agent_name] = model_name
+
+    def record_run(self, account: RunAccount) -> None:
+        self.agents.setdefault(account.name, UsageStats()).merge(account.stats)
+        if account.model:
+            self.models.setdefault(account.model, UsageStats()).merge(account.stats)
+
+    def record_tool(self, name: str, server: Optional[str], stats: UsageStats) -> None:
+        self.tools.setdefault(name, UsageStats()).merge(stats)
+        if server:
+            self.mcp_servers.setdefault(server, UsageStats()).merge(stats)
+
+    def snapshot(self) -> Dict[str, Dict[str, dict]]:
+        return {
+            "agents": {k: v.as_dict() for k, v in self.agents.items()},
+            "models": {k: v.as_dict() for k, v in self.models.items()},
+            "mcp_servers": {k: v.as_dict() for k, v in self.mcp_servers.items()},
+            "tools": {k: v.as_dict() for k, v in self.tools.items()},
+        }
+
+    def reset(self) -> None:
+        self.agents.clear()
+        self.models.clear()
+        self.mcp_servers.clear()
+        self.tools.clear()
+
+
+usage_tracker = UsageTracker()
+_current_account: ContextVar[Optional[RunAccount]] = ContextVar("orchestopia_run_account", default=None)
+
+
+def current_account() -> Optional[RunAccount]:
+    return _current_account.get()
+
+
+@asynccontextmanager
+async def account_run(
+    name: str, kind: Literal["agent", "a2a_agent", "workflow"] = "agent", model: Optional[str] = None
+) -> AsyncIterator[RunAccount]:
+    account = RunAccount(
+        name=name,
+        kind=kind,
+        model=model or usage_tracker.agent_models.get(name),
+        stats=UsageStats(calls=1),
+    )
+    parent = _current_account.get()
+    if parent is not None:
+        parent.children.append(account)
+    token = _current_account.set(account)
+    runs_active.inc(kind=kind, name=name)
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield account
+    except BaseException as e:
+        status = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+        if status == "error":
+            account.stats.errors += 1
+        raise
+    finally:
+        account.stats.duration = time.perf_counter() - start
+        _current_account.reset(token)
+        usage_tracker.record_run(account)
+        runs_active.dec(kind=kind, name=name)
+        run_duration.observe(account.stats.duration, kind=kind, name=name)
+        runs_total.inc(kind=kind, name=name, status=status)
+
+
+@asynccontextmanager
+async def account_tool(name: str, server: Optional[str] = None) -> AsyncIterator[UsageStats]:
+    stats = UsageStats(calls=1)
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield stats
+    except BaseException as e:
+        status = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+        if status == "error":
+            stats.errors += 1
+        raise
+    finally:
+        stats.duration = time.perf_counter() - start
+        account = _current_account.get()
+        if account is not None:
+            account.tools.setdefault(name, UsageStats()).merge(stats)
+            if server:
+                account.tool_servers[name] = server
+        usage_tracker.record_tool(name, server, stats)
+        tool_duration.observe(stats.duration, tool=name, server=server or "")
+        tool_calls_total.inc(tool=name, server=server or "", status=status)
+
+
+@dataclass
+class AccountedRunResult(AgentRunResult):
+    """`AgentRunResult` carrying the usage of the whole nested run tree"""
+    account: RunAccount = None
+    profile: Optional["RunProfile"] = None
+    # why the run ended before its final answer (e.g. its budget ran out), None when it completed
+    stop_reason: Optional[str] = None
+
+    @classmethod
+    def from_result(
+        cls,
+        result: AgentRunResult,
+        account: RunAccount,
+        profile: Optional["RunProfile"] = None,
+        stop_reason: Optional[str] = None,
+    ) -> "AccountedRunResult":
+        return cls(
+            **{f.name: getattr(result, f.name) for f in fields(result)},
+            account=account,
+            profile=profile,
+            stop_reason=stop_reason,
+        )
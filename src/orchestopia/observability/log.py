@@ -0,0 +1,118 @@
+import sys
+import json
+import queue
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, TextIO
+
+from orchestopia.observability.tracing import current_span
+from orchestopia.observability.accounting import current_account
+
+ROOT_LOGGER = "orchestopia"
+# attributes every LogRecord has, anything else was passed through `extra=` and is a structured field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+logging.getLogger(ROOT_LOGGER).addHandler(logging.NullHandler())
+
+
+def get_logger(subsystem: str) -> logging.Logger:
+    """Logger of a subsystem (`registry`, `model`, `mcp`, `agent`, `a2a`, `batch`...), levels can be set per subsystem"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{subsystem}")
+
+
+def _fields(record: logging.LogRecord) -> Dict[str, object]:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class RunContextFilter(logging.Filter):
+    """Tags records with the run and trace they were emitted from"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        account = current_account()
+        if account is not None and not hasattr(record, "run"):
+            record.run = account.name
+        span = current_span()
+        if span is not None and not hasattr(record, "trace_id"):
+            record.trace_id = span.trace_id
+            record.span_id = span.span_id
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_fields(record),
+        }
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+
+def configure_logging(
+    level: str = "INFO",
+    levels: Optional[Dict[str, str]] = None,
+    json_format: bool = False,
+    stream: Optional[TextIO] = None,
+    path: Optional[str] = None,
+) -> None:
+    """Send the `orchestopia` logs through a queue, formatting and I/O happen on a listener thread
+
+    `levels` overrides the level of single subsystems, e.g. `{"mcp": "DEBUG", "registry": "WARNING"}`.
+    """
+    global _listener, _queue_handler
+    shutdown_logging()
+
+    formatter = JsonFormatter() if json_format else TextFormatter()
+    handlers: List[logging.Handler] = [logging.StreamHandler(stream or sys.stderr)]
+    if path:
+        handlers.append(logging.FileHandler(path, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    # runs in the emitting task, before the record leaves the context it was logged in
+    _queue_handler.addFilter(RunContextFilter())
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level.upper())
+    root.addHandler(_queue_handler)
+    root.propagate = False
+    for subsystem, subsystem_level in (levels or {}).items():
+        get_logger(subsystem).setLevel(subsystem_level.upper())
+
+
+def shutdown_logging() -> None:
+    """Flush the queued records and detach the handlers"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger(ROOT_LOGGER).removeHandler(_queue_handler)
+        _queue_handler = None
@@ -0,0 +1,266 @@
+import math
+import asyncio
+import weakref
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# what a collector returns at scrape time: (name, help, [(labels, value)]), always exposed as gauges
+Family = Tuple[str, str, List[Tuple[Dict[str, Any], float]]]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "unknown"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, Any], float]]:
+        for key, value in list(self._values.items()):
+            yield self.name, dict(zip(self.labels, key)), value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, Any], float]]:
+        for _, labels, value in super().samples():
+            yield f"{self.name}_total", labels, value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # per bucket counts (the last one is +Inf), sum
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, Any], float]]:
+        for key, (counts, total) in list(self._values.items()):
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(float(bound))}, cumulative
+            yield f"{self.name}_count", labels, cumulative
+            yield f"{self.name}_sum", labels, total
+
+
+class MetricsRegistry:
+    """In-process metrics, updating one is a dict lookup so they can stay on in production
+
+    Values that already live elsewhere (pools, queues, registries) are read by collectors
+    at scrape time instead of being tracked on the hot path.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Optional[Callable[[], Iterable[Family]]]]] = []
+        self._http_clients: "weakref.WeakValueDictionary[str, Any]" = weakref.WeakValueDictionary()
+
+    def _get_or_create(self, cls, name: str, help: str, labels: Sequence[str], **kwargs) -> _Metric:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, help, labels, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric `{name}` is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labels)
+
+    def histogram(
+        self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labels, buckets=buckets)
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        """Register a scrape time callback, bound methods are held weakly so their object can still be collected"""
+        if hasattr(collector, "__self__"):
+            self._collectors.append(weakref.WeakMethod(collector))
+        else:
+            self._collectors.append(lambda: collector)
+
+    def track_http_client(self, name: str, client: Any) -> None:
+        """Expose the connection pool usage of an httpx client for as long as it lives"""
+        self._http_clients[name] = client
+
+    def _collect_http_pools(self) -> Iterable[Family]:
+        samples = []
+        for name, client in list(self._http_clients.items()):
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+            idle = sum(1 for connection in connections if connection.is_idle())
+            samples.append(({"client": name, "state": "active"}, len(connections) - idle))
+            samples.append(({"client": name, "state": "idle"}, idle))
+        yield "orchestopia_http_pool_connections", "Connections held by the httpx pools", samples
+
+    def _families(self) -> Iterable[Tuple[str, str, str, List[Tuple[str, Dict[str, Any], float]]]]:
+        for metric in list(self._metrics.values()):
+            yield metric.name, metric.kind, metric.help, list(metric.samples())
+        collectors = [self._collect_http_pools]
+        for reference in list(self._collectors):
+            collector = reference()
+            if collector is None:  # its object was garbage collected
+                self._collectors.remove(reference)
+            else:
+                collectors.append(collector)
+        # families with the same name (e.g. one per scheduler) are merged into one
+        merged: Dict[str, Tuple[str, List[Tuple[str, Dict[str, Any], float]]]] = {}
+        for collector in collectors:
+            for name, help, samples in collector():
+                merged.setdefault(name, (help, []))[1].extend((name, labels, value) for labels, value in samples)
+        for name, (help, samples) in merged.items():
+            yield name, "gauge", help, samples
+
+    def render(self) -> str:
+        """The OpenMetrics text exposition"""
+        lines = []
+        for name, kind, help, samples in self._families():
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"# HELP {name} {help}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, List[Tuple[Dict[str, Any], float]]]:
+        result: Dict[str, List[Tuple[Dict[str, Any], float]]] = {}
+        for _, _, _, samples in self._families():
+            for sample_name, labels, value in samples:
+                result.setdefault(sample_name, []).append((labels, value))
+        return result
+
+
+metrics = MetricsRegistry()
+
+# shared instruments, created once so the hot paths only do the update
+runs_active = metrics.gauge("orchestopia_runs_active", "Agent, A2A agent and workflow runs in progress", ("kind", "name"))
+run_duration = metrics.histogram("orchestopia_run_duration_seconds", "Duration of agent, A2A agent and workflow runs", ("kind", "name"))
+runs_total = metrics.counter("orchestopia_runs", "Finished runs", ("kind", "name", "status"))
+calls_queued = metrics.gauge("orchestopia_calls_queued", "Tool and sub-agent calls waiting on a concurrency group", ("tool",))
+tool_duration = metrics.histogram("orchestopia_tool_call_duration_seconds", "Duration of tool calls", ("tool", "server"))
+tool_calls_total = metrics.counter("orchestopia_tool_calls", "Finished tool calls", ("tool", "server", "status"))
+model_duration = metrics.histogram("orchestopia_model_request_duration_seconds", "Duration of model requests", ("model",))
+model_requests_total = metrics.counter("orchestopia_model_requests", "Finished model requests", ("model", "status"))
+mcp_reconnects_total = metrics.counter("orchestopia_mcp_reconnects", "Retried MCP connection attempts", ("server",))
+cache_requests_total = metrics.counter("orchestopia_cache_requests", "Cache lookups", ("cache", "result"))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    cache_requests_total.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def _collect_cache_ratios() -> Iterable[Family]:
+    lookups: Dict[str, List[float]] = {}
+    for (cache, result), value in list(cache_requests_total._values.items()):
+        lookups.setdefault(cache, [0, 0])[result == "hit"] += value
+    yield (
+        "orchestopia_cache_hit_ratio",
+        "Share of the cache lookups that were hits",
+        [({"cache": cache}, hits / (misses + hits)) for cache, (misses, hits) in lookups.items()],
+    )
+
+
+metrics.add_collector(_collect_cache_ratios)
+
+
+class MetricsServer:
+    """Serves `GET /metrics` in the OpenMetrics format on the running event loop"""
+
+    def __init__(self, registry: MetricsRegistry = metrics, host: str = "127.0.0.1", port: int = 9464):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> "MetricsServer":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # the real port when started on port 0
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass  # headers are not needed
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status = "200 OK"
+                body = self.registry.render().encode()
+            else:
+                status, body = "404 Not Found", b"Not Found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: application/openmetrics-text; version=1.0.0; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "MetricsServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
@@ -0,0 +1,214 @@
+import os
+import json
+import random
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from orchestopia.observability.tracing import Span, SpanExporter, tracer
+
+# where the time of a span (minus its children) goes
+CATEGORIES = ("queued", "model", "tool", "a2a", "orchestopia", "framework")
+
+_current_profile: ContextVar[Optional["RunProfile"]] = ContextVar("orchestopia_current_profile", default=None)
+
+
+def _category(span: Span) -> str:
+    if span.kind == "model":
+        return "model"
+    elif span.name == "mcp.call_tool":
+        return "tool"
+    elif span.kind == "a2a":
+        return "a2a"
+    elif span.kind == "internal":
+        return "orchestopia"
+    # agent runs and tool glue: pydantic-ai graph, validation, concurrency guards
+    return "framework"
+
+
+def _label(span: Span) -> str:
+    attributes = span.attributes
+    target = attributes.get("agent") or attributes.get("workflow") or attributes.get("step")
+    if span.name == "mcp.call_tool":
+        target = f"{attributes.get('server')}.{attributes.get('tool')}"
+    elif span.kind == "model":
+        target = attributes.get("model")
+    return f"{span.name}[{target}]" if target else span.name
+
+
+def _union_length(intervals: List[Tuple[float, float]]) -> float:
+    total, current_start, current_end = 0.0, None, None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+class RunProfile(SpanExporter):
+    """Collects the spans of one run and turns them into a timeline and critical path report"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.root: Optional[Span] = None
+        self.spans: List[Span] = []
+
+    def set_root(self, root: Optional[Span]) -> None:
+        self.root = root
+
+    def export(self, span: Span) -> None:
+        if self.root is not None and span.trace_id == self.root.trace_id:
+            self.spans.append(span)
+
+    def _tree(self) -> Dict[Optional[str], List[Span]]:
+        children: Dict[Optional[str], List[Span]] = defaultdict(list)
+        for span in self.spans:
+            children[span.parent_id].append(span)
+        return children
+
+    def _subtree(self, children: Dict[Optional[str], List[Span]]) -> List[Tuple[Span, int]]:
+        # the trace may be shared with concurrent runs, only keep the descendants of the root
+        result, stack = [], [(self.root, 0)]
+        while stack:
+            span, depth = stack.pop()
+            result.append((span, depth))
+            stack.extend((child, depth + 1) for child in children.get(span.span_id, []))
+        return result
+
+    def _self_time(self, span: Span, children: Dict[Optional[str], List[Span]]) -> float:
+        intervals = [
+            (max(child.start_time, span.start_time), min(child.end_time, span.end_time))
+            for child in children.get(span.span_id, [])
+        ]
+        return max(0.0, span.duration - _union_length([i for i in intervals if i[1] > i[0]]))
+
+    def _critical_path(self, span: Span, children: Dict[Optional[str], List[Span]], depth: int = 0) -> List[dict]:
+        # walk back from the end of the span, always taking the child finishing last before the cursor
+        chain, cursor = [], span.end_time
+        for child in sorted(children.get(span.span_id, []), key=lambda s: s.end_time, reverse=True):
+            if child.end_time <= cursor + 1e-6:
+                chain.append(child)
+                cursor = child.start_time
+        chain.reverse()
+        entry = {
+            "name": _label(span),
+            "kind": span.kind,
+            "depth": depth,
+            "start": span.start_time - self.root.start_time,
+            "duration": span.duration,
+            "self": max(0.0, span.duration - sum(child.duration for child in chain)),
+            "queue_wait": span.attributes.get("queue_wait", 0.0),
+            "category": _category(span),
+        }
+        path = [entry]
+        for child in chain:
+            path += self._critical_path(child, children, depth + 1)
+        return path
+
+    def report(self) -> dict:
+        if self.root is None or self.root.end_time is None:
+            raise RuntimeError(f"The profile of `{self.name}` has no finished run")
+        children = self._tree()
+        subtree = self._subtree(children)
+
+        timeline, total = [], dict.fromkeys(CATEGORIES, 0.0)
+        for span, depth in sorted(subtree, key=lambda item: item[0].start_time):
+            self_time = self._self_time(span, children)
+            queued = min(span.attributes.get("queue_wait", 0.0), self_time)
+            total["queued"] += queued
+            total[_category(span)] += self_time - queued
+            timeline.append({
+                "name": _label(span),
+                "kind": span.kind,
+                "depth": depth,
+                "start": span.start_time - self.root.start_time,
+                "duration": span.duration,
+                "self": self_time,
+                "status": span.status,
+                "attributes": span.attributes,
+            })
+
+        critical_path = self._critical_path(self.root, children)
+        on_path = dict.fromkeys(CATEGORIES, 0.0)
+        for entry in critical_path:
+            queued = min(entry["queue_wait"], entry["self"])
+            on_path["queued"] += queued
+            on_path[entry["category"]] += entry["self"] - queued
+
+        return {
+            "run": self.name,
+            "trace_id": self.root.trace_id,
+            "duration": self.root.duration,
+            "spans": len(subtree),
+            # the critical path sums up to the wall time, the totals count parallel work separately
+            "breakdown": {"critical_path": on_path, "total": total},
+            "critical_path": critical_path,
+            "timeline": timeline,
+        }
+
+    def folded(self) -> str:
+        """Folded stacks (`a;b;c <microseconds>`) for flamegraph.pl, speedscope or inferno"""
+        children = self._tree()
+        stacks: Dict[str, int] = defaultdict(int)
+        pending = [(self.root, _label(self.root))]
+        while pending:
+            span, stack = pending.pop()
+            stacks[stack] += int(self._self_time(span, children) * 1e6)
+            pending.extend((child, f"{stack};{_label(child)}") for child in children.get(span.span_id, []))
+        return "".join(f"{stack} {value}\n" for stack, value in stacks.items() if value > 0)
+
+    def save(self, directory: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.name}-{self.root.trace_id[:16]}")
+        with open(f"{path}.json", "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2, default=str)
+        with open(f"{path}.folded", "w", encoding="utf-8") as f:
+            f.write(self.folded())
+        return path
+
+
+class Profiler:
+    def __init__(self, sample_rate: float = 0.0, output_dir: Optional[str] = None):
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+
+    def configure(self, sample_rate: Optional[float] = None, output_dir: Optional[str] = None) -> None:
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        if output_dir is not None:
+            self.output_dir = output_dir
+
+    def should_profile(self, enabled: Optional[bool] = None) -> bool:
+        # nested runs are part of the profile of the outermost one
+        if _current_profile.get() is not None:
+            return False
+        if enabled is not None:
+            return enabled
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @asynccontextmanager
+    async def profile(self, name: str, enabled: Optional[bool] = None) -> AsyncIterator[Optional[RunProfile]]:
+        """Profile the run inside the block, the caller sets the root span with `RunProfile.set_root`"""
+        if not self.should_profile(enabled):
+            yield None
+            return
+        run_profile = RunProfile(name)
+        token = _current_profile.set(run_profile)
+        tracer.add_exporter(run_profile)
+        try:
+            yield run_profile
+        finally:
+            tracer.remove_exporter(run_profile)
+            _current_profile.reset(token)
+        if self.output_dir and run_profile.root is not None:
+            await asyncio.to_thread(run_profile.save, self.output_dir)
+
+
+profiler = Profiler()
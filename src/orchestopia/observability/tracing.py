@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import queue
+import threading
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from pydantic_ai.messages import ModelMessage, ModelResponse
+from pydantic_ai.models import Model, ModelRequestParameters, StreamedResponse
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings
+
+from orchestopia.observability.metrics import model_duration, model_requests_total
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    kind: str = "internal"
+    start_time: float = 0.0
+    end_time: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "ok"
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end_time or time.time()) - self.start_time
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def traceparent(self) -> str:
+        # W3C trace context
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, span: Span) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+
+class JsonlSpanExporter(SpanExporter):
+    """Writes finished spans as JSON lines from a background thread, the event loop never touches the file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.SimpleQueue[Optional[Span]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write_loop, name="orchestopia-span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        self._queue.put(span)
+
+    def _write_loop(self) -> None:
+        # line buffered, so worker processes appending to the same file never interleave a span
+        with open(self.path, "a", encoding="utf-8", buffering=1) as f:
+            while True:
+                span = self._queue.get()
+                if span is None:
+                    return
+                f.write(json.dumps(span.as_dict(), ensure_ascii=False, default=str) + "\n")
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+
+class Tracer:
+    def __init__(self):
+        self.exporters: List[SpanExporter] = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    def add_exporter(self, exporter: SpanExporter) -> None:
+        self.exporters.append(exporter)
+
+    def remove_exporter(self, exporter: SpanExporter) -> None:
+        self.exporters.remove(exporter)
+
+    def start_span(self, name: str, kind: str = "internal", attributes: Optional[Dict[str, Any]] = None) -> Span:
+        parent = _current_span.get()
+        return Span(
+            name=name,
+            kind=kind,
+            trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id if parent else None,
+            start_time=time.time(),
+            attributes=attributes or {},
+        )
+
+    def end_span(self, span: Span) -> None:
+        span.end_time = time.time()
+        for exporter in self.exporters:
+            exporter.export(span)
+
+    def shutdown(self) -> None:
+        for exporter in self.exporters:
+            exporter.close()
+        self.exporters.clear()
+
+
+tracer = Tracer()
+_current_span: ContextVar[Optional[Span]] = ContextVar("orchestopia_current_span", default=None)
+
+
+class span:
+    """Opens a child span of the current one, usable with both `with` and `async with`
+
+    The current span lives in a context variable, so tasks created inside the block
+    (e.g. concurrent tool calls) get the right parent.
+    """
+
+    def __init__(self, name: str, kind: str = "internal", **attributes: Any):
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.span: Optional[Span] = None
+        self._token: Optional[Token] = None
+
+    def __enter__(self) -> Optional[Span]:
+        if not tracer.enabled:
+            return None
+        self.span = tracer.start_span(self.name, self.kind, self.attributes)
+        self._token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.span is None:
+            return
+        if exc is not None:
+            self.span.status = "error"
+            self.span.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        tracer.end_span(self.span)
+
+    async def __aenter__(self) -> Optional[Span]:
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.__exit__(exc_type, exc, tb)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def set_span_attribute(key: str, value: Any) -> None:
+    current = _current_span.get()
+    if current is not None:
+        current.set_attribute(key, value)
+
+
+def inject_traceparent() -> Optional[str]:
+    current = _current_span.get()
+    return current.traceparent() if current else None
+
+
+class continue_trace:
+    """Makes the spans opened inside the block children of a remote `traceparent`"""
+
+    def __init__(self, traceparent: Optional[str]):
+        self.parent = None
+        parts = traceparent.split("-") if traceparent else []
+        if len(parts) == 4:
+            self.parent = Span(name="remote", trace_id=parts[1], span_id=parts[2], kind="remote")
+        self._token: Optional[Token] = None
+
+    def __enter__(self) -> None:
+        if self.parent is not None:
+            self._token = _current_span.set(self.parent)
+
+    def __exit__(self, *exc_info) -> None:
+        if self._token is not None:
+            _current_span.reset(self._token)
+
+    async def __aenter__(self) -> None:
+        self.__enter__()
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.__exit__(*exc_info)
+
+
+class TracedModel(WrapperModel):
+    """Opens a `model.request` span around every request of the wrapped model and records its latency"""
+
+    def __init__(self, wrapped: Model, display_name: Optional[str] = None):
+        super().__init__(wrapped)
+        self.display_name = display_name or wrapped.model_name
+
+    async def request(
+        self,
+        messages: List[ModelMessage],
+        model_settings: Optional[ModelSettings],
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        start = time.perf_counter()
+        status = "error"
+        try:
+            with span("model.request", kind="model", model=self.display_name) as current:
+                response = await self.wrapped.request(messages, model_settings, model_request_parameters)
+                if current is not None:
+                    current.set_attribute("request_tokens", response.usage.request_tokens)
+                    current.set_attribute("response_tokens", response.usage.response_tokens)
+                status = "ok"
+                return response
+        finally:
+            model_duration.observe(time.perf_counter() - start, model=self.display_name)
+            model_requests_total.inc(model=self.display_name, status=status)
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: List[ModelMessage],
+        model_settings: Optional[ModelSettings],
+        model_request_parameters: ModelRequestParameters,
+    ) -> AsyncIterator[StreamedResponse]:
+        start = time.perf_counter()
+        status = "error"
+        try:
+            with span("model.request", kind="model", model=self.display_name, stream=True):
+                async with self.wrapped.request_stream(
+                    messages, model_settings, model_request_parameters
+                ) as response_stream:
+                    yield response_stream
+                status = "ok"
+        finally:
+            model_duration.observe(time.perf_counter() - start, model=self.display_name)
+            model_requests_total.inc(model=self.display_name, status=status)
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import Dict, Any, List
 from pathlib import Path
-import yaml
+from orchestopia.utils import load_yaml
 
 
 class FormatFieldSpec(BaseModel):
@@ -20,7 +20,7 @@ class FormatConfigLoader(BaseModel):
         instance = cls()
         # read yaml
         with open(f"{config_path}/format.yaml") as f:
-            raw_config = yaml.safe_load(f)
+            raw_config = load_yaml(f.read())
         # convert into FormatConfig
         return instance.load_from_dict(raw_config)
 
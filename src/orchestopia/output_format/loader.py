@@ -6,6 +6,9 @@ from collections import defaultdict, deque
 from orchestopia.registry import ResourceRegistry
 from orchestopia.output_format.factory import FormatFactory
 from orchestopia.output_format.config import FormatConfig
+from orchestopia.observability.log import get_logger
+
+logger = get_logger("registry")
 
 class FormatLoader(BaseModel):
     registry: ResourceRegistry
@@ -17,12 +20,12 @@ class FormatLoader(BaseModel):
 
     def load(self, config: FormatConfig) -> None:
         if config.display_name in self.registry.formats.snapshot():
-            print(f"Output format `{config.display_name}` is already in the registry, skip loading...")
+            logger.info("Output format `%s` is already in the registry, skip loading...", config.display_name, extra={"resource": config.display_name})
             pass
         else:
             format_basemodel = self.factory.create(config, self.registry)
             self.registry.formats.register(config.display_name, format_basemodel)
-            print(f"Output format `{config.display_name}` is registered successfully!")
+            logger.info("Output format `%s` is registered successfully!", config.display_name, extra={"resource": config.display_name})
 
     def load_all(self, configs: list[FormatConfig]) -> None:
         config_map, in_degree, adj = self._check_item_dependency(configs)
@@ -1,5 +1,9 @@
 from typing import Dict, Generic, TypeVar
 
+from orchestopia.observability.log import get_logger
+
+logger = get_logger("registry")
+
 T = TypeVar("T")
 
 class BaseRegistry(Generic[T]):
@@ -15,7 +19,8 @@ class BaseRegistry(Generic[T]):
         if name in self._items:
             return self._items[name]
         else:
-            print(f"There is no `{name}` instance in the registry")
+            # on the lookup path of every run, only rendered when debugging
+            logger.debug("There is no `%s` instance in the registry", name, extra={"resource": name})
 
     def all(self) -> Dict[str, T]: # internal use only
         return self._items
@@ -6,6 +6,7 @@ from pydantic_ai import Tool, Agent
 
 from orchestopia.utils import resolve_basemodel_type, get_namespace_and_key
 from orchestopia.registry.base import BaseRegistry
+from orchestopia.observability.metrics import metrics
 
 FormatRegistry = BaseRegistry[type[BaseModel]]
 ModelRegistry = BaseRegistry[type[Model]]
@@ -62,3 +63,12 @@ class ResourceRegistry:
             return key
         resolved_key = re.sub(pattern, replace_namespace, key_with_namespace)
         return resolve_basemodel_type(resolved_key, self.formats.snapshot())
+
+
+def _collect_registry_sizes():
+    yield "orchestopia_registry_size", "Resources in the registry", [
+        ({"registry": registry}, len(items)) for registry, items in ResourceRegistry().snapshot().items()
+    ]
+
+
+metrics.add_collector(_collect_registry_sizes)
@@ -0,0 +1,7 @@
+from .runner import run_agent
+from .concurrency import ConcurrencyConfig, ConcurrencyGroups, concurrency_groups
+from .budget import BudgetConfig, BudgetExceeded, RunBudget
+from .session import Session, current_session
+from .lifecycle import Lifecycle, ShutdownReport, ShuttingDown, lifecycle
+
+__all__ = ["run_agent", "ConcurrencyConfig", "ConcurrencyGroups", "concurrency_groups", "BudgetConfig", "BudgetExceeded", "RunBudget", "Lifecycle", "ShutdownReport", "ShuttingDown", "lifecycle", "Session", "current_session"]
@@ -0,0 +1,171 @@
+import time
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from pydantic import BaseModel, Field
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart
+from pydantic_ai.models import ModelRequestParameters, StreamedResponse
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings
+
+from orchestopia.observability.metrics import metrics
+
+budget_exhausted_total = metrics.counter(
+    "orchestopia_budget_exhausted", "Runs stopped early by their budget", ("agent", "limit")
+)
+
+
+class BudgetConfig(BaseModel):
+    # model requests, counted over the run and every nested sub-agent run
+    max_requests: Optional[int] = Field(default=None, ge=1)
+    max_tokens: Optional[int] = Field(default=None, ge=1)
+    # calls per tool name, `*` applies to every tool without its own limit
+    max_tool_calls: Dict[str, int] = {}
+    max_seconds: Optional[float] = Field(default=None, gt=0)
+
+
+class BudgetExceeded(RuntimeError):
+    def __init__(self, budget: "RunBudget", limit: str, reason: str):
+        super().__init__(f"Budget of `{budget.name}` exhausted: {reason}")
+        self.budget = budget
+        self.limit = limit
+
+
+class RunBudget:
+    """The work left to one run, nested runs are charged against every enclosing budget"""
+
+    def __init__(self, name: str, config: BudgetConfig):
+        self.name = name
+        self.config = config
+        self.requests = 0
+        self.tokens = 0
+        self.tool_calls: Counter = Counter()
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining_seconds(self) -> Optional[float]:
+        if self.config.max_seconds is None:
+            return None
+        return max(0.0, self.config.max_seconds - self.elapsed)
+
+    def _check_time(self) -> None:
+        if self.config.max_seconds is not None and self.elapsed >= self.config.max_seconds:
+            raise BudgetExceeded(self, "seconds", f"ran for more than {self.config.max_seconds}s")
+
+    def before_request(self) -> None:
+        self._check_time()
+        config = self.config
+        if config.max_requests is not None and self.requests >= config.max_requests:
+            raise BudgetExceeded(self, "requests", f"{self.requests} model requests made, the limit is {config.max_requests}")
+        # the token usage is only known after the response, so the request crossing the limit still completes
+        if config.max_tokens is not None and self.tokens >= config.max_tokens:
+            raise BudgetExceeded(self, "tokens", f"{self.tokens} tokens used, the limit is {config.max_tokens}")
+        self.requests += 1
+
+    def before_tool_call(self, tool_name: str) -> None:
+        self._check_time()
+        limit = self.config.max_tool_calls.get(tool_name, self.config.max_tool_calls.get("*"))
+        if limit is not None and self.tool_calls[tool_name] >= limit:
+            raise BudgetExceeded(self, "tool_calls", f"`{tool_name}` called {self.tool_calls[tool_name]} times, the limit is {limit}")
+        self.tool_calls[tool_name] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": self.requests,
+            "tokens": self.tokens,
+            "tool_calls": dict(self.tool_calls),
+            "elapsed": self.elapsed,
+        }
+
+
+_active_budgets: ContextVar[Tuple[RunBudget, ...]] = ContextVar("orchestopia_run_budgets", default=())
+# budgets declared in agent.yaml, by agent name
+agent_budgets: Dict[str, BudgetConfig] = {}
+
+
+def bind_agent_budget(agent_name: str, config: Optional[BudgetConfig]) -> None:
+    if config is None:
+        agent_budgets.pop(agent_name, None)
+    else:
+        agent_budgets[agent_name] = config
+
+
+@contextmanager
+def charged_to(budget: Optional[RunBudget]) -> Iterator[Optional[RunBudget]]:
+    """Charge the work done in the block to `budget` too, on top of the enclosing budgets"""
+    if budget is None:
+        yield None
+        return
+    token = _active_budgets.set(_active_budgets.get() + (budget,))
+    try:
+        yield budget
+    finally:
+        _active_budgets.reset(token)
+
+
+@contextmanager
+def run_budget(name: str, config: Optional[BudgetConfig]) -> Iterator[Optional[RunBudget]]:
+    with charged_to(RunBudget(name, config) if config is not None else None) as budget:
+        yield budget
+
+
+def charge_model_request() -> None:
+    for budget in _active_budgets.get():
+        budget.before_request()
+
+
+def record_model_tokens(total_tokens: Optional[int]) -> None:
+    for budget in _active_budgets.get():
+        budget.tokens += total_tokens or 0
+
+
+def charge_tool_call(tool_name: str) -> None:
+    for budget in _active_budgets.get():
+        budget.before_tool_call(tool_name)
+
+
+def record_exhausted(agent_name: str, error: BudgetExceeded) -> None:
+    budget_exhausted_total.inc(agent=agent_name, limit=error.limit)
+
+
+def partial_output(messages: List[ModelMessage]) -> Optional[str]:
+    """The text of the last model response, the best answer a stopped run has"""
+    for message in reversed(messages):
+        if isinstance(message, ModelResponse):
+            text = "".join(part.content for part in message.parts if isinstance(part, TextPart))
+            if text:
+                return text
+    return None
+
+
+class BudgetedModel(WrapperModel):
+    """Charges every request of the wrapped model to the budgets of the running agents"""
+
+    async def request(
+        self,
+        messages: List[ModelMessage],
+        model_settings: Optional[ModelSettings],
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        charge_model_request()
+        response = await self.wrapped.request(messages, model_settings, model_request_parameters)
+        record_model_tokens(response.usage.total_tokens)
+        return response
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: List[ModelMessage],
+        model_settings: Optional[ModelSettings],
+        model_request_parameters: ModelRequestParameters,
+    ) -> AsyncIterator[StreamedResponse]:
+        charge_model_request()
+        async with self.wrapped.request_stream(
+            messages, model_settings, model_request_parameters
+        ) as response_stream:
+            yield response_stream
+        record_model_tokens(response_stream.usage().total_tokens)
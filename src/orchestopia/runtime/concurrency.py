@@ -0,0 +1,92 @@
+import time
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Optional
+from pydantic import BaseModel, Field
+
+from orchestopia.observability.tracing import set_span_attribute
+from orchestopia.observability.metrics import calls_queued
+
+
+class ConcurrencyConfig(BaseModel):
+    # a non-reentrant tool never runs two calls at the same time
+    reentrant: bool = True
+    # tools sharing a group share `limit` concurrent calls
+    group: Optional[str] = None
+    limit: int = Field(default=1, ge=1)
+
+
+# the locks held by the calls the current one is nested in (e.g. the `agent__*` call running its
+# sub-agent), to the semaphore the nested calls share in place of the lock
+_held: ContextVar[Dict[str, asyncio.Semaphore]] = ContextVar("orchestopia_held_locks", default={})
+
+
+class ConcurrencyGroups:
+    def __init__(self):
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._limits: Dict[str, int] = {}
+
+    def configure(self, name: str, limit: int) -> None:
+        if name in self._limits and self._limits[name] != limit:
+            raise ValueError(
+                f"Concurrency group `{name}` is declared with different limits ({self._limits[name]} and {limit})"
+            )
+        self._limits[name] = limit
+
+    def register_tool(self, tool_name: str, config: ConcurrencyConfig) -> None:
+        if not config.reentrant:
+            self.configure(f"tool:{tool_name}", 1)
+        if config.group:
+            self.configure(config.group, config.limit)
+
+    def _semaphore(self, name: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(name)
+        if semaphore is None:
+            semaphore = self._semaphores[name] = asyncio.Semaphore(self._limits.get(name, 1))
+        return semaphore
+
+    @asynccontextmanager
+    async def hold(self, name: str) -> AsyncIterator[None]:
+        async with self._semaphore(name):
+            yield
+
+    @asynccontextmanager
+    async def guard(self, tool_name: str, config: Optional[ConcurrencyConfig]) -> AsyncIterator[None]:
+        """Hold the group and reentrancy locks declared for a tool while it runs"""
+        if config is None or (config.reentrant and not config.group):
+            yield
+            return
+        # always acquire the group first, so two tools can't wait on each other
+        names = ([config.group] if config.group else []) + ([] if config.reentrant else [f"tool:{tool_name}"])
+        held = _held.get()
+        nested: Dict[str, asyncio.Semaphore] = {}
+        async with AsyncExitStack() as stack:
+            started = time.monotonic()
+            calls_queued.inc(tool=tool_name)
+            try:
+                for name in names:
+                    # a call nested in one holding the lock waits on the holder's share of it, waiting
+                    # on the lock itself would deadlock
+                    await stack.enter_async_context(held.get(name) or self._semaphore(name))
+                    nested[name] = asyncio.Semaphore(self._limits.get(name, 1))
+            finally:
+                calls_queued.dec(tool=tool_name)
+            set_span_attribute("queue_wait", time.monotonic() - started)
+            token = _held.set({**held, **nested})
+            try:
+                yield
+            finally:
+                _held.reset(token)
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {
+            name: {
+                "limit": limit,
+                "in_use": limit - self._semaphores[name]._value if name in self._semaphores else 0,
+            }
+            for name, limit in self._limits.items()
+        }
+
+
+concurrency_groups = ConcurrencyGroups()
@@ -0,0 +1,142 @@
+import time
+import asyncio
+import itertools
+from contextvars import ContextVar
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from orchestopia.observability.log import get_logger
+from orchestopia.observability.metrics import metrics
+
+logger = get_logger("registry")
+
+calls_in_flight = metrics.gauge(
+    "orchestopia_calls_in_flight", "Runs, MCP calls and A2A calls in progress, awaited on shutdown", ("resource",)
+)
+
+# set inside a tracked call, the runs started there are part of a run already admitted
+_inside_call: ContextVar[bool] = ContextVar("orchestopia_inside_call", default=False)
+
+
+class ShuttingDown(RuntimeError):
+    """A new run was refused because the runtime is draining"""
+
+
+@dataclass
+class _Call:
+    resource: str
+    started: float
+    task: Optional[asyncio.Task]
+    # not started by another tracked call, cancelling it cancels the calls it started
+    root: bool
+
+
+@dataclass
+class ShutdownReport:
+    # calls that finished before the drain deadline
+    drained: int = 0
+    # calls still running at the deadline, then cancelled
+    aborted: List[Dict[str, Any]] = field(default_factory=list)
+    # kind (`a2a`, `mcp`) -> the names closed, in closing order
+    closed: Dict[str, List[str]] = field(default_factory=dict)
+    # `kind:name` -> the error raised while closing it
+    errors: Dict[str, str] = field(default_factory=dict)
+    duration: float = 0.0
+
+    def close_results(self, kind: str, results: Dict[str, Optional[str]]) -> None:
+        self.closed[kind] = list(results)
+        self.errors.update({f"{kind}:{name}": error for name, error in results.items() if error is not None})
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class Lifecycle:
+    """Tracks the calls in flight per resource, so a shutdown can wait for them instead of cutting them"""
+
+    def __init__(self):
+        self._calls: Dict[int, _Call] = {}
+        self._ids = itertools.count()
+        self._accepting = True
+        self._report: Optional[ShutdownReport] = None
+        self._idle: Optional[asyncio.Event] = None
+
+    @property
+    def accepting(self) -> bool:
+        return self._accepting
+
+    def open(self) -> None:
+        # the runtime admits runs again, e.g. an app started after another one closed
+        self._accepting = True
+
+    def in_flight(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for call in self._calls.values():
+            counts[call.resource] = counts.get(call.resource, 0) + 1
+        return counts
+
+    @asynccontextmanager
+    async def track(self, resource: str, run: bool = False) -> AsyncIterator[None]:
+        """Registers a call of `resource` (e.g. `agent:name`, `mcp:server`) while it runs
+
+        A `run` started outside any tracked call is refused once the runtime drains. Runs nested in a
+        call already in flight, e.g. sub-agents, are still admitted so that call can finish.
+        """
+        root = not _inside_call.get()
+        if run and root and not self._accepting:
+            raise ShuttingDown(f"`{resource}` was not started, the runtime is shutting down")
+        call_id = next(self._ids)
+        self._calls[call_id] = _Call(resource, time.monotonic(), asyncio.current_task(), root)
+        calls_in_flight.inc(resource=resource)
+        token = _inside_call.set(True)
+        try:
+            yield
+        finally:
+            _inside_call.reset(token)
+            del self._calls[call_id]
+            calls_in_flight.dec(resource=resource)
+            if self._report is not None:
+                self._report.drained += 1
+                if not self._calls:
+                    self._idle.set()
+
+    async def drain(self, timeout: Optional[float] = 30.0, grace: float = 5.0) -> ShutdownReport:
+        """Stops admitting runs and waits up to `timeout` seconds for the calls in flight
+
+        The calls still running at the deadline are cancelled and reported, they get `grace`
+        seconds to unwind before the connections they use are closed.
+        """
+        started = time.monotonic()
+        self._accepting = False
+        report = self._report = ShutdownReport()
+        self._idle = asyncio.Event()
+        if not self._calls:
+            self._idle.set()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except TimeoutError:
+            self._report = None
+            now = time.monotonic()
+            report.aborted = [
+                {"resource": call.resource, "running_for": round(now - call.started, 3)}
+                for call in self._calls.values()
+            ]
+            current = asyncio.current_task()
+            tasks = {call.task for call in self._calls.values() if call.root and call.task not in (None, current)}
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.wait(tasks, timeout=grace)
+            logger.warning(
+                "Cancelled %d calls still running after %ss", len(report.aborted), timeout,
+                extra={"aborted": report.aborted},
+            )
+        finally:
+            self._report = None
+            self._idle = None
+            report.duration = time.monotonic() - started
+        return report
+
+
+lifecycle = Lifecycle()
@@ -0,0 +1,260 @@
+import os
+import re
+import math
+import hashlib
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field
+
+from orchestopia.observability.metrics import metrics, record_cache
+from orchestopia.observability.tracing import set_span_attribute
+from orchestopia.runtime.session import current_session
+
+try:
+    import numpy as np
+except ImportError:  # the similarity search falls back to sparse vectors in pure python
+    np = None
+
+result_cache_hits_total = metrics.counter(
+    "orchestopia_result_cache_hits", "Sub-agent answers reused from the result cache", ("agent", "match")
+)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+_TOKEN = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]|\d+|[^\W\d_]+")
+# words a rewording adds or drops without changing the question
+_FILLER = frozenset(
+    "a an the this that these those is are was were be been am do does did can could would will shall should may might "
+    "please kindly me my i you your we our us it its of to for in on at by with about from into and or "
+    "what whats which who how tell give show find get let lets just also some any".split()
+    + list("的了嗎呢吧啊呀請幫我你您是在")
+)
+_NUMBER_WORDS = frozenset(
+    "zero one two three four five six seven eight nine ten eleven twelve twenty thirty forty fifty hundred thousand "
+    "million billion first second third fourth fifth".split()
+    + list("零一二兩三四五六七八九十百千萬億")
+)
+
+
+class ResultCacheConfig(BaseModel):
+    # cosine similarity of the character n-gram TF-IDF vectors from which a cached answer is reused
+    threshold: float = Field(default=0.95, gt=0, le=1)
+    ttl: float = Field(default=300, gt=0)
+    max_entries: int = Field(default=256, ge=1)
+    ngram: int = Field(default=3, ge=1)
+
+
+def normalize(text: str) -> str:
+    """Case, width, punctuation and spacing folded, so trivially different queries match exactly"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _SPACES.sub(" ", _PUNCTUATION.sub(" ", text)).strip()
+
+
+def char_ngrams(text: str, n: int) -> Counter:
+    # padded, so short queries and word boundaries still produce n-grams
+    padded = f" {text} "
+    return Counter(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+
+
+@dataclass
+class _Entry:
+    grams: Counter
+    result: Any
+    expires: float
+
+
+class SimilarityCache:
+    """Answers by query, a query close enough to a cached one reuses its answer
+
+    The n-gram weights are TF-IDF over the cached queries, rebuilt after the entries changed,
+    with NumPy when it is installed. A close query only matches when it asks for the same numbers,
+    names and dates, see `same_details`.
+    """
+
+    def __init__(self, config: ResultCacheConfig):
+        self.config = config
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._index: Optional[Tuple[List[str], Dict[str, int], Any, Any]] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, query: str) -> Tuple[Optional[str], Any]:
+        """(`exact` or `similar`, the answer), or (None, None) on a miss"""
+        self._expire()
+        key = normalize(query)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return "exact", entry.result
+        match = self._most_similar(key)
+        if match is None:
+            return None, None
+        key, score = match
+        set_span_attribute("similarity", round(score, 4))
+        self._entries.move_to_end(key)
+        return "similar", self._entries[key].result
+
+    def put(self, query: str, result: Any) -> None:
+        key = normalize(query)
+        self._entries[key] = _Entry(char_ngrams(key, self.config.ngram), result, time.monotonic() + self.config.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.config.max_entries:
+            self._entries.popitem(last=False)
+        self._index = None
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if entry.expires <= now]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._index = None
+
+    def _build_index(self) -> Tuple[List[str], Dict[str, int], Any, Any]:
+        keys = list(self._entries)
+        document_frequency = Counter(gram for entry in self._entries.values() for gram in entry.grams)
+        vocabulary = {gram: index for index, gram in enumerate(document_frequency)}
+        n = len(keys)
+        # smoothed idf, a gram in every query still weighs 1
+        idf = {gram: math.log((1 + n) / (1 + df)) + 1 for gram, df in document_frequency.items()}
+        if np is not None:
+            matrix = np.zeros((n, len(vocabulary)), dtype=np.float32)
+            for row, key in enumerate(keys):
+                for gram, count in self._entries[key].grams.items():
+                    matrix[row, vocabulary[gram]] = count * idf[gram]
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            return keys, vocabulary, idf, matrix
+        vectors = [_unit({gram: count * idf[gram] for gram, count in self._entries[key].grams.items()}) for key in keys]
+        return keys, vocabulary, idf, vectors
+
+    def _scores(self, grams: Counter) -> Tuple[List[str], List[float]]:
+        """The cached queries and their cosine similarity to the query n-grams"""
+        if self._index is None:
+            self._index = self._build_index()
+        keys, vocabulary, idf, vectors = self._index
+        # grams no cached query has weigh in the norm of the query, not in the dot products
+        weights = {gram: count * idf.get(gram, math.log(1 + len(keys)) + 1) for gram, count in grams.items()}
+        if np is not None:
+            query = np.zeros(len(vocabulary), dtype=np.float32)
+            for gram, weight in weights.items():
+                if gram in vocabulary:
+                    query[vocabulary[gram]] = weight
+            norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+            return keys, (vectors @ (query / norm)).tolist()
+        query = _unit(weights)
+        return keys, [sum(weight * vector.get(gram, 0.0) for gram, weight in query.items()) for vector in vectors]
+
+    def _most_similar(self, key: str) -> Optional[Tuple[str, float]]:
+        if not self._entries:
+            return None
+        keys, scores = self._scores(char_ngrams(key, self.config.ngram))
+        ranked = sorted(zip(keys, scores), key=lambda item: item[1], reverse=True)
+        for cached, score in ranked:
+            if score < self.config.threshold:
+                return None
+            # close spelling is not the same question, e.g. another year, city or count
+            if same_details(key, cached):
+                return cached, score
+        return None
+
+
+def query_tokens(text: str) -> List[str]:
+    # CJK characters are tokens on their own, the text has no spaces between words
+    return _TOKEN.findall(text)
+
+
+def same_details(a: str, b: str) -> bool:
+    """Whether two normalised queries only differ in wording, not in their numbers, names or dates
+
+    The tokens of one query missing from the other must be filler words, or spelling variants of
+    a token of the other query (`summarise` and `summarize`, `expense` and `expenses`).
+    """
+    tokens_a, tokens_b = query_tokens(a), query_tokens(b)
+    if _numbers(tokens_a) != _numbers(tokens_b):
+        return False
+    set_a, set_b = set(tokens_a), set(tokens_b)
+    return all(_is_rewording(token, set_b) for token in set_a - set_b) and all(_is_rewording(token, set_a) for token in set_b - set_a)
+
+
+def _numbers(tokens: List[str]) -> Counter:
+    return Counter(token for token in tokens if token.isdigit() or token in _NUMBER_WORDS)
+
+
+def _is_rewording(token: str, others: set) -> bool:
+    if token in _FILLER:
+        return True
+    return any(_variant(token, other) for other in others if not other.isdigit() and other not in _NUMBER_WORDS)
+
+
+def _variant(a: str, b: str) -> bool:
+    prefix = len(os.path.commonprefix([a, b]))
+    # a few trailing letters apart, on words long enough for it to be an inflection
+    return prefix >= 4 and prefix >= min(len(a), len(b)) - 2
+
+
+def _unit(vector: Dict[str, float]) -> Dict[str, float]:
+    norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+    return {key: value / norm for key, value in vector.items()}
+
+
+def _digest(context: Optional[str]) -> Optional[str]:
+    return hashlib.sha256(context.encode()).hexdigest() if context else None
+
+
+class ResultCaches:
+    """The result caches of the sub-agents that opted in, one per agent and session"""
+
+    def __init__(self, max_caches: int = 1024):
+        self.max_caches = max_caches
+        self._configs: Dict[str, ResultCacheConfig] = {}
+        # the least recently used caches are dropped first, e.g. of sessions gone
+        self._caches: "OrderedDict[Tuple[str, Optional[str], Optional[str]], SimilarityCache]" = OrderedDict()
+
+    def bind(self, agent_name: str, config: Optional[ResultCacheConfig]) -> None:
+        self._configs.pop(agent_name, None)
+        for key in [key for key in self._caches if key[0] == agent_name]:
+            del self._caches[key]
+        if config is not None:
+            self._configs[agent_name] = config
+
+    def _cache(self, agent_name: str, context: Optional[str]) -> Optional[SimilarityCache]:
+        config = self._configs.get(agent_name)
+        if config is None:
+            return None
+        # the answers of one session are never served to another one, nor those given with another history
+        session = current_session()
+        key = (agent_name, session.session_id if session is not None else None, context)
+        cache = self._caches.get(key)
+        if cache is None:
+            cache = self._caches[key] = SimilarityCache(config)
+            while len(self._caches) > self.max_caches:
+                self._caches.popitem(last=False)
+        self._caches.move_to_end(key)
+        return cache
+
+    def lookup(self, agent_name: str, query: str, context: Optional[str] = None) -> Tuple[bool, Any]:
+        """`context` is what the answer depends on besides the query, e.g. the history passed to the agent"""
+        cache = self._cache(agent_name, _digest(context))
+        if cache is None:
+            return False, None
+        match, result = cache.get(query)
+        record_cache(f"agent__{agent_name}", match is not None)
+        if match is not None:
+            result_cache_hits_total.inc(agent=agent_name, match=match)
+            set_span_attribute("result_cache", match)
+        return match is not None, result
+
+    def store(self, agent_name: str, query: str, result: Any, context: Optional[str] = None) -> None:
+        cache = self._cache(agent_name, _digest(context))
+        if cache is not None:
+            cache.put(query, result)
+
+    def clear(self) -> None:
+        self._caches.clear()
+
+
+result_caches = ResultCaches()
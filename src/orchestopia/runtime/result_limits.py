@@ -0,0 +1,191 @@
+import math
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Literal, Optional
+from pydantic import BaseModel, Field, model_validator
+from pydantic_core import to_json
+from pydantic_ai import Agent, Tool
+
+from orchestopia.utils import estimate_tokens
+from orchestopia.registry import ResourceRegistry
+from orchestopia.observability.log import get_logger
+from orchestopia.observability.metrics import metrics
+from orchestopia.observability.tracing import set_span_attribute, span
+from orchestopia.runtime.runner import run_agent
+
+logger = get_logger("agent")
+
+# same ratio as `estimate_tokens`
+CHARS_PER_TOKEN = 4
+PAGE_TOOL = "read_result_page"
+
+results_limited_total = metrics.counter(
+    "orchestopia_tool_results_limited", "Tool results over their size limit", ("tool", "strategy")
+)
+result_saved_bytes = metrics.counter(
+    "orchestopia_tool_result_saved_bytes", "Bytes of tool results kept out of the model context", ("tool", "strategy")
+)
+result_saved_tokens = metrics.counter(
+    "orchestopia_tool_result_saved_tokens", "Estimated tokens of tool results kept out of the model context", ("tool", "strategy")
+)
+
+
+class ResultLimitConfig(BaseModel):
+    max_tokens: int = Field(default=2000, ge=1)
+    # truncate: keep the start, head_tail: keep the start and the end,
+    # paginate: return the first page and a handle for `read_result_page`, summarize: ask `model` for a summary
+    strategy: Literal["truncate", "head_tail", "paginate", "summarize"] = "truncate"
+    # head_tail: share of the limit spent on the start of the result
+    head_ratio: float = Field(default=0.7, gt=0, lt=1)
+    # summarize: a `@model:` reference, ideally a small and fast one
+    model: Optional[str] = None
+    # summarize: the part of the result the summarizer reads
+    max_summary_input_tokens: int = Field(default=16000, ge=1)
+
+    @model_validator(mode="after")
+    def check_model(self):
+        if self.strategy == "summarize" and not self.model:
+            raise ValueError("The `summarize` strategy needs a `model`")
+        return self
+
+
+class ResultPages:
+    """Oversized results kept for `read_result_page`, the oldest ones are dropped first"""
+
+    def __init__(self, max_results: int = 256):
+        self.max_results = max_results
+        self._results: "OrderedDict[str, tuple[str, int]]" = OrderedDict()
+
+    def put(self, text: str, page_chars: int) -> str:
+        handle = uuid.uuid4().hex[:12]
+        self._results[handle] = (text, page_chars)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+        return handle
+
+    def page(self, handle: str, page: int) -> Dict[str, Any]:
+        if handle not in self._results:
+            return {"error": f"Unknown or expired handle `{handle}`"}
+        self._results.move_to_end(handle)
+        text, page_chars = self._results[handle]
+        pages = math.ceil(len(text) / page_chars)
+        if not 1 <= page <= pages:
+            return {"error": f"Page {page} is out of range, the result has {pages} pages"}
+        return {
+            "content": text[(page - 1) * page_chars: page * page_chars],
+            "handle": handle,
+            "page": page,
+            "pages": pages,
+        }
+
+
+result_pages = ResultPages()
+# limits of the tool results, by tool name
+tool_result_limits: Dict[str, ResultLimitConfig] = {}
+_summarizers: Dict[str, Agent] = {}
+
+
+def bind_result_limit(tool_name: str, config: Optional[ResultLimitConfig]) -> None:
+    if config is None:
+        tool_result_limits.pop(tool_name, None)
+    else:
+        tool_result_limits[tool_name] = config
+
+
+def needs_page_tool(tool_names) -> bool:
+    return any(
+        name in tool_result_limits and tool_result_limits[name].strategy == "paginate" for name in tool_names
+    )
+
+
+async def read_result_page(handle: str, page: int = 2) -> Dict[str, Any]:
+    """Read another page of a tool result that was too large to return at once.
+
+    Args:
+        handle: the `handle` returned with the first page
+        page: the page number, starting at 1
+    """
+    return result_pages.page(handle, page)
+
+
+page_tool = Tool(read_result_page, name=PAGE_TOOL)
+
+
+def _as_text(result: Any) -> Optional[str]:
+    if isinstance(result, str):
+        return result
+    # e.g. A2A parts, binary content is passed as it is
+    if isinstance(result, list) and not all(isinstance(item, str) for item in result):
+        return None
+    return to_json(result).decode()
+
+
+def _head_tail(text: str, chars: int, head_ratio: float) -> str:
+    head = int(chars * head_ratio)
+    tail = chars - head
+    return f"{text[:head]}\n…[{len(text) - chars} characters omitted]…\n{text[-tail:] if tail else ''}"
+
+
+async def _summarize(tool_name: str, text: str, config: ResultLimitConfig) -> str:
+    summarizer = _summarizers.get(config.model)
+    if summarizer is None:
+        summarizer = _summarizers[config.model] = Agent(
+            ResourceRegistry().get_instance_with_namespace(config.model),
+            name="result_summarizer",
+            instructions=(
+                "Summarize the tool result you are given for another assistant. Keep every fact, number, "
+                "identifier and URL it may need, drop repetitions and boilerplate."
+            ),
+        )
+    input_chars = config.max_summary_input_tokens * CHARS_PER_TOKEN
+    if len(text) > input_chars:
+        text = _head_tail(text, input_chars, config.head_ratio)
+    prompt = f"Result of the tool `{tool_name}`, summarize it in at most {config.max_tokens * 3 // 4} words:\n\n{text}"
+    result = await run_agent(summarizer, prompt, profile=False)
+    return str(result.output)
+
+
+async def limit_result(tool_name: str, result: Any) -> Any:
+    """Apply the size limit of a tool to its result before it goes back to the model"""
+    config = tool_result_limits.get(tool_name)
+    if config is None or estimate_tokens(result) <= config.max_tokens:
+        return result
+    text = _as_text(result)
+    if text is None or len(text) <= config.max_tokens * CHARS_PER_TOKEN:
+        return result
+    with span("tool.limit_result", kind="internal", tool=tool_name, strategy=config.strategy):
+        return await _limit(tool_name, text, config)
+
+
+async def _limit(tool_name: str, text: str, config: ResultLimitConfig) -> Any:
+    chars = config.max_tokens * CHARS_PER_TOKEN
+    strategy = config.strategy
+    if strategy == "summarize":
+        try:
+            limited = await _summarize(tool_name, text, config)
+        except Exception as e:
+            # a result cut to size is better than a failed tool call
+            logger.warning("Failed to summarize the result of `%s`: %s", tool_name, e, extra={"resource": tool_name})
+            strategy = "head_tail"
+    if strategy == "truncate":
+        limited = f"{text[:chars]}\n…[truncated, {len(text) - chars} of {len(text)} characters omitted]"
+    elif strategy == "head_tail":
+        limited = _head_tail(text, chars, config.head_ratio)
+    elif strategy == "paginate":
+        handle = result_pages.put(text, chars)
+        limited = {
+            **result_pages.page(handle, 1),
+            "note": f"The result is split in pages, call `{PAGE_TOOL}` with this handle to read the next ones.",
+        }
+
+    saved_bytes = len(text.encode()) - len(_as_text(limited).encode())
+    saved_tokens = estimate_tokens(text) - estimate_tokens(limited)
+    results_limited_total.inc(tool=tool_name, strategy=strategy)
+    result_saved_bytes.inc(max(saved_bytes, 0), tool=tool_name, strategy=strategy)
+    result_saved_tokens.inc(max(saved_tokens, 0), tool=tool_name, strategy=strategy)
+    set_span_attribute("result_saved_tokens", saved_tokens)
+    logger.debug(
+        "Result of `%s` limited with %s, ~%d tokens saved", tool_name, strategy, saved_tokens,
+        extra={"resource": tool_name, "saved_bytes": saved_bytes, "saved_tokens": saved_tokens},
+    )
+    return limited
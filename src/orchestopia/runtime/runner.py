@@ -0,0 +1,164 @@
+import asyncio
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, Optional, Sequence, Tuple, Union
+from pydantic_ai import Agent
+from pydantic_ai._agent_graph import GraphAgentState
+from pydantic_ai.agent import AgentRun, AgentRunResult
+from pydantic_ai.messages import UserContent
+from pydantic_ai.usage import Usage
+
+from orchestopia.observability.accounting import AccountedRunResult, RunAccount, account_run
+from orchestopia.observability.tracing import set_span_attribute, span
+from orchestopia.observability.profiling import profiler
+from orchestopia.observability.log import get_logger
+from orchestopia.memory.conversation import ConversationMemory
+from orchestopia.runtime.budget import (
+    BudgetConfig,
+    BudgetExceeded,
+    RunBudget,
+    agent_budgets,
+    partial_output,
+    record_exhausted,
+    run_budget,
+)
+from orchestopia.runtime.lifecycle import lifecycle
+from orchestopia.runtime.session import Session
+
+if TYPE_CHECKING:
+    from orchestopia.agent.workflow import Workflow
+
+logger = get_logger("agent")
+
+
+async def run_agent(
+    agent: Union[Agent, "Workflow"],
+    user_prompt: Union[str, Sequence[UserContent], None] = None,
+    memory: Optional[ConversationMemory] = None,
+    session_id: Optional[str] = None,
+    profile: Optional[bool] = None,
+    budget: Optional[BudgetConfig] = None,
+    session: Optional[Session] = None,
+    **kwargs: Any,
+) -> AccountedRunResult:
+    """Run an agent and attach the usage of the whole run tree (sub-agents and tools included) to the result
+
+    `profile` forces the profiling report of this run on or off, by default runs are sampled
+    with the rate of `orchestopia.observability.profiler`.
+
+    `budget` overrides the budget declared for the agent in agent.yaml. A run exhausting its own
+    budget ends early with the last model text as output and the reason in `stop_reason`, such a
+    partial run is not appended to the memory.
+
+    `session` serves the run for one user of the shared agents: its deps are the default deps, its
+    memory and id the default memory and session_id, its quota and credentials apply to every nested
+    sub-agent run and tool call. Nested runs inherit the session without passing it.
+
+    A workflow runs the same way, its result has the workflow output and no messages.
+
+    Raises `ShuttingDown` when the runtime drains, unless the run is nested in a call already in flight.
+    """
+    # a workflow is the object with `execute`, `orchestopia.agent` imports this module
+    if not isinstance(agent, Agent) and not hasattr(agent, "execute"):
+        raise TypeError(f"`{getattr(agent, 'name', agent)}` is not an agent nor a workflow, e.g. an A2A agent is called through its tool")
+    if session is not None:
+        memory = memory or session.memory
+        session_id = session_id or session.session_id
+        kwargs.setdefault("deps", session.deps)
+    if memory is not None and session_id is not None:
+        kwargs.setdefault("message_history", await memory.history(session_id))
+    with session.activate() if session is not None else nullcontext():
+        return await _run_accounted(agent, user_prompt, memory, session_id, profile, budget, kwargs)
+
+
+async def _run_accounted(
+    agent: Union[Agent, "Workflow"],
+    user_prompt: Any,
+    memory: Optional[ConversationMemory],
+    session_id: Optional[str],
+    profile: Optional[bool],
+    budget: Optional[BudgetConfig],
+    kwargs: dict,
+) -> AccountedRunResult:
+    if not isinstance(agent, Agent):
+        return await _run_workflow(agent, user_prompt, profile, budget, kwargs)
+    async with lifecycle.track(f"agent:{agent.name}", run=True), profiler.profile(agent.name, enabled=profile) as run_profile:
+        async with account_run(agent.name) as account, span("agent.run", kind="agent", agent=agent.name) as run_span:
+            if run_profile is not None:
+                run_profile.set_root(run_span)
+            with run_budget(agent.name, budget or agent_budgets.get(agent.name)) as own_budget:
+                result, stop_reason = await _run(agent, user_prompt, own_budget, kwargs)
+            account.add_usage(result.usage())
+    if memory is not None and session_id is not None and stop_reason is None:
+        await memory.append(session_id, result.new_messages())
+    return AccountedRunResult.from_result(result, account, run_profile, stop_reason)
+
+
+async def _run_workflow(
+    workflow: "Workflow", user_prompt: Any, profile: Optional[bool], budget: Optional[BudgetConfig], kwargs: dict
+) -> AccountedRunResult:
+    async with lifecycle.track(f"agent:{workflow.name}", run=True), profiler.profile(workflow.name, enabled=profile) as run_profile:
+        async with (
+            account_run(workflow.name, kind="workflow") as account,
+            span("workflow.run", kind="agent", workflow=workflow.name) as run_span,
+        ):
+            if run_profile is not None:
+                run_profile.set_root(run_span)
+            with run_budget(workflow.name, budget or agent_budgets.get(workflow.name)) as own_budget:
+                try:
+                    output, stop_reason = await workflow.execute(user_prompt, deps=kwargs.get("deps")), None
+                except BudgetExceeded as e:
+                    if e.budget is not own_budget:
+                        raise
+                    record_exhausted(workflow.name, e)
+                    set_span_attribute("stop_reason", str(e))
+                    logger.warning(str(e), extra={"resource": workflow.name, **e.budget.snapshot()})
+                    output, stop_reason = None, str(e)
+    # shaped like the result of an agent run, the usage being the one of the whole run tree
+    state = GraphAgentState(message_history=[], usage=_usage(account), retries=0, run_step=0)
+    return AccountedRunResult.from_result(AgentRunResult(output, None, state, 0, None), account, run_profile, stop_reason)
+
+
+def _usage(account: RunAccount) -> Usage:
+    totals = account.totals()
+    return Usage(
+        requests=totals.requests,
+        request_tokens=totals.request_tokens,
+        response_tokens=totals.response_tokens,
+        total_tokens=totals.total_tokens,
+    )
+
+
+async def _run(
+    agent: Agent, user_prompt: Any, budget: Optional[RunBudget], kwargs: dict
+) -> Tuple[AgentRunResult, Optional[str]]:
+    async with agent.iter(user_prompt, **kwargs) as agent_run:
+        try:
+            # the wall-clock limit also interrupts a request or tool call in flight
+            async with asyncio.timeout(budget.remaining_seconds() if budget else None) as timeout:
+                async for _ in agent_run:
+                    pass
+        except BudgetExceeded as e:
+            # the budget of an enclosing run is handled by that run
+            if e.budget is not budget:
+                raise
+            return _stopped(agent, agent_run, e)
+        except TimeoutError:
+            if not timeout.expired():
+                raise
+            return _stopped(agent, agent_run, BudgetExceeded(budget, "seconds", f"ran for more than {budget.config.max_seconds}s"))
+    return agent_run.result, None
+
+
+def _stopped(agent: Agent, agent_run: AgentRun, error: BudgetExceeded) -> Tuple[AgentRunResult, str]:
+    record_exhausted(agent.name, error)
+    set_span_attribute("stop_reason", str(error))
+    logger.warning(str(error), extra={"resource": agent.name, **error.budget.snapshot()})
+    state = agent_run.ctx.state
+    result = AgentRunResult(
+        partial_output(state.message_history),
+        None,
+        state,
+        agent_run.ctx.deps.new_message_index,
+        None,
+    )
+    return result, str(error)
@@ -0,0 +1,60 @@
+from uuid import uuid4
+from contextvars import ContextVar
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from orchestopia.memory.conversation import ConversationMemory
+from orchestopia.runtime.budget import BudgetConfig, RunBudget, charged_to
+
+_current_session: ContextVar[Optional["Session"]] = ContextVar("orchestopia_session", default=None)
+
+
+class Session:
+    """The state of one user or tenant, served by the shared agents, models and tool connections
+
+    `deps` are the deps of its runs, forwarded to sub-agents and workflow steps. `credentials` maps an
+    MCP server or A2A agent name (`*` for any other) to what goes with each call: the `_meta` of MCP
+    tool calls, the HTTP headers of A2A requests. `memory` keeps the conversation of its top-level
+    runs. `quota` limits all its runs together, its `max_seconds` being the age of the session.
+    """
+
+    def __init__(
+        self,
+        session_id: Optional[str] = None,
+        deps: Any = None,
+        credentials: Optional[Dict[str, Dict[str, Any]]] = None,
+        memory: Optional[ConversationMemory] = None,
+        quota: Optional[BudgetConfig] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        self.session_id = session_id or uuid4().hex
+        self.deps = deps
+        self.credentials = credentials or {}
+        self.memory = memory
+        self.quota = RunBudget(f"session:{self.session_id}", quota) if quota is not None else None
+        self.metadata = metadata or {}
+
+    def credentials_for(self, resource: str) -> Optional[Dict[str, Any]]:
+        return self.credentials.get(resource, self.credentials.get("*"))
+
+    @contextmanager
+    def activate(self) -> Iterator["Session"]:
+        """Makes this the session of the runs and calls started in the block, nested ones included"""
+        token = _current_session.set(self)
+        try:
+            with charged_to(self.quota):
+                yield self
+        finally:
+            _current_session.reset(token)
+
+    def snapshot(self) -> dict:
+        return {"session_id": self.session_id, "quota": self.quota.snapshot() if self.quota else None}
+
+
+def current_session() -> Optional[Session]:
+    return _current_session.get()
+
+
+def session_credentials(resource: str) -> Optional[Dict[str, Any]]:
+    session = _current_session.get()
+    return session.credentials_for(resource) if session is not None else None
@@ -0,0 +1,46 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from orchestopia.config_loader import ConfigLoader
+from orchestopia.mcp_tool.proxy import MCPStdioProxy
+
+# (worker index, worker count, MCP tool config overrides) -> result, must be picklable
+WorkerFunction = Callable[[int, int, Dict[str, Dict[str, Any]]], Any]
+
+
+class Supervisor:
+    """Starts N worker processes that share one copy of every stdio MCP server"""
+
+    def __init__(
+        self,
+        config_path: str = "config",
+        workers: int = 2,
+        share_stdio_mcp: bool = True,
+        socket_path: Optional[str] = None,
+    ):
+        self.config_path = config_path
+        self.workers = workers
+        self.share_stdio_mcp = share_stdio_mcp
+        self.socket_path = socket_path
+
+    async def run(self, worker: WorkerFunction) -> List[Any]:
+        proxy = None
+        overrides: Dict[str, Dict[str, Any]] = {}
+        if self.share_stdio_mcp:
+            # also leaves the validated configs in the cache for the workers
+            proxy = MCPStdioProxy(ConfigLoader(self.config_path).load().mcp_tools, self.socket_path)
+            await proxy.start()
+            overrides = proxy.client_configs()
+        try:
+            loop = asyncio.get_running_loop()
+            # spawned rather than forked, a forked child would inherit the running event loop
+            with ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                return await asyncio.gather(*(
+                    loop.run_in_executor(pool, worker, index, self.workers, overrides)
+                    for index in range(self.workers)
+                ))
+        finally:
+            if proxy is not None:
+                await proxy.close()
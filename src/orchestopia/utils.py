@@ -1,6 +1,10 @@
 import re
+import math
 import builtins
-from typing import Dict, Any, Tuple
+import yaml
+from typing import Dict, Any, List, Tuple, Callable
+from pydantic_core import to_json
+from pydantic_ai import Tool
 
 def get_namespace_and_key(key_with_namespace: str) -> Tuple[str, str]:
     pattern = r"@(\w+):(\w+)"
@@ -29,3 +33,39 @@ def resolve_basemodel_type(type_str: str, created_models: Dict[str, type]) -> An
         return cls
     except Exception as e:
         raise ValueError(f"Unable to resolve type: {type_str}") from e
+
+
+def tool_from_schema(
+    function: Callable[..., Any], name: str, description: str, json_schema: Dict[str, Any], takes_ctx: bool = True
+) -> Tool:
+    # `Tool.from_schema` never passes the RunContext, turn it on for handlers taking `ctx` as first argument
+    tool = Tool.from_schema(
+        function=function,
+        name=name,
+        description=description,
+        json_schema=json_schema,
+    )
+    tool.takes_ctx = takes_ctx
+    tool.function_schema.takes_ctx = takes_ctx
+    return tool
+
+
+def estimate_tokens(value: Any) -> int:
+    # rough estimation (~4 chars per token), good enough for budgeting without a tokenizer
+    return max(1, len(to_json(value)) // 4)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile, `q` in [0, 100]"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+# the libyaml parser is several times faster, pure python is the fallback when pyyaml was built without it
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def load_yaml(text: str) -> Any:
+    return yaml.load(text, Loader=YamlLoader)
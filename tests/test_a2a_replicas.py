@@ -0,0 +1,61 @@
+import asyncio
+import unittest
+from uuid import uuid4
+
+from a2a.types import Message, Part, Task, TaskState, TaskStatus, TextPart
+
+from orchestopia.agent.a2a_client_manager import ReplicatedA2AAgent
+from orchestopia.agent.config import ReplicaRoutingConfig
+
+
+class _Replica:
+    def __init__(self, name, response, delay=0.0):
+        self.name = name
+        self.response = response
+        self.delay = delay
+        self.calls = 0
+
+    async def run(self, query, context_id=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.response
+
+
+def _answer(text):
+    return Message(role="agent", parts=[Part(root=TextPart(text=text))], message_id=str(uuid4()))
+
+
+def _failed_task():
+    return Task(id="t", context_id="c", status=TaskStatus(state=TaskState.failed))
+
+
+class ReplicatedA2AAgentTest(unittest.IsolatedAsyncioTestCase):
+    async def test_round_robin_fails_over_failed_tasks(self):
+        for failure in ("The task (id: t) is failed, Error message: None", _failed_task()):
+            healthy = _Replica("peer#1", _answer("ok"))
+            agent = ReplicatedA2AAgent(
+                "peer", [_Replica("peer#0", failure), healthy], ReplicaRoutingConfig(policy="round_robin")
+            )
+            response = await agent.run("q")
+            self.assertEqual(response.parts[0].root.text, "ok")
+            # the failed call is not a latency sample
+            self.assertEqual(len(agent.replicas[0].latencies), 0)
+
+    async def test_hedged_failure_does_not_win(self):
+        healthy = _Replica("peer#1", _answer("ok"), delay=0.05)
+        agent = ReplicatedA2AAgent(
+            "peer", [_Replica("peer#0", _failed_task()), healthy], ReplicaRoutingConfig(policy="hedged", hedge_delay=0.01)
+        )
+        response = await agent.run("q")
+        self.assertEqual(response.parts[0].root.text, "ok")
+
+    async def test_broadcast_leaves_failures_out(self):
+        agent = ReplicatedA2AAgent(
+            "peer", [_Replica("peer#0", "failed"), _Replica("peer#1", _answer("ok"))], ReplicaRoutingConfig(policy="broadcast")
+        )
+        response = await agent.run("q")
+        self.assertEqual([part.root.text for part in response.parts], ["Answer of peer#1:", "ok"])
+
+
+if __name__ == "__main__":
+    unittest.main()
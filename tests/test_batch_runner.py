@@ -0,0 +1,47 @@
+import asyncio
+import json
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from pydantic import BaseModel
+
+from orchestopia.batch import runner as batch_runner
+from orchestopia.batch.runner import BatchRunner
+from orchestopia.observability.accounting import RunAccount
+
+
+class Row(BaseModel):
+    at: datetime
+
+
+async def _run_agent(agent, prompt):
+    return SimpleNamespace(output=[Row(at=datetime(2024, 1, 1))], account=RunAccount(name="agent"))
+
+
+class BatchRunnerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.input = self.dir / "in.jsonl"
+        self.input.write_text("".join(json.dumps({"id": str(i), "prompt": "q"}) + "\n" for i in range(20)))
+        self.output = self.dir / "out.jsonl"
+        self.runner = BatchRunner(SimpleNamespace(name="agent"), concurrency=2)
+
+    async def test_output_not_json_serializable(self):
+        with mock.patch.object(batch_runner, "run_agent", _run_agent):
+            summary = await asyncio.wait_for(self.runner.run(str(self.input), str(self.output)), timeout=5)
+        self.assertEqual(summary.succeeded, 20)
+        record = json.loads(self.output.read_text().splitlines()[0])
+        self.assertEqual(record["output"], [{"at": "2024-01-01T00:00:00"}])
+
+    async def test_dead_worker_fails_the_run(self):
+        with mock.patch.object(BatchRunner, "_run_item", side_effect=RuntimeError("disk full")):
+            with self.assertRaisesRegex(RuntimeError, "disk full"):
+                await asyncio.wait_for(self.runner.run(str(self.input), str(self.output)), timeout=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
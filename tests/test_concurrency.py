@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+
+from orchestopia.runtime.concurrency import ConcurrencyConfig, ConcurrencyGroups
+
+
+class ConcurrencyGroupsTest(unittest.IsolatedAsyncioTestCase):
+    async def test_nested_call_in_held_group(self):
+        groups = ConcurrencyGroups()
+        config = ConcurrencyConfig(group="retrieval", limit=1)
+        groups.register_tool("agent__outer", config)
+        groups.register_tool("inner", config)
+        async with groups.guard("agent__outer", config):
+            # the sub-agent of the outer call uses a tool of the same group
+            await asyncio.wait_for(groups.guard("inner", config).__aenter__(), timeout=1)
+
+    async def test_recursive_non_reentrant_call(self):
+        groups = ConcurrencyGroups()
+        config = ConcurrencyConfig(reentrant=False)
+        groups.register_tool("agent__outer", config)
+
+        async def call(depth: int) -> None:
+            async with groups.guard("agent__outer", config):
+                if depth:
+                    await call(depth - 1)
+
+        await asyncio.wait_for(call(2), timeout=1)
+
+    async def test_concurrent_nested_calls_are_serialized(self):
+        groups = ConcurrencyGroups()
+        config = ConcurrencyConfig(group="g", limit=1)
+        for tool_name in ("agent__outer", "search", "fetch"):
+            groups.register_tool(tool_name, config)
+        running, peak = 0, 0
+
+        async def nested_call(tool_name: str) -> None:
+            nonlocal running, peak
+            async with groups.guard(tool_name, config):
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        async with groups.guard("agent__outer", config):
+            # the sub-agent of the outer call fires two calls to tools of its group at once
+            await asyncio.wait_for(asyncio.gather(nested_call("search"), nested_call("fetch")), timeout=1)
+        self.assertEqual(peak, 1)
+
+    async def test_sibling_calls_still_wait(self):
+        groups = ConcurrencyGroups()
+        config = ConcurrencyConfig(reentrant=False)
+        groups.register_tool("tool", config)
+        running, peak = 0, 0
+
+        async def call() -> None:
+            nonlocal running, peak
+            async with groups.guard("tool", config):
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(call(), call(), call())
+        self.assertEqual(peak, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
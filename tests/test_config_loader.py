@@ -0,0 +1,46 @@
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from orchestopia import config_loader
+from orchestopia.model import config as model_config
+from orchestopia.runtime import result_limits
+
+
+class SchemaFingerprintTest(unittest.TestCase):
+    def tearDown(self):
+        config_loader._schema_fingerprint.cache_clear()
+
+    def _fingerprint_with(self, module, source: bytes) -> bytes:
+        """The fingerprint when the file of `module` holds `source`"""
+        path = Path(module.__file__)
+        read_bytes = Path.read_bytes
+
+        def patched(self):
+            return source if self == path else read_bytes(self)
+
+        config_loader._schema_fingerprint.cache_clear()
+        with mock.patch.object(Path, "read_bytes", patched):
+            return config_loader._schema_fingerprint()
+
+    def test_covers_the_nested_config_modules(self):
+        modules = {}
+        for config_type in (config_loader.FormatConfig, config_loader.ModelConfig,
+                            config_loader.MCPToolConfig, config_loader.AgentConfig):
+            config_loader._config_modules(config_type, modules)
+        self.assertIn("orchestopia.runtime.result_limits", modules)
+        self.assertIn("orchestopia.runtime.concurrency", modules)
+
+    def test_validator_change_changes_the_fingerprint(self):
+        # only the validator body changes, the schemas stay the same
+        for module in (model_config, result_limits):
+            source = Path(module.__file__).read_bytes()
+            with self.subTest(module=module.__name__):
+                self.assertNotEqual(
+                    self._fingerprint_with(module, source),
+                    self._fingerprint_with(module, source + b"\n# changed validator\n"),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from unittest import mock
+
+from orchestopia.runtime import result_cache
+from orchestopia.runtime.result_cache import ResultCacheConfig, SimilarityCache, char_ngrams, normalize
+
+QUERY = "Summarise the expenses of the Taipei branch for the fiscal year 2023 and list the three largest expense categories"
+
+
+class SimilarityCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = SimilarityCache(ResultCacheConfig())
+        self.cache.put(QUERY, "answer")
+
+    def test_reworded_query_hits(self):
+        for query in (
+            "Please summarise the expenses of the Taipei branch for the fiscal year 2023 and list the three largest expense categories",
+            "Summarize the expenses of the Taipei branch for the fiscal year 2023, and list the three largest expense categories.",
+        ):
+            self.assertEqual(self.cache.get(query), ("similar", "answer"), query)
+
+    def test_normalised_query_hits_exactly(self):
+        self.assertEqual(self.cache.get(QUERY.upper() + "?"), ("exact", "answer"))
+
+    def test_other_number_or_name_misses(self):
+        for old, new in (("2023", "2024"), ("Taipei", "Tainan"), ("three", "five")):
+            self.assertEqual(self.cache.get(QUERY.replace(old, new)), (None, None), new)
+
+    def test_cjk_query(self):
+        self.cache.put("請幫我查詢台北分公司2023年的支出", "支出")
+        self.assertEqual(self.cache.get("請幫我查詢台南分公司2023年的支出"), (None, None))
+        self.assertEqual(self.cache.get("請幫我查詢台北分公司2024年的支出"), (None, None))
+
+
+@unittest.skipIf(result_cache.np is None, "NumPy is not installed, see the `cache` extra")
+class SimilarityIndexTest(unittest.TestCase):
+    def test_numpy_and_python_scores_match(self):
+        queries = [QUERY, QUERY.replace("2023", "2024"), "What is the weather in Taipei today?", "請幫我查詢台北分公司2023年的支出"]
+        grams = char_ngrams(normalize("Please summarise the expenses of the Taipei branch in 2023"), 3)
+        scores = {}
+        for backend in ("numpy", "python"):
+            with mock.patch.object(result_cache, "np", result_cache.np if backend == "numpy" else None):
+                cache = SimilarityCache(ResultCacheConfig())
+                for query in queries:
+                    cache.put(query, query)
+                scores[backend] = cache._scores(grams)
+        self.assertEqual(scores["numpy"][0], scores["python"][0])
+        for numpy_score, python_score in zip(scores["numpy"][1], scores["python"][1]):
+            self.assertAlmostEqual(numpy_score, python_score, places=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
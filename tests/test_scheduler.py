@@ -0,0 +1,39 @@
+import asyncio
+import unittest
+
+from orchestopia.model.config import ModelLimitsConfig
+from orchestopia.model.scheduler import ModelScheduler
+
+
+class ModelSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_cancel_while_queued(self):
+        scheduler = ModelScheduler("test", ModelLimitsConfig(max_concurrency=1))
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot(1):
+                await release.wait()
+
+        async def wait():
+            async with scheduler.slot(1):
+                pass
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(wait())
+        await asyncio.sleep(0)
+        # the slot is freed and the waiter cancelled before either task runs again
+        release.set()
+        waiter.cancel()
+        await holder
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+
+        self.assertEqual(scheduler.in_flight, 0)
+        self.assertEqual(scheduler.stats["interactive"].queued, 0)
+        # the model is not wedged
+        await asyncio.wait_for(wait(), timeout=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+from orchestopia.bench.scenarios import _agent, _runtime
+from orchestopia.runtime import BudgetConfig, run_agent
+
+WORKFLOW = {
+    "name": "twice",
+    "type": "workflow",
+    "description": "Asks the agent twice",
+    "steps": [
+        {"name": "first", "uses": "@agent:answerer", "input": "{{ input }}"},
+        {"name": "second", "uses": "@agent:answerer", "input": "{{ steps.first.output }}"},
+    ],
+}
+
+
+class RunWorkflowTest(unittest.IsolatedAsyncioTestCase):
+    async def test_run_agent_runs_a_workflow(self):
+        async with _runtime([_agent("answerer"), WORKFLOW]) as registry:
+            result = await run_agent(registry.agents.get("twice"), "hi")
+        self.assertIn("answer:", str(result.output))
+        self.assertIsNone(result.stop_reason)
+        self.assertEqual(result.usage().requests, 2)
+        self.assertEqual(result.account.kind, "workflow")
+        self.assertEqual([child.name for child in result.account.children], ["answerer", "answerer"])
+
+    async def test_workflow_budget(self):
+        async with _runtime([_agent("answerer"), WORKFLOW]) as registry:
+            result = await run_agent(registry.agents.get("twice"), "hi", budget=BudgetConfig(max_requests=1))
+        self.assertIsNone(result.output)
+        self.assertIn("exhausted", result.stop_reason)
+
+
+if __name__ == "__main__":
+    unittest.main()